@@ -3,115 +3,181 @@ Returns a predefined response. Replace logic and configuration as needed.
 """
 from __future__ import annotations
 from langgraph.graph import StateGraph, END
-from dataclasses import dataclass
-from typing import Any, Dict, TypedDict
-from langchain_core.runnables import RunnableConfig
-from langgraph.graph import StateGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
-from google.genai.types import GenerateContentConfig
-from langgraph.prebuilt import create_react_agent
+from typing import Any, Dict
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.prebuilt.chat_agent_executor import AgentState
 from typing import Annotated, Literal, Optional
-from typing_extensions import TypedDict
 from langgraph.graph.message import AnyMessage, add_messages
-from agent.utils.llm import _get_llm,dummy_token_counter
-from agent.utils.vectorstore import load_document,split_text,create_vectorstore,get_retriever_tool
-from agent.utils.tools import book_appointment,cancel_appointment,search_for_appointment,check_doctor_availability,search_for_doctor,new_booking_assistant,cancel_booking_assistant,general_hospital_assistant
+from agent.utils.llm import get_bound_llm
+from agent.utils.answer_cache import SemanticAnswerCache, answer_cache_enabled, get_answer_cache
+from agent.utils.checkpoint import get_checkpointer
+from agent.utils.encoding import elide_stale_results, get_result_encoder
+from agent.utils.history import compaction_update, should_compact, split_history, summary_request
+from agent.utils.intent import LLM_TIER, get_intent_classifier, router_metrics, timed_classify
+from agent.utils.db import get_repository
+from agent.utils.prefetch import prefetch_in_background
+from agent.utils.prompts import assemble, system_prompt
+from agent.utils.telemetry import instrument
+from agent.utils.tokens import get_token_counter
+from agent.utils.tool_executor import ToolExecutor
+from agent.utils.warmup import warm_up_enabled, warm_up_hooks, warm_up_in_background
+from agent.utils.tts import get_speech_player, warm_up_speech
+from agent.utils.knowledge_base import DEFAULT_HOSPITAL, HospitalIndex, get_knowledge_base
+from agent.utils.tools import book_appointment,cancel_appointment,search_for_appointment,check_doctor_availability,find_available_slots,search_for_doctor,find_patient,list_upcoming_appointments,reschedule_appointment,new_booking_assistant,cancel_booking_assistant,reschedule_booking_assistant,general_hospital_assistant
 from langgraph.prebuilt import tools_condition
-from langgraph.prebuilt import ToolNode
 from langgraph.types import Command
-from langchain_core.runnables import RunnableConfig
-from pydantic import BaseModel, Field
-from langchain_core.messages import ToolMessage
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, trim_messages
-from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, message_chunk_to_message, trim_messages
+import asyncio
 import os
-from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-from elevenlabs import play
+import time
+import uuid
+from datetime import date
+
+# tools bound to each agent, shared by the LLM bindings and the tool executors
+new_booking_tools = [book_appointment, search_for_doctor, check_doctor_availability, find_available_slots, find_patient]
+cancel_booking_tools = [cancel_appointment, search_for_appointment, find_patient, list_upcoming_appointments]
+reschedule_booking_tools = [
+    reschedule_appointment, search_for_appointment, find_patient, list_upcoming_appointments,
+    find_available_slots, check_doctor_availability,
+]
+router_tools = [cancel_booking_assistant, new_booking_assistant, reschedule_booking_assistant, general_hospital_assistant]
 
 # state of the graph
 class State(AgentState):
     messages: Annotated[list[AnyMessage], add_messages]
+    # rolling summary of the turns dropped from `messages`
+    summary: str
+    # ID of the reply that was spoken while it was generated, so the voice node skips it
+    spoken: Optional[str]
+
+
+# fold old turns into the rolling summary before routing; the doctor and availability
+# data the booking tools are about to ask for is warmed in the background meanwhile,
+# kept per conversation (thread)
+def compact_history(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    prefetch_in_background(state["messages"], config.get("configurable", {}).get("thread_id"))
+    if not should_compact(state["messages"]):
+        return {}
+    older, _ = split_history(state["messages"])
+    summarizer = get_bound_llm("history_summarizer")
+    prompt = summary_request(state.get("summary", ""), older)
+    response = summarizer.invoke(prompt)
+    get_token_counter().observe("history_summarizer", prompt, response)
+    return compaction_update(response.content, older)
+
+async def acompact_history(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    prefetch_in_background(state["messages"], config.get("configurable", {}).get("thread_id"))
+    if not should_compact(state["messages"]):
+        return {}
+    older, _ = split_history(state["messages"])
+    summarizer = get_bound_llm("history_summarizer")
+    prompt = summary_request(state.get("summary", ""), older)
+    response = await summarizer.ainvoke(prompt)
+    get_token_counter().observe("history_summarizer", prompt, response)
+    return compaction_update(response.content, older)
+
+class _SpokenReply:
+    # accumulates a streamed agent reply, speaking its text as it arrives; once the
+    # reply turns out to carry a tool call, the speech is cancelled
+    def __init__(self) -> None:
+        self.response = None
+        self.speech = None
+
+    def add(self, chunk) -> None:
+        self.response = chunk if self.response is None else self.response + chunk
+        if self.response.tool_calls or getattr(self.response, "tool_call_chunks", None):
+            if self.speech is not None:
+                self.speech.cancel()
+                self.speech = None
+            return
+        if isinstance(chunk.content, str) and chunk.content:
+            if self.speech is None:
+                self.speech = get_speech_player().open_stream()
+            self.speech.feed(chunk.content)
+
+    def finish(self, role: str) -> Dict[str, Any]:
+        response = message_chunk_to_message(self.response)
+        response.id = response.id or str(uuid.uuid4())
+        # the router keeps the fast path off while a flow's assistant spoke last
+        response.name = role
+        if self.speech is None:
+            return {"messages": response, "spoken": None}
+        self.speech.close()
+        return {"messages": response, "spoken": response.id}
+
+def _agent_reply(role: str, llm, prompt: list) -> Dict[str, Any]:
+    reply = _SpokenReply()
+    for chunk in llm.stream(prompt):
+        reply.add(chunk)
+    get_token_counter().observe(role, prompt, reply.response)
+    return reply.finish(role)
 
+async def _aagent_reply(role: str, llm, prompt: list) -> Dict[str, Any]:
+    reply = _SpokenReply()
+    async for chunk in llm.astream(prompt):
+        reply.add(chunk)
+    get_token_counter().observe(role, prompt, reply.response)
+    return reply.finish(role)
+
+def _agent_prompt(role: str, state: State) -> list:
+    # static system prompt first, so it is cached across turns; the date and summary go last
+    return assemble(role, elide_stale_results(state["messages"]), state.get("summary"), today=date.today())
 
 # call the model in input
-def new_booking_assistant_node(state: State, config: RunnableConfig) -> Dict[Any]:
+def new_booking_assistant_node(state: State, config: RunnableConfig) -> Dict[str, Any]:
     """Process input and returns output.can use runtime configuration to alter behavior.
     """
-    llm_new_booking = _get_llm()
-    llm_new_booking = llm_new_booking.bind_tools([])
-    llm_new_booking_with_tools = llm_new_booking.bind_tools([book_appointment,search_for_doctor,check_doctor_availability,])
-    response = llm_new_booking_with_tools.invoke(state["messages"])
-    return {"messages": response}
+    llm_new_booking_with_tools = get_bound_llm("new_booking_assistant", new_booking_tools)
+    prompt = _agent_prompt("new_booking_assistant", state)
+    return _agent_reply("new_booking_assistant", llm_new_booking_with_tools, prompt)
 
-def router_model(state: State)  -> Command[Literal["cancel_booking_assistant", "new_booking_assistant","general_hospital_assistant", "audio_output", END]]:
-    """Route to correct worker agent, You only routing the conversation.
-    """
-    llm_router = _get_llm()
-    llm_router = llm_router.bind_tools([])
-    llm_router_with_tools = llm_router.bind_tools([cancel_booking_assistant,new_booking_assistant,general_hospital_assistant])
-
-    # trim the messages 
-    # trim_messages(
-    #     state['messages'],
-    #     # Keep the last <= n_count tokens of the messages.
-    #     strategy="last",
-    #     # Remember to adjust based on your model
-    #     # or else pass a custom token_counter
-    #     token_counter=count_tokens_approximately,
-    #     # Most chat models expect that chat history starts with either:
-    #     # (1) a HumanMessage or
-    #     # (2) a SystemMessage followed by a HumanMessage
-    #     # Remember to adjust based on the desired conversation
-    #     # length
-    #     max_tokens=45,
-    #     # Most chat models expect that chat history starts with either:
-    #     # (1) a HumanMessage or
-    #     # (2) a SystemMessage followed by a HumanMessage
-    #     start_on="human",
-    #     # Most chat models expect that chat history ends with either:
-    #     # (1) a HumanMessage or
-    #     # (2) a ToolMessage
-    #     end_on=("human", "tool"),
-    #     # Usually, we want to keep the SystemMessage
-    #     # if it's present in the original history.
-    #     # The SystemMessage has special instructions for the model.
-    #     include_system=True,
-    #     allow_partial=False,
-    # )
-
-    # make a custom prompt to instruct llm
-    custom_prompt = {
-    "role": "system",
-    "content": "You are a routing assistant. "
-                "Based on the message history, decide whether the conversation should be handed over to a specialized agent. "
-                "Use the appropriate tool to route the request."
-                "If Don't need tool reply that without tool calling."
-                "you can not use other tools on booking and cancelling."
-    }
-    messages_with_prompt = [custom_prompt] + state["messages"]
-
-    # before pass to llm trim messsages to reduce token usage
-    messages_with_prompt = trim_messages(
-                                        messages_with_prompt,
-                                        max_tokens=100,
-                                        strategy="last",
-                                        token_counter=dummy_token_counter,
-                                        # Most chat models expect that chat history starts with either:
-                                        # (1) a HumanMessage or
-                                        # (2) a SystemMessage followed by a HumanMessage
-                                        start_on="human",
-                                        # Usually, we want to keep the SystemMessage
-                                        # if it's present in the original history.
-                                        # The SystemMessage has special instructions for the model.
-                                        include_system=True,
-                                        allow_partial=False,
-                                    )
-    
-    # generate response
-    response = llm_router_with_tools.invoke(messages_with_prompt)
+async def anew_booking_assistant_node(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    llm_new_booking_with_tools = get_bound_llm("new_booking_assistant", new_booking_tools)
+    prompt = _agent_prompt("new_booking_assistant", state)
+    return await _aagent_reply("new_booking_assistant", llm_new_booking_with_tools, prompt)
+
+# token budget of the router prompt (system prompt included)
+ROUTER_MAX_TOKENS = int(os.getenv("ROUTER_MAX_TOKENS", "600"))
+
+ROUTES = ["cancel_booking_assistant", "new_booking_assistant", "reschedule_booking_assistant", "general_hospital_assistant"]
+
+def _fast_route(state: State) -> Optional[Command]:
+    # obvious intents are routed locally, skipping the LLM round trip
+    if os.getenv("ROUTER_FAST_PATH", "1") != "0":
+        decision = timed_classify(state["messages"])
+        if decision.intent is not None:
+            return Command(goto=decision.intent)
+    return None
+
+def _router_messages(state: State) -> list:
+    # the routing instructions are a static system prompt; the summary goes last
+    messages_with_prompt = assemble("router_assistant", elide_stale_results(state["messages"]), state.get("summary"))
 
+    # before pass to llm trim messsages to reduce token usage; counts are in real
+    # (calibrated) tokens and memoized per message, so only new messages are counted
+    trimmed = trim_messages(
+                        messages_with_prompt,
+                        max_tokens=ROUTER_MAX_TOKENS,
+                        strategy="last",
+                        token_counter=get_token_counter(),
+                        # Most chat models expect that chat history starts with either:
+                        # (1) a HumanMessage or
+                        # (2) a SystemMessage followed by a HumanMessage
+                        start_on="human",
+                        # Usually, we want to keep the SystemMessage
+                        # if it's present in the original history.
+                        # The SystemMessage has special instructions for the model.
+                        include_system=True,
+                        allow_partial=False,
+                    )
+    # a single message over the budget must still reach the router
+    if not any(isinstance(message, HumanMessage) for message in trimmed):
+        last_human = next((m for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), None)
+        if last_human is not None:
+            trimmed = [*trimmed[:1], last_human]
+    return trimmed
+
+def _route(response: AIMessage) -> Command:
     # if the router think to navigate to agent
     if hasattr(response, "tool_call") or hasattr(response, "tool_calls"):
         # get the tool name and route to relavant node
@@ -121,12 +187,12 @@ def router_model(state: State)  -> Command[Literal["cancel_booking_assistant", "
             tool_id = tool_call["id"]
 
             # if not relavant tool called
-            if tool_name not in ["cancel_booking_assistant", "new_booking_assistant","general_hospital_assistant"]:
+            if tool_name not in ROUTES:
                 return Command(
                         # next node to be executed next
                         goto=END,
                         # 
-                        update={"messages": [ToolMessage(content="not correct tool try to route correct specialized agent by cancel_booking_assistant,new_booking_assistant",tool_call_id=tool_id),HumanMessage(
+                        update={"messages": [ToolMessage(content="not correct tool try to route correct specialized agent by cancel_booking_assistant,new_booking_assistant,reschedule_booking_assistant",tool_call_id=tool_id),HumanMessage(
                             content="The last tool call raised an exception. Try calling a correct tool again. Do not repeat mistakes."
                                 ),]}
                 )
@@ -136,7 +202,7 @@ def router_model(state: State)  -> Command[Literal["cancel_booking_assistant", "
                 # next node to be executed next
                 goto=tool_name,
             )
-    
+
     # if the tool is not called and the llm provide the output
     return Command(
                 # next node to be executed next
@@ -145,84 +211,181 @@ def router_model(state: State)  -> Command[Literal["cancel_booking_assistant", "
                 update={"messages": response,}
             )
 
+def router_model(state: State)  -> Command[Literal["cancel_booking_assistant", "new_booking_assistant", "reschedule_booking_assistant", "general_hospital_assistant", "audio_output", END]]:
+    """Route to correct worker agent, You only routing the conversation.
+    """
+    fast_route = _fast_route(state)
+    if fast_route is not None:
+        return fast_route
+
+    llm_router_with_tools = get_bound_llm("router_assistant", router_tools)
+
+    # generate response
+    start = time.perf_counter()
+    prompt = _router_messages(state)
+    response = llm_router_with_tools.invoke(prompt)
+    router_metrics.record(LLM_TIER, time.perf_counter() - start)
+    get_token_counter().observe("router_assistant", prompt, response)
+    return _route(response)
+
+async def arouter_model(state: State)  -> Command[Literal["cancel_booking_assistant", "new_booking_assistant", "reschedule_booking_assistant", "general_hospital_assistant", "audio_output", END]]:
+    fast_route = _fast_route(state)
+    if fast_route is not None:
+        return fast_route
+
+    llm_router_with_tools = get_bound_llm("router_assistant", router_tools)
+
+    # generate response
+    start = time.perf_counter()
+    prompt = _router_messages(state)
+    response = await llm_router_with_tools.ainvoke(prompt)
+    router_metrics.record(LLM_TIER, time.perf_counter() - start)
+    get_token_counter().observe("router_assistant", prompt, response)
+    return _route(response)
+
 # make cancel appointment node
-def cancel_booking_assistant_node(state: State) -> Dict[Any]:
-    llm_cancel_booking = _get_llm()
-    llm_cancel_booking = llm_cancel_booking.bind_tools([])
-    llm_cancel_booking_with_tools = llm_cancel_booking.bind_tools([cancel_appointment,search_for_appointment])
-    response = llm_cancel_booking_with_tools.invoke(state["messages"])
-    return {"messages": response}
-
-def rag_node(state: State) -> Dict[Any]:
-    # create vector store
-    file_path = "C:/Users/janit/OneDrive/Desktop/AI-Agent-for-Healthcare-Appointment-Booking/new-langgraph-project-main/src/agent/Scope-of-Services-Statement-of-Purpose.pdf"
-    pages = load_document(file_path)
-    documents = split_text(pages)
-    vectorstore = create_vectorstore(documents)
-    
-    # make the tool
-    tool = get_retriever_tool(vectorstore)
-
-    # then retrieve the context based on the question 
+def cancel_booking_assistant_node(state: State) -> Dict[str, Any]:
+    llm_cancel_booking_with_tools = get_bound_llm("cancel_booking_assistant", cancel_booking_tools)
+    prompt = _agent_prompt("cancel_booking_assistant", state)
+    return _agent_reply("cancel_booking_assistant", llm_cancel_booking_with_tools, prompt)
+
+async def acancel_booking_assistant_node(state: State) -> Dict[str, Any]:
+    llm_cancel_booking_with_tools = get_bound_llm("cancel_booking_assistant", cancel_booking_tools)
+    prompt = _agent_prompt("cancel_booking_assistant", state)
+    return await _aagent_reply("cancel_booking_assistant", llm_cancel_booking_with_tools, prompt)
+
+# make reschedule appointment node: the appointment is moved in one step,
+# instead of a cancellation followed by a new booking
+def reschedule_booking_assistant_node(state: State) -> Dict[str, Any]:
+    llm_reschedule_booking_with_tools = get_bound_llm("reschedule_booking_assistant", reschedule_booking_tools)
+    prompt = _agent_prompt("reschedule_booking_assistant", state)
+    return _agent_reply("reschedule_booking_assistant", llm_reschedule_booking_with_tools, prompt)
+
+async def areschedule_booking_assistant_node(state: State) -> Dict[str, Any]:
+    llm_reschedule_booking_with_tools = get_bound_llm("reschedule_booking_assistant", reschedule_booking_tools)
+    prompt = _agent_prompt("reschedule_booking_assistant", state)
+    return await _aagent_reply("reschedule_booking_assistant", llm_reschedule_booking_with_tools, prompt)
+
+def _rag_prompt(question: str, documents: list) -> list:
+    # static instructions first; the retrieved context and the question go last
+    context = "\n\n".join(doc.page_content for doc in documents)
+    return [system_prompt("general_hospital_assistant"), HumanMessage(content=f"Context: {context}\n\nQuestion: {question}")]
+
+def _hospital_id(config: RunnableConfig) -> str:
+    # one deployment serves several hospitals; each run names its own
+    return str(config.get("configurable", {}).get("hospital_id") or DEFAULT_HOSPITAL)
+
+def _hospital_index(hospital_id: str) -> HospitalIndex:
+    # the knowledge base is built once, persisted, and reloaded only when a document changes;
+    # a hospital without documents of its own gets the default view
+    return get_knowledge_base().for_hospital(hospital_id)
+
+def _answer_cache(hospital_id: str) -> Optional[SemanticAnswerCache]:
+    return get_answer_cache(hospital_id) if answer_cache_enabled() else None
+
+def _is_cacheable(response: AIMessage) -> bool:
+    return isinstance(response.content, str) and bool(response.content) and not response.tool_calls
+
+def rag_node(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    index = _hospital_index(_hospital_id(config))
     question = state["messages"][-1].content
-    # generate answer
-    context = tool.invoke({"query": question}) 
+    start = time.perf_counter()
+
+    # near-duplicate questions are answered from the semantic cache
+    cache = _answer_cache(index.hospital_id)
+    if cache is not None:
+        vector = index.embed_query(question)
+        cached = cache.lookup(vector, index.version)
+        if cached is not None:
+            return {'messages': AIMessage(content=cached.answer)}
+
+    # retrieve the context once for the latest question (the query embedding is reused)
+    documents = index.as_retriever(search_kwargs={"k": 4}).invoke(question)
 
     # generate answer
-    GENERATE_PROMPT = (
-    "You are an assistant for question-answering tasks. "
-    "Use the following pieces of retrieved context to answer the question. "
-    "If you don't know the answer, just say that you don't know. "
-    "Use three sentences maximum and keep the answer concise.\n"
-    "Question: {question} \n"
-    "Context: {context}"
-    )
+    general_hospital_llm = get_bound_llm("general_hospital_assistant")
+    prompt = _rag_prompt(question, documents)
+    response = general_hospital_llm.invoke(prompt)
+    get_token_counter().observe("general_hospital_assistant", prompt, response)
 
-    context = tool.invoke({"query": question})
+    if cache is not None and _is_cacheable(response):
+        cache.put(question, vector, response.content, index.version, time.perf_counter() - start)
+    return {'messages': response}
+
+async def arag_node(state: State, config: RunnableConfig) -> Dict[str, Any]:
+    # loading and embedding are blocking, so they run off the event loop
+    index = await asyncio.to_thread(_hospital_index, _hospital_id(config))
+    question = state["messages"][-1].content
+    start = time.perf_counter()
 
-    # create the prompt
-    prompt = GENERATE_PROMPT.format(question=question, context=context)
+    cache = _answer_cache(index.hospital_id)
+    if cache is not None:
+        vector = await asyncio.to_thread(index.embed_query, question)
+        cached = cache.lookup(vector, index.version)
+        if cached is not None:
+            return {'messages': AIMessage(content=cached.answer)}
 
-    # generate answer
-    general_hospital_llm = _get_llm()
-    response = general_hospital_llm.invoke([{"role": "user", "content": prompt}])
+    documents = await index.as_retriever(search_kwargs={"k": 4}).ainvoke(question)
 
+    general_hospital_llm = get_bound_llm("general_hospital_assistant")
+    prompt = _rag_prompt(question, documents)
+    response = await general_hospital_llm.ainvoke(prompt)
+    get_token_counter().observe("general_hospital_assistant", prompt, response)
+
+    if cache is not None and _is_cacheable(response):
+        cache.put(question, vector, response.content, index.version, time.perf_counter() - start)
     return {'messages': response}
 
 
 
 def convert_to_voice(state: State):
-    elevenlabs = ElevenLabs(
-    api_key=os.getenv("ELEVENLABS_API_KEY"),
-    )
     # get the last ai message
     last_message = state["messages"][-1]
-    # check if it is an ai message
 
+    # agent replies were already spoken while they were generated; any other
+    # finished reply is synthesized and played sentence by sentence on a
+    # background loop, so the graph worker is released as soon as it is handed off
+    if last_message.id != state.get("spoken"):
+        get_speech_player().submit(last_message.content)
 
-    audio = elevenlabs.text_to_speech.convert(
-    text=last_message.content,
-    voice_id="Xb7hH8MSUJpSbSDYk0k2",
-    model_id="eleven_multilingual_v2",
-    output_format="mp3_44100_128",
-    )
+    return
 
-    play(audio)
+async def aconvert_to_voice(state: State):
+    # submitting only schedules work on the speech loop, so it is safe on the event loop
+    last_message = state["messages"][-1]
+    if last_message.id != state.get("spoken"):
+        get_speech_player().submit(last_message.content)
 
     return
 
 
+def _node(func, afunc) -> RunnableLambda:
+    # sync invoke/stream uses func, ainvoke/astream uses afunc
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
+def _tool_node(name: str, tools: list, role: str) -> RunnableLambda:
+    # runs the independent calls of one turn concurrently, batching same-tool reads,
+    # and hands `role` its results in compact form
+    executor = ToolExecutor(tools, encoder=get_result_encoder(role))
+    return RunnableLambda(executor.invoke, afunc=executor.ainvoke, name=name)
+
+
 # Define the graph
 graph_builder = StateGraph(State)
-graph_builder.add_node("router_assistant", router_model)
-graph_builder.add_node("new_booking_assistant", new_booking_assistant_node)
-graph_builder.add_node("cancel_booking_assistant", cancel_booking_assistant_node)
-graph_builder.add_node("general_hospital_assistant", rag_node)
-graph_builder.add_node("new_booking_tools", ToolNode([book_appointment, search_for_doctor,check_doctor_availability]))
-graph_builder.add_node("cancel_booking_tools", ToolNode([cancel_appointment, search_for_appointment]))
-graph_builder.add_node("audio_output", convert_to_voice)
+graph_builder.add_node("compact_history", _node(compact_history, acompact_history))
+graph_builder.add_node("router_assistant", _node(router_model, arouter_model), destinations=(*ROUTES, "audio_output", END))
+graph_builder.add_node("new_booking_assistant", _node(new_booking_assistant_node, anew_booking_assistant_node))
+graph_builder.add_node("cancel_booking_assistant", _node(cancel_booking_assistant_node, acancel_booking_assistant_node))
+graph_builder.add_node("reschedule_booking_assistant", _node(reschedule_booking_assistant_node, areschedule_booking_assistant_node))
+graph_builder.add_node("general_hospital_assistant", _node(rag_node, arag_node))
+graph_builder.add_node("new_booking_tools", _tool_node("new_booking_tools", new_booking_tools, "new_booking_assistant"))
+graph_builder.add_node("cancel_booking_tools", _tool_node("cancel_booking_tools", cancel_booking_tools, "cancel_booking_assistant"))
+graph_builder.add_node("reschedule_booking_tools", _tool_node("reschedule_booking_tools", reschedule_booking_tools, "reschedule_booking_assistant"))
+graph_builder.add_node("audio_output", _node(convert_to_voice, aconvert_to_voice))
 
-graph_builder.set_entry_point("router_assistant")
+graph_builder.set_entry_point("compact_history")
+graph_builder.add_edge("compact_history", "router_assistant")
 
 # Conditional edge: if tool call, go to "tools", else END
 graph_builder.add_conditional_edges(
@@ -238,11 +401,54 @@ graph_builder.add_conditional_edges(
     {"tools": "cancel_booking_tools", "__end__": "audio_output"}
 )
 
+# Conditional edge: if tool call, go to "tools", else END
+graph_builder.add_conditional_edges(
+    "reschedule_booking_assistant",
+    tools_condition,
+    {"tools": "reschedule_booking_tools", "__end__": "audio_output"}
+)
+
 # After tools, return to LLM node
 graph_builder.add_edge("new_booking_tools", "new_booking_assistant")
 graph_builder.add_edge("cancel_booking_tools", "cancel_booking_assistant")
-graph_builder.add_edge("new_booking_assistant", "audio_output")
-graph_builder.add_edge("cancel_booking_assistant", "audio_output")
+graph_builder.add_edge("reschedule_booking_tools", "reschedule_booking_assistant")
 graph_builder.add_edge("general_hospital_assistant", "audio_output")
 graph_builder.add_edge("audio_output", END)
-graph = graph_builder.compile()
\ No newline at end of file
+
+def _warm_bound_llms() -> None:
+    # imports the Gemini SDK and binds every agent's tools once
+    for role, tools in (
+        ("router_assistant", router_tools),
+        ("new_booking_assistant", new_booking_tools),
+        ("cancel_booking_assistant", cancel_booking_tools),
+        ("reschedule_booking_assistant", reschedule_booking_tools),
+        ("general_hospital_assistant", ()),
+        ("history_summarizer", ()),
+    ):
+        get_bound_llm(role, tools)
+
+# run in this order after a worker starts, most likely first use first
+warm_up_hooks.extend([
+    ("database", lambda: get_repository().pool.connection()),
+    ("intent_classifier", get_intent_classifier),
+    ("bound_llms", _warm_bound_llms),
+    ("speech", warm_up_speech),
+    ("knowledge_base", get_knowledge_base),
+])
+
+
+def build_graph(checkpointer: Any = None, warm_up: Optional[bool] = None) -> Any:
+    """Compile the agent graph.
+
+    Args:
+        checkpointer: Checkpointer persisting conversations (none by default).
+        warm_up: Start warming clients in the background (default: the WARM_UP setting).
+    """
+    # spans and metrics are attached only when TELEMETRY is set
+    compiled = instrument(graph_builder.compile(checkpointer=checkpointer))
+    if warm_up_enabled() if warm_up is None else warm_up:
+        warm_up_in_background()
+    return compiled
+
+# persisted when CHECKPOINT_DB_PATH is set; the LangGraph server brings its own checkpointer
+graph = build_graph(get_checkpointer())
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""Semantic cache of hospital-information answers.
+
+The general assistant answers from the hospital document alone, so an answer
+depends only on the question. Answers are cached against the question's
+embedding; a later question whose embedding is within `threshold` cosine
+similarity is answered from the cache, skipping retrieval and generation.
+Entries expire after `ttl_seconds`, the least recently used entry is evicted
+when the cache is full, and everything is dropped when the index version
+(source document digest and embedder) changes.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    """An answer served from the cache."""
+
+    question: str
+    answer: str
+    similarity: float
+
+
+class AnswerCacheMetrics:
+    """Counts cache hits and misses and estimates the latency saved by hits."""
+
+    def __init__(self) -> None:
+        """Start with empty counters."""
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.listeners: List[Callable[[bool, float], None]] = []
+
+    def record(self, hit: bool, saved_seconds: float = 0.0) -> None:
+        """Record one lookup and, for a hit, the latency it saved."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved_seconds += saved_seconds
+            else:
+                self.misses += 1
+        for listener in self.listeners:
+            listener(hit, saved_seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return lookups, hit rate and total latency saved."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "lookups": float(lookups),
+                "hits": float(self.hits),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": self.saved_seconds,
+            }
+
+
+# Process-wide answer cache metrics
+answer_cache_metrics = AnswerCacheMetrics()
+
+
+class SemanticAnswerCache:
+    """Fixed-capacity embedding-keyed answer cache with TTL and LRU eviction.
+
+    Keys live in one preallocated float32 matrix, so a lookup is a single
+    matrix-vector product over the occupied rows.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 512,
+        threshold: float = 0.92,
+        ttl_seconds: float = 3600.0,
+        metrics: Optional[AnswerCacheMetrics] = None,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            capacity: Maximum number of cached answers.
+            threshold: Minimum cosine similarity for a question to count as a repeat.
+            ttl_seconds: Lifetime of an entry.
+            metrics: Where hits and misses are recorded (the process-wide metrics by default).
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics if metrics is not None else answer_cache_metrics
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._keys: Optional[np.ndarray] = None
+        self._questions: List[str] = []
+        self._answers: List[str] = []
+        self._costs = np.zeros(capacity, dtype=np.float64)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._used = np.zeros(capacity, dtype=np.int64)
+        self._tick = 0
+
+    def __len__(self) -> int:
+        """Return the number of stored entries, including expired ones not yet evicted."""
+        return len(self._answers)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._questions.clear()
+            self._answers.clear()
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            self._questions.clear()
+            self._answers.clear()
+            self.version = version
+
+    def lookup(self, vector: np.ndarray, version: str) -> Optional[CachedAnswer]:
+        """Return the cached answer closest to the normalized `vector`, if it is similar enough."""
+        start = time.perf_counter()
+        with self._lock:
+            self._check_version(version)
+            size = len(self._answers)
+            hit = None
+            if size and self._keys is not None:
+                scores = self._keys[:size] @ vector
+                scores[self._expires[:size] <= time.monotonic()] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._tick += 1
+                    self._used[best] = self._tick
+                    hit = best, CachedAnswer(self._questions[best], self._answers[best], float(scores[best]))
+        if hit is None:
+            self.metrics.record(False)
+            return None
+        slot, answer = hit
+        self.metrics.record(True, max(0.0, float(self._costs[slot]) - (time.perf_counter() - start)))
+        return answer
+
+    def put(self, question: str, vector: np.ndarray, answer: str, version: str, cost_seconds: float = 0.0) -> None:
+        """Store an answer; `cost_seconds` is what producing it took, credited to later hits."""
+        with self._lock:
+            self._check_version(version)
+            if self._keys is None or self._keys.shape[1] != vector.shape[0]:
+                self._keys = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._questions.clear()
+                self._answers.clear()
+            size = len(self._answers)
+            now = time.monotonic()
+            if size < self.capacity:
+                slot = size
+                self._questions.append(question)
+                self._answers.append(answer)
+            else:
+                # reuse an expired slot, or else the least recently used one
+                expired = np.flatnonzero(self._expires[:size] <= now)
+                slot = int(expired[0]) if expired.size else int(np.argmin(self._used[:size]))
+                self._questions[slot] = question
+                self._answers[slot] = answer
+            self._tick += 1
+            self._keys[slot] = vector
+            self._costs[slot] = cost_seconds
+            self._expires[slot] = now + self.ttl_seconds
+            self._used[slot] = self._tick
+
+
+def answer_cache_enabled() -> bool:
+    """Return False when ANSWER_CACHE is set to 0."""
+    return os.getenv("ANSWER_CACHE", "1") != "0"
+
+
+# Hospitals whose answer caches are kept; the least recently used cache is dropped beyond it
+MAX_NAMESPACES = 32
+
+
+# One cache per hospital, so hospitals neither share answers nor evict each other's
+@lru_cache(maxsize=MAX_NAMESPACES)
+def get_answer_cache(namespace: str = "default") -> SemanticAnswerCache:
+    """Return the answer cache of a namespace, configured from the environment.
+
+    Callers pass a validated hospital ID (`KnowledgeBase.for_hospital`), not raw request input.
+    """
+    return SemanticAnswerCache(
+        capacity=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    )
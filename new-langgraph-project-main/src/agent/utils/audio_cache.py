@@ -0,0 +1,219 @@
+"""Content-addressed disk cache of synthesized speech.
+
+Many replies repeat word for word: booking confirmations, "Appointment not
+found.", greetings and clarifying questions. Speech is synthesized one
+sentence-sized chunk at a time, so the cache stores the audio of each chunk
+under a hash of its normalized text and the voice, model and output format
+it was rendered with. A hit is read back through a memory map and costs
+neither synthesis latency nor per-character charges.
+
+Entries are plain files named by their key, written atomically, so several
+workers can share one directory. The cache is bounded in bytes; the least
+recently used files are evicted first, with recency kept in file
+modification times so it survives restarts. Each process indexes the
+directory in memory; a key missing from the index is looked up on disk, and
+the index is rebuilt before a write when another process changed the
+directory, so the bound holds for the directory as a whole.
+
+Replies known in advance, e.g. taken from transcripts, can be rendered at
+deploy time, one reply per line. Each is split into chunks exactly as a
+spoken reply is, so the cached chunks are the ones the same reply asks for:
+
+    python -m agent.utils.audio_cache --file replies.txt
+"""
+
+import argparse
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Sequence
+
+# Directory of cached audio and its size bound
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "agent-tts")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Size of the frames a cache hit is served in
+FRAME_SIZE = 16 * 1024
+SUFFIX = ".audio"
+
+# Called with (hit, characters) after every cache lookup
+AudioCacheListener = Callable[[bool, int], None]
+audio_cache_listeners: List[AudioCacheListener] = []
+
+
+def normalize_text(text: str) -> str:
+    """Return the form of `text` that is hashed: NFKC, with runs of whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    """Return the key of the audio for `text` in one voice, model and output format."""
+    material = "\x1f".join((voice_id, model_id, output_format, normalize_text(text)))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Size-bounded LRU cache of audio files, keyed by `cache_key`."""
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES) -> None:
+        """Open (or create) the cache in `directory` and index the files already there."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self.total_bytes = 0
+        # modification time of the directory when the index last matched it
+        self._scanned = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._scan()
+            self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _directory_mtime(self) -> int:
+        return os.stat(self.directory).st_mtime_ns
+
+    def _scan(self) -> None:
+        # caller holds the lock; rebuild the index from the files on disk
+        self._scanned = self._directory_mtime()
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, name[:-len(SUFFIX)], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self.total_bytes = sum(self._entries.values())
+
+    def _adopt(self, key: str) -> bool:
+        # caller holds the lock; index a file another process wrote, if it is there
+        try:
+            size = os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return False
+        self._entries[key] = size
+        self.total_bytes += size
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        """Return whether `key` is cached."""
+        with self._lock:
+            return key in self._entries or self._adopt(key)
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def read(self, key: str, frame_size: int = FRAME_SIZE) -> Optional[Iterator[bytes]]:
+        """Return the cached audio of `key` as frames read from a memory map, or None on a miss."""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries and not self._adopt(key):
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # evicted by another worker, or an empty file
+            self._forget(key)
+            return None
+        return self._frames(mapped, frame_size)
+
+    @staticmethod
+    def _frames(mapped: mmap.mmap, frame_size: int) -> Iterator[bytes]:
+        try:
+            for start in range(0, len(mapped), frame_size):
+                yield mapped[start:start + frame_size]
+        finally:
+            mapped.close()
+
+    def write(self, key: str, audio: bytes) -> None:
+        """Store the audio of `key`, evicting least recently used entries beyond `max_bytes`."""
+        if not audio or len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            # other processes wrote or evicted since: count their files against the bound too
+            stale = self._directory_mtime() != self._scanned
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(audio)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        with self._lock:
+            if stale:
+                self._scan()
+            self.total_bytes += len(audio) - self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._evict()
+            self._scanned = self._directory_mtime()
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+def tts_cache_enabled() -> bool:
+    """Return whether synthesized speech is cached on disk (TTS_CACHE=1)."""
+    return os.getenv("TTS_CACHE", "1") == "1"
+
+
+@lru_cache(maxsize=1)
+def get_audio_cache() -> AudioCache:
+    """Return the process-wide audio cache."""
+    return AudioCache()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command-line entry point: render replies into the cache with the configured backend."""
+    from agent.utils.tts import drain_sink, get_tts_backend, stream_speech
+
+    parser = argparse.ArgumentParser(description="Render speech into the TTS cache ahead of time.")
+    parser.add_argument("replies", nargs="*", help="replies to render, as the assistant speaks them")
+    parser.add_argument("--file", help="file of replies to render, one per line")
+    args = parser.parse_args(argv)
+    replies = list(args.replies)
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            replies += [line.strip() for line in file if line.strip()]
+    if not replies:
+        parser.error("no replies given")
+    backend = get_tts_backend()
+
+    async def render() -> int:
+        total = 0
+        for reply in replies:
+            total += await drain_sink(stream_speech(reply, backend))
+        return total
+
+    rendered = asyncio.run(render())
+    cache = get_audio_cache()
+    print(f"{cache.directory}: {len(cache)} entries, {cache.total_bytes} bytes ({rendered} bytes rendered)")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
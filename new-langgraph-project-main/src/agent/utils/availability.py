@@ -0,0 +1,189 @@
+"""In-memory doctor availability calendar.
+
+Each doctor's day is a bitmap with one bit per slot between opening and
+closing time (bit set = booked). A doctor's upcoming appointments are loaded
+with one indexed query on first use, then kept in sync by the booking engine
+after every committed write and refreshed after `ttl_seconds` to pick up
+writes made by other processes. Finding the next free slots is then pure
+bit arithmetic, with no SQL round trip per probed time.
+
+The index is advisory: until a refresh it does not see other processes'
+bookings, so a free slot is confirmed against the database before it is
+reported as available, and bookings themselves rely on the unique slot index.
+"""
+
+import threading
+import time as _time
+from datetime import date as _date
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agent.utils.db import HospitalRepository, get_repository
+
+# Clinic opening hours, as [start, end) hours of the day
+OPENING_HOUR = 8
+CLOSING_HOUR = 22
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = (CLOSING_HOUR - OPENING_HOUR) * 60 // SLOT_MINUTES
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+
+def slot_of(time: str) -> Optional[int]:
+    """Return the slot index containing 'HH:MM', or None if it is outside opening hours."""
+    try:
+        parsed = datetime.strptime(time, "%H:%M")
+    except ValueError:
+        return None
+    minutes = (parsed.hour - OPENING_HOUR) * 60 + parsed.minute
+    if not 0 <= minutes < SLOTS_PER_DAY * SLOT_MINUTES:
+        return None
+    return minutes // SLOT_MINUTES
+
+
+def time_of(slot: int) -> str:
+    """Return the 'HH:MM' start time of a slot index."""
+    minutes = OPENING_HOUR * 60 + slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _iter_bits(bitmap: int) -> Iterable[int]:
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+class AvailabilityIndex:
+    """Per-doctor, per-day booked-slot bitmaps backed by the Appointment table."""
+
+    def __init__(self, repository: HospitalRepository, ttl_seconds: float = 30.0) -> None:
+        """Create an empty index; doctors are loaded lazily on first lookup."""
+        self.repository = repository
+        self.ttl_seconds = ttl_seconds
+        self._days: Dict[int, Dict[str, int]] = {}
+        self._loaded_at: Dict[int, float] = {}
+        # bumped by every write and invalidation, so a reload that raced one is dropped
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _calendar(self, doctor_id: int) -> Dict[str, int]:
+        with self._lock:
+            days = self._days.get(doctor_id)
+            loaded_at = self._loaded_at.get(doctor_id, 0.0)
+            generation = self._generations.get(doctor_id, 0)
+        if days is not None and _time.monotonic() - loaded_at < self.ttl_seconds:
+            return days
+
+        days = {}
+        for day, time in self.repository.booked_slots(doctor_id, _date.today().isoformat()):
+            slot = slot_of(time)
+            if slot is not None:
+                days[day] = days.get(day, 0) | (1 << slot)
+        with self._lock:
+            # a write committed during the load may be missing from it; keep it uncached
+            if self._generations.get(doctor_id, 0) == generation:
+                self._days[doctor_id] = days
+                self._loaded_at[doctor_id] = _time.monotonic()
+        return days
+
+    def _set(self, doctor_id: int, day: str, time: str, booked: bool) -> None:
+        slot = slot_of(time)
+        if slot is None:
+            return
+        with self._lock:
+            self._generations[doctor_id] = self._generations.get(doctor_id, 0) + 1
+            days = self._days.get(doctor_id)
+            if days is None:
+                return
+            if booked:
+                days[day] = days.get(day, 0) | (1 << slot)
+            else:
+                days[day] = days.get(day, 0) & ~(1 << slot)
+
+    def mark_booked(self, doctor_id: int, day: str, time: str) -> None:
+        """Record a committed booking."""
+        self._set(doctor_id, day, time, True)
+
+    def mark_free(self, doctor_id: int, day: str, time: str) -> None:
+        """Record a committed cancellation."""
+        self._set(doctor_id, day, time, False)
+
+    def invalidate(self, doctor_id: Optional[int] = None) -> None:
+        """Drop cached calendars so they are reloaded on next use."""
+        with self._lock:
+            doctor_ids = list(self._generations.keys() | self._days.keys()) if doctor_id is None else [doctor_id]
+            for stale in doctor_ids:
+                self._generations[stale] = self._generations.get(stale, 0) + 1
+                self._days.pop(stale, None)
+                self._loaded_at.pop(stale, None)
+
+    def warm(self, doctor_ids: Iterable[int]) -> None:
+        """Load the calendars of `doctor_ids` ahead of their first lookup."""
+        for doctor_id in doctor_ids:
+            self._calendar(doctor_id)
+
+    def cached_is_free(self, doctor_id: int, day: str, time: str) -> Optional[bool]:
+        """Answer `is_free` from a fresh loaded calendar, or return None if that would need a query.
+
+        Only times on a slot boundary are answered, since the database matches exact times.
+        The answer is advisory: a booked slot is booked, but a free one may have been
+        taken by another process since the calendar was loaded.
+        """
+        slot = slot_of(time)
+        if slot is None or time_of(slot) != time:
+            return None
+        with self._lock:
+            days = self._days.get(doctor_id)
+            loaded_at = self._loaded_at.get(doctor_id, 0.0)
+            if days is None or _time.monotonic() - loaded_at >= self.ttl_seconds:
+                return None
+            return not (days.get(day, 0) >> slot) & 1
+
+    def is_free(self, doctor_id: int, day: str, time: str) -> bool:
+        """Return True if the slot containing `time` has no booking."""
+        slot = slot_of(time)
+        if slot is None:
+            return False
+        return not (self._calendar(doctor_id).get(day, 0) >> slot) & 1
+
+    def next_free_slots(
+        self,
+        doctor_ids: List[int],
+        start: _date,
+        end: _date,
+        limit: int = 5,
+        now: Optional[datetime] = None,
+    ) -> List[Tuple[int, str, str]]:
+        """Return up to `limit` (doctor_id, date, time) free slots in date-then-time order."""
+        now = now or datetime.now()
+        calendars = {doctor_id: self._calendar(doctor_id) for doctor_id in doctor_ids}
+        found: List[Tuple[int, str, str]] = []
+        day = max(start, now.date())
+        while day <= end and len(found) < limit:
+            key = day.isoformat()
+            mask = FULL_DAY
+            if day == now.date():
+                # hide slots that have already started today
+                elapsed = (now.hour - OPENING_HOUR) * 60 + now.minute
+                mask &= ~((1 << max(0, min(SLOTS_PER_DAY, elapsed // SLOT_MINUTES + 1))) - 1)
+            candidates = [
+                (slot, doctor_id)
+                for doctor_id, calendar in calendars.items()
+                for slot in _iter_bits(mask & ~calendar.get(key, 0))
+            ]
+            for slot, doctor_id in sorted(candidates)[: limit - len(found)]:
+                found.append((doctor_id, key, time_of(slot)))
+            day += timedelta(days=1)
+        return found
+
+
+@lru_cache(maxsize=1)
+def _index_for(repository: HospitalRepository) -> AvailabilityIndex:
+    return AvailabilityIndex(repository)
+
+
+def get_availability_index() -> AvailabilityIndex:
+    """Return the availability index of the process-wide repository."""
+    return _index_for(get_repository())
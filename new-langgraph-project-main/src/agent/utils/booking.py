@@ -0,0 +1,116 @@
+"""Constraint-backed booking engine.
+
+Reservations are single statements and moves a single write transaction,
+both guarded by the unique `(Doctor_ID, Appointment_Date, Appointment_Time)`
+index, so two concurrent callers can never double-book a slot and no
+SELECT-then-write window exists.
+Every outcome is returned as a `BookingResult` with a machine-readable error
+code the agents can act on, and every committed write is mirrored into the
+in-memory availability index.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+from agent.utils.availability import (
+    CLOSING_HOUR,
+    OPENING_HOUR,
+    AvailabilityIndex,
+    get_availability_index,
+)
+from agent.utils.db import HospitalRepository, get_repository, normalize_slot
+
+# Error codes returned in BookingResult.error
+SLOT_TAKEN = "slot_taken"
+NOT_FOUND = "not_found"
+INVALID_FORMAT = "invalid_format"
+PAST_TIME = "past_time"
+OUTSIDE_HOURS = "outside_hours"
+
+
+@dataclass(frozen=True)
+class BookingResult:
+    """Outcome of a booking operation."""
+
+    success: bool
+    message: str
+    error: Optional[str] = None
+    appointment_id: Optional[int] = None
+
+    def to_json(self) -> str:
+        """Serialize the result for a tool response, omitting empty fields."""
+        return json.dumps({key: value for key, value in asdict(self).items() if value is not None})
+
+
+def _invalid_format() -> BookingResult:
+    return BookingResult(False, "Invalid date or time format. Use YYYY-MM-DD and HH:MM.", INVALID_FORMAT)
+
+
+def validate_slot(date: str, time: str, now: Optional[datetime] = None) -> Optional[BookingResult]:
+    """Return a failed BookingResult if `date` `time` cannot be booked, or None if it is valid."""
+    try:
+        appointment_datetime = datetime.strptime(" ".join(normalize_slot(date, time)), "%Y-%m-%d %H:%M")
+    except ValueError:
+        return _invalid_format()
+
+    if appointment_datetime <= (now or datetime.now()):
+        return BookingResult(False, "Appointment must be booked for a future time.", PAST_TIME)
+
+    if not (OPENING_HOUR <= appointment_datetime.hour < CLOSING_HOUR):
+        return BookingResult(False, "Appointment time must be between 08:00 and 22:00.", OUTSIDE_HOURS)
+
+    return None
+
+
+class BookingEngine:
+    """Reserve, move and cancel appointments atomically."""
+
+    def __init__(self, repository: HospitalRepository, index: Optional[AvailabilityIndex] = None) -> None:
+        """Bind the engine to a repository and the availability index it keeps in sync."""
+        self.repository = repository
+        self.index = index
+
+    def reserve(self, patient_id: int, doctor_id: int, date: str, time: str) -> BookingResult:
+        """Reserve a slot for a patient; a taken slot is reported as SLOT_TAKEN."""
+        try:
+            date, time = normalize_slot(date, time)
+        except ValueError:
+            return _invalid_format()
+        appointment_id = self.repository.create_appointment(patient_id, doctor_id, date, time)
+        if appointment_id is None:
+            return BookingResult(False, "Doctor is not available at this date and time.", SLOT_TAKEN)
+        if self.index is not None:
+            self.index.mark_booked(doctor_id, date, time)
+        return BookingResult(True, "Appointment booked successfully.", appointment_id=appointment_id)
+
+    def move(self, appointment_id: int, date: str, time: str) -> BookingResult:
+        """Move an appointment to a new slot of the same doctor; the old slot is freed atomically."""
+        try:
+            date, time = normalize_slot(date, time)
+        except ValueError:
+            return _invalid_format()
+        before, after = self.repository.move_appointment(appointment_id, date, time)
+        if before is None:
+            return BookingResult(False, "Appointment not found.", NOT_FOUND)
+        if after is None:
+            return BookingResult(False, "Doctor is not available at the requested time.", SLOT_TAKEN)
+        if self.index is not None:
+            self.index.mark_free(before["doctor_id"], before["date"], before["time"])
+            self.index.mark_booked(after["doctor_id"], after["date"], after["time"])
+        return BookingResult(True, "Appointment Rescheduled successfully.", appointment_id=appointment_id)
+
+    def cancel(self, appointment_id: int) -> BookingResult:
+        """Cancel an appointment."""
+        cancelled = self.repository.delete_appointment(appointment_id)
+        if cancelled is None:
+            return BookingResult(False, "Appointment not found.", NOT_FOUND)
+        if self.index is not None:
+            self.index.mark_free(cancelled["doctor_id"], cancelled["date"], cancelled["time"])
+        return BookingResult(True, "Appointment cancelled successfully.", appointment_id=appointment_id)
+
+
+def get_booking_engine() -> BookingEngine:
+    """Return a booking engine over the process-wide repository and availability index."""
+    return BookingEngine(get_repository(), get_availability_index())
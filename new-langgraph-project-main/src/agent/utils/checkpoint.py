@@ -0,0 +1,85 @@
+"""SQLite-backed conversation checkpointer.
+
+With CHECKPOINT_DB_PATH set, the graph persists every step of every thread to
+that file, so a call can be resumed with the same `thread_id` after a process
+restart. The LangGraph server supplies its own checkpointer, so persistence
+is off by default.
+"""
+
+import asyncio
+import os
+import sqlite3
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """SqliteSaver whose async methods run the sync ones on a worker thread.
+
+    SqliteSaver already serializes access to its connection with a lock, so the
+    same checkpointer can back both `graph.invoke` and `graph.ainvoke`.
+    """
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Fetch a checkpoint tuple without blocking the event loop."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """List checkpoints without blocking the event loop."""
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint without blocking the event loop."""
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes without blocking the event loop."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Delete a thread's checkpoints without blocking the event loop."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def sqlite_checkpointer(path: str) -> ThreadedSqliteSaver:
+    """Open (and create if needed) a checkpoint database at `path`."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    saver = ThreadedSqliteSaver(conn)
+    saver.setup()
+    return saver
+
+
+def get_checkpointer() -> Optional[ThreadedSqliteSaver]:
+    """Return the checkpointer configured by CHECKPOINT_DB_PATH, or None."""
+    path = os.getenv("CHECKPOINT_DB_PATH")
+    return sqlite_checkpointer(path) if path else None
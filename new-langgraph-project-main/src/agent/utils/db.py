@@ -1,16 +1,728 @@
+"""Pooled SQLite data-access layer shared by the booking tools.
+
+Every tool goes through `get_repository()`, which hands out one long-lived
+connection per thread. Async callers run queries on a dedicated, bounded
+thread pool (`run_in_db_executor`) so the event loop is never blocked. Connections run in WAL mode with `synchronous=NORMAL`,
+so readers never block the writer and commits do not fsync per statement.
+All SQL is kept as module-level constants so sqlite3's per-connection
+statement cache reuses the prepared statements across calls.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypedDict,
+    TypeVar,
+    Union,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'appointments.db')
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+# Idempotent schema migrations applied once per pool. The unique slot index is
+# what makes a reservation race-free: the database, not a prior SELECT, rejects
+# a second booking for the same doctor, date and time.
+UNIQUE_SLOT_INDEX = """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_appointment_doctor_slot
+    ON Appointment (Doctor_ID, Appointment_Date, Appointment_Time)
+"""
+SCHEMA_MIGRATIONS = (
+    UNIQUE_SLOT_INDEX,
+    """
+    CREATE INDEX IF NOT EXISTS ix_appointment_patient
+    ON Appointment (Patient_ID, Appointment_Date, Appointment_Time)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_doctor_specialization
+    ON Doctor (Specialization COLLATE NOCASE, Rating DESC)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_doctor_location
+    ON Doctor (Location COLLATE NOCASE, Rating DESC)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_doctor_rating ON Doctor (Rating DESC)",
+    """
+    CREATE INDEX IF NOT EXISTS ix_patient_name
+    ON Patient (Patient_Name COLLATE NOCASE, Age)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_patient_phone ON Patient (Phone)",
+)
+
+# Patients can be identified by phone number, stored as digits only. The app never
+# collects phones itself; they are imported from the hospital's patient records
+# with `python -m agent.utils.patient_phones`.
+PATIENT_PHONE_MIGRATION = ("ALTER TABLE Patient ADD COLUMN Phone TEXT",)
+
+# Trigram full-text index over the doctor directory, kept in sync by triggers.
+# Trigrams give substring and typo-tolerant matching without scanning the table.
+# Created and populated once, in one transaction, on databases that lack it.
+DOCTOR_SEARCH_MIGRATION = (
+    """
+    CREATE VIRTUAL TABLE doctor_fts USING fts5(
+        Doctor_Name, Specialization, Location,
+        content='Doctor', content_rowid='Doctor_ID', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER doctor_fts_insert AFTER INSERT ON Doctor BEGIN
+        INSERT INTO doctor_fts (rowid, Doctor_Name, Specialization, Location)
+        VALUES (new.Doctor_ID, new.Doctor_Name, new.Specialization, new.Location);
+    END
+    """,
+    """
+    CREATE TRIGGER doctor_fts_delete AFTER DELETE ON Doctor BEGIN
+        INSERT INTO doctor_fts (doctor_fts, rowid, Doctor_Name, Specialization, Location)
+        VALUES ('delete', old.Doctor_ID, old.Doctor_Name, old.Specialization, old.Location);
+    END
+    """,
+    """
+    CREATE TRIGGER doctor_fts_update AFTER UPDATE ON Doctor BEGIN
+        INSERT INTO doctor_fts (doctor_fts, rowid, Doctor_Name, Specialization, Location)
+        VALUES ('delete', old.Doctor_ID, old.Doctor_Name, old.Specialization, old.Location);
+        INSERT INTO doctor_fts (rowid, Doctor_Name, Specialization, Location)
+        VALUES (new.Doctor_ID, new.Doctor_Name, new.Specialization, new.Location);
+    END
+    """,
+    "INSERT INTO doctor_fts (doctor_fts) VALUES ('rebuild')",
+)
+
+# Largest page of doctors a single search returns
+MAX_PAGE_SIZE = 20
+
+
+class DoctorRow(TypedDict):
+    """A Doctor row, with the table's column names."""
+
+    Doctor_ID: int
+    Doctor_Name: str
+    Specialization: str
+    Location: str
+    Rating: float
+
+
+class AppointmentRow(TypedDict):
+    """An appointment as the tools report it."""
+
+    appointment_id: int
+    date: str
+    time: str
+    doctor_id: int
+    patient_id: int
+
+
+class DoctorPage(TypedDict):
+    """One page of doctor search results; `next_offset` is None on the last page."""
+
+    doctors: List[DoctorRow]
+    next_offset: Optional[int]
+
+
+class PatientRow(TypedDict):
+    """A patient matched by `find_patients`."""
+
+    patient_id: int
+    name: str
+    age: Optional[int]
+    phone: Optional[str]
+
+
+class UpcomingAppointmentRow(TypedDict):
+    """A patient's upcoming appointment, with its doctor."""
+
+    appointment_id: int
+    date: str
+    time: str
+    doctor_id: int
+    doctor_name: str
+    specialization: str
+
+
+def _has_schema_object(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+# Rows stored before slots were normalized, e.g. "9:00" or "2026-1-5"
+SELECT_UNPADDED_SLOTS = """
+    SELECT Appointment_ID, Appointment_Date, Appointment_Time FROM Appointment
+    WHERE length(Appointment_Date) != 10 OR length(Appointment_Time) != 5
+"""
+SELECT_DUPLICATE_SLOTS = """
+    SELECT Doctor_ID, Appointment_Date, Appointment_Time, group_concat(Appointment_ID) FROM Appointment
+    GROUP BY Doctor_ID, Appointment_Date, Appointment_Time HAVING count(*) > 1
+"""
+
+
+def _normalize_appointment_slots(conn: sqlite3.Connection) -> None:
+    """Zero-pad stored slots and drop double bookings so the unique slot index can be built.
+
+    Of appointments sharing a doctor's slot, the earliest booked is kept; the
+    others are deleted and logged so staff can contact their patients.
+    """
+    for appointment_id, day, hour in conn.execute(SELECT_UNPADDED_SLOTS).fetchall():
+        try:
+            slot = normalize_slot(day, hour)
+        except ValueError:
+            logger.warning("Appointment %s has an unreadable slot %r %r; left as is", appointment_id, day, hour)
+            continue
+        conn.execute(UPDATE_APPOINTMENT_SLOT, (*slot, appointment_id)).fetchall()
+    for doctor_id, day, hour, ids in conn.execute(SELECT_DUPLICATE_SLOTS).fetchall():
+        kept, *dropped = sorted(int(appointment_id) for appointment_id in ids.split(","))
+        rows = conn.execute(
+            f"DELETE FROM Appointment WHERE Appointment_ID IN ({','.join('?' * len(dropped))})"
+            " RETURNING Appointment_ID, Patient_ID",
+            dropped,
+        ).fetchall()
+        logger.warning(
+            "Doctor %s was double-booked at %s %s; kept appointment %s and deleted %s",
+            doctor_id, day, hour, kept, ", ".join(f"{row[0]} (patient {row[1]})" for row in sorted(rows)),
+        )
+
+
+# Non-idempotent migrations, each applied in one transaction when its check fails.
+# A step is a SQL statement or a function run on the migrating connection.
+ONE_TIME_MIGRATIONS: Tuple[
+    Tuple[Callable[[sqlite3.Connection], bool], Tuple[Union[str, Callable[[sqlite3.Connection], None]], ...]], ...
+] = (
+    (lambda conn: _has_schema_object(conn, "doctor_fts"), DOCTOR_SEARCH_MIGRATION),
+    (lambda conn: _has_column(conn, "Patient", "Phone"), PATIENT_PHONE_MIGRATION),
+    (
+        lambda conn: _has_schema_object(conn, "ux_appointment_doctor_slot"),
+        (_normalize_appointment_slots, UNIQUE_SLOT_INDEX),
+    ),
+)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    for applied, statements in ONE_TIME_MIGRATIONS:
+        if applied(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # re-checked under the write lock: another process may have just applied it
+            if not applied(conn):
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    for statement in SCHEMA_MIGRATIONS:
+        conn.execute(statement)
+
+
+class ConnectionPool:
+    """Thread-local pool of tuned SQLite connections to a single database file."""
+
+    def __init__(self, db_path: str, cached_statements: int = 256) -> None:
+        """Create a pool; connections are opened lazily, one per calling thread."""
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._migrated = False
+        self._trace: Optional[Callable[[str], None]] = None
+
+    def _open(self) -> sqlite3.Connection:
+        # autocommit mode: transactions are opened explicitly by `transaction()`
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        # opened under the lock so no connection caches the schema before it is migrated
+        with self._lock:
+            conn = self._open()
+            if not self._migrated:
+                _migrate(conn)
+                self._migrated = True
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block in a write transaction, committing on success and rolling back on error."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """Call `callback` with every SQL statement run on this pool's connections (None to stop)."""
+        with self._lock:
+            self._trace = callback
+            for conn in self._connections:
+                conn.set_trace_callback(callback)
+
+    def close_all(self) -> None:
+        """Close every connection handed out by this pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+# Prepared statements used by the repository
+DOCTOR_COLUMNS = "Doctor.Doctor_ID, Doctor.Doctor_Name, Doctor.Specialization, Doctor.Location, Doctor.Rating"
+# Name weighs most in the ranking, then specialization, then location
+SEARCH_DOCTORS_FTS = f"""
+    SELECT {DOCTOR_COLUMNS} FROM doctor_fts
+    JOIN Doctor ON Doctor.Doctor_ID = doctor_fts.rowid
+    WHERE doctor_fts MATCH ?{{filters}}
+    ORDER BY bm25(doctor_fts, 10.0, 2.0, 1.0), Doctor.Rating DESC, Doctor.Doctor_ID
+"""
+SEARCH_DOCTORS_BY_NAME = f"""
+    SELECT {DOCTOR_COLUMNS} FROM Doctor
+    WHERE Doctor_Name LIKE ?{{filters}}
+    ORDER BY Doctor.Rating DESC, Doctor.Doctor_ID
+"""
+LIST_DOCTORS = f"""
+    SELECT {DOCTOR_COLUMNS} FROM Doctor
+    WHERE 1{{filters}}
+    ORDER BY Doctor.Rating DESC, Doctor.Doctor_ID
+"""
+DOCTOR_FILTERS = (
+    " AND Doctor.Specialization = ? COLLATE NOCASE",
+    " AND Doctor.Location = ? COLLATE NOCASE",
+    " AND Doctor.Rating >= ?",
+)
+SELECT_SLOT_BOOKED = """
+    SELECT 1 FROM Appointment
+    WHERE Doctor_ID = ? AND Appointment_Date = ? AND Appointment_Time = ? AND Appointment_ID != ?
+"""
+INSERT_APPOINTMENT = """
+    INSERT INTO Appointment (Appointment_Time, Appointment_Date, Doctor_ID, Patient_ID)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (Doctor_ID, Appointment_Date, Appointment_Time) DO NOTHING
+"""
+SELECT_APPOINTMENT = """
+    SELECT Appointment_ID, Appointment_Date, Appointment_Time, Doctor_ID, Patient_ID
+    FROM Appointment
+    WHERE Appointment_ID = ?
+"""
+SELECT_APPOINTMENTS = """
+    SELECT Appointment_ID, Appointment_Date, Appointment_Time, Doctor_ID, Patient_ID
+    FROM Appointment
+    WHERE Appointment_ID IN ({ids})
+"""
+DELETE_APPOINTMENT = """
+    DELETE FROM Appointment WHERE Appointment_ID = ?
+    RETURNING Appointment_ID, Appointment_Date, Appointment_Time, Doctor_ID, Patient_ID
+"""
+UPDATE_APPOINTMENT_SLOT = """
+    UPDATE OR IGNORE Appointment
+    SET Appointment_Date = ?, Appointment_Time = ?
+    WHERE Appointment_ID = ?
+    RETURNING Appointment_ID, Appointment_Date, Appointment_Time, Doctor_ID, Patient_ID
+"""
+SELECT_DOCTOR = "SELECT * FROM Doctor WHERE Doctor_ID = ?"
+UPDATE_PATIENT_PHONE = "UPDATE Patient SET Phone = ? WHERE Patient_ID = ?"
+FIND_PATIENTS_BY_PHONE = """
+    SELECT Patient_ID, Patient_Name, Age, Phone FROM Patient
+    WHERE Phone = ? AND (? IS NULL OR Age = ?)
+    ORDER BY Patient_ID LIMIT ?
+"""
+# exact name first, then names starting with it; the range keeps the NOCASE index usable
+FIND_PATIENTS_BY_NAME = """
+    SELECT Patient_ID, Patient_Name, Age, Phone FROM Patient
+    WHERE Patient_Name >= ? COLLATE NOCASE AND Patient_Name < ? COLLATE NOCASE
+      AND (? IS NULL OR Age = ?)
+    ORDER BY Patient_Name = ? COLLATE NOCASE DESC, Patient_Name COLLATE NOCASE, Patient_ID
+    LIMIT ?
+"""
+SELECT_UPCOMING_APPOINTMENTS = """
+    SELECT a.Appointment_ID, a.Appointment_Date, a.Appointment_Time, a.Doctor_ID, d.Doctor_Name, d.Specialization
+    FROM Appointment AS a JOIN Doctor AS d ON d.Doctor_ID = a.Doctor_ID
+    WHERE a.Patient_ID = ? AND (a.Appointment_Date, a.Appointment_Time) >= (?, ?)
+    ORDER BY a.Appointment_Date, a.Appointment_Time
+    LIMIT ?
+"""
+# one index seek per probed slot; a row-value IN over the same VALUES would scan the index
+SELECT_BOOKED_AMONG = """
+    WITH probe (doctor_id, day, time) AS (VALUES {slots})
+    SELECT a.Doctor_ID, a.Appointment_Date, a.Appointment_Time
+    FROM probe JOIN Appointment AS a
+      ON a.Doctor_ID = probe.doctor_id AND a.Appointment_Date = probe.day AND a.Appointment_Time = probe.time
+"""
+SELECT_BOOKED_SLOTS = """
+    SELECT Appointment_Date, Appointment_Time FROM Appointment
+    WHERE Doctor_ID = ? AND Appointment_Date >= ?
+"""
+
+
+# Called with (sql, rows returned or written, seconds) after every repository query
+QueryListener = Callable[[str, int, float], None]
+query_listeners: List[QueryListener] = []
+
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _words(text: str) -> List[str]:
+    # the trigram tokenizer cannot match terms shorter than three characters
+    return [word for word in _WORD.findall(text.lower()) if len(word) >= 3]
+
+
+def doctor_match_queries(text: str) -> Tuple[str, ...]:
+    """Return the FTS5 queries for a doctor search, strictest first.
+
+    The strict query requires every word of `text` as a substring; the fuzzy one
+    matches any trigram of any word, so misspelt names still rank their closest
+    doctors first. Returns nothing when no word is long enough to index.
+    """
+    words = _words(text)
+    if not words:
+        return ()
+    strict = " ".join(f'"{word}"' for word in words)
+    trigrams = dict.fromkeys(word[i:i + 3] for word in words for i in range(len(word) - 2))
+    fuzzy = " OR ".join(f'"{trigram}"' for trigram in trigrams)
+    return (strict,) if fuzzy == strict else (strict, fuzzy)
+
+
+@functools.cache
+def _doctor_sql(template: str, filters: Tuple[bool, bool, bool], paged: bool) -> str:
+    # one fixed statement per combination of filters, so the statement cache keeps them all
+    clauses = "".join(clause for clause, used in zip(DOCTOR_FILTERS, filters) if used)
+    return template.format(filters=clauses) + (" LIMIT ? OFFSET ?" if paged else "")
+
+
+def normalize_phone(phone: str) -> str:
+    """Reduce a phone number to its digits, the form it is stored and looked up in."""
+    return "".join(char for char in phone if char.isdigit())
+
+
+def normalize_slot(date: str, time: str) -> Tuple[str, str]:
+    """Return a slot's date and time zero-padded as 'YYYY-MM-DD' and 'HH:MM', the form it is stored and looked up in.
+
+    strptime also accepts "2026-1-5" and "9:00"; stored as given, those would
+    slip past the unique slot index and break the lexicographic date ranges.
+
+    Raises:
+        ValueError: If `date` `time` is not a valid date and time.
+    """
+    parsed = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+    return parsed.strftime("%Y-%m-%d"), parsed.strftime("%H:%M")
+
+
+def _patient_row(row: sqlite3.Row) -> PatientRow:
+    return {"patient_id": row[0], "name": row[1], "age": row[2], "phone": row[3]}
+
+
+def _appointment_row(row: sqlite3.Row) -> AppointmentRow:
+    return {
+        "appointment_id": row[0],
+        "date": row[1],
+        "time": row[2],
+        "doctor_id": row[3],
+        "patient_id": row[4],
+    }
+
+
+class HospitalRepository:
+    """Typed queries over the Doctor, Patient and Appointment tables."""
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        """Bind the repository to a connection pool."""
+        self.pool = pool
+
+    def _fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        # fetchall also steps writes with RETURNING to completion, ending their implicit transaction
+        if not query_listeners:
+            return self.pool.connection().execute(sql, params).fetchall()
+        start = time.perf_counter()
+        rows = self.pool.connection().execute(sql, params).fetchall()
+        _notify(sql, len(rows), time.perf_counter() - start)
+        return rows
+
+    def _write(self, sql: str, params: Sequence[Any]) -> sqlite3.Cursor:
+        if not query_listeners:
+            return self.pool.connection().execute(sql, params)
+        start = time.perf_counter()
+        cursor = self.pool.connection().execute(sql, params)
+        _notify(sql, max(cursor.rowcount, 0), time.perf_counter() - start)
+        return cursor
+
+    def _doctor_queries(
+        self,
+        name: Optional[str],
+        specialization: Optional[str],
+        location: Optional[str],
+        min_rating: Optional[float],
+        paged: bool,
+    ) -> Iterator[Tuple[str, List[Any]]]:
+        # yields (sql, params) to try in order until one returns doctors
+        filters = (specialization is not None, location is not None, min_rating is not None)
+        params = [value for value in (specialization, location, min_rating) if value is not None]
+        if not name or not name.strip():
+            yield _doctor_sql(LIST_DOCTORS, filters, paged), params
+            return
+        matches = doctor_match_queries(name)
+        if not matches:
+            yield _doctor_sql(SEARCH_DOCTORS_BY_NAME, filters, paged), [f"%{name.strip()}%", *params]
+        for match in matches:
+            yield _doctor_sql(SEARCH_DOCTORS_FTS, filters, paged), [match, *params]
+
+    def search_doctors(
+        self,
+        name: Optional[str] = None,
+        *,
+        specialization: Optional[str] = None,
+        location: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        limit: int = 5,
+        offset: int = 0,
+    ) -> DoctorPage:
+        """Return one ranked page of doctors matching a fuzzy name and exact filters.
+
+        Without a name, doctors are listed best rated first. `limit` is capped at
+        `MAX_PAGE_SIZE`; `next_offset` is None on the last page.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        rows: List[sqlite3.Row] = []
+        for sql, params in self._doctor_queries(name, specialization, location, min_rating, paged=True):
+            # one extra row tells whether there is a next page
+            rows = self._fetchall(sql, (*params, limit + 1, offset))
+            if rows:
+                break
+        return {
+            "doctors": [dict(row) for row in rows[:limit]],  # type: ignore[misc]
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+
+    def iter_doctors(
+        self,
+        name: Optional[str] = None,
+        *,
+        specialization: Optional[str] = None,
+        location: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        batch_size: int = 500,
+    ) -> Iterator[DoctorRow]:
+        """Stream every matching doctor in search order, fetching `batch_size` rows at a time."""
+        for sql, params in self._doctor_queries(name, specialization, location, min_rating, paged=False):
+            found = False
+            cursor = self.pool.connection().execute(sql, params)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    rows = cursor.fetchmany(batch_size)
+                    if query_listeners:
+                        _notify(sql, len(rows), time.perf_counter() - start)
+                    if not rows:
+                        break
+                    found = True
+                    for row in rows:
+                        yield dict(row)  # type: ignore[misc]
+            finally:
+                cursor.close()
+            if found:
+                return
+
+    def is_slot_booked(self, doctor_id: int, date: str, time: str, exclude_appointment_id: int = -1) -> bool:
+        """Return True if the doctor already has an appointment at `date` `time`."""
+        date, time = normalize_slot(date, time)
+        return bool(self._fetchall(SELECT_SLOT_BOOKED, (doctor_id, date, time, exclude_appointment_id)))
+
+    def booked_slots_among(self, slots: Sequence[Tuple[int, str, str]]) -> Set[Tuple[int, str, str]]:
+        """Return which of the (doctor ID, date, time) slots are booked, in one query.
+
+        Slots are matched, and returned, in their normalized form (`normalize_slot`).
+        """
+        slots = list(dict.fromkeys((doctor_id, *normalize_slot(date, time)) for doctor_id, date, time in slots))
+        if not slots:
+            return set()
+        sql = SELECT_BOOKED_AMONG.format(slots=", ".join(["(?, ?, ?)"] * len(slots)))
+        rows = self._fetchall(sql, [value for slot in slots for value in slot])
+        return {(row[0], row[1], row[2]) for row in rows}
+
+    def create_appointment(self, patient_id: int, doctor_id: int, date: str, time: str) -> Optional[int]:
+        """Reserve a slot in a single statement; return the new ID, or None if the slot is taken."""
+        date, time = normalize_slot(date, time)
+        cursor = self._write(INSERT_APPOINTMENT, (time, date, doctor_id, patient_id))
+        return cursor.lastrowid if cursor.rowcount > 0 else None
+
+    def get_appointment(self, appointment_id: int) -> Optional[AppointmentRow]:
+        """Return an appointment by ID, or None if it does not exist."""
+        rows = self._fetchall(SELECT_APPOINTMENT, (appointment_id,))
+        return _appointment_row(rows[0]) if rows else None
+
+    def get_appointments(self, appointment_ids: Sequence[int]) -> Dict[int, AppointmentRow]:
+        """Return the existing appointments among `appointment_ids`, by ID, in one query."""
+        appointment_ids = list(dict.fromkeys(appointment_ids))
+        if not appointment_ids:
+            return {}
+        rows = self._fetchall(SELECT_APPOINTMENTS.format(ids=", ".join("?" * len(appointment_ids))), appointment_ids)
+        return {row[0]: _appointment_row(row) for row in rows}
+
+    def delete_appointment(self, appointment_id: int) -> Optional[AppointmentRow]:
+        """Delete an appointment and return it, or None if it did not exist."""
+        rows = self._fetchall(DELETE_APPOINTMENT, (appointment_id,))
+        return _appointment_row(rows[0]) if rows else None
+
+    def move_appointment(
+        self, appointment_id: int, date: str, time: str
+    ) -> Tuple[Optional[AppointmentRow], Optional[AppointmentRow]]:
+        """Move an appointment to a new slot in one transaction.
+
+        Returns:
+            The appointment before and after the move. `before` is None if the
+            appointment does not exist; `after` is None if the slot is taken.
+        """
+        date, time = normalize_slot(date, time)
+        with self.pool.transaction():
+            rows = self._fetchall(SELECT_APPOINTMENT, (appointment_id,))
+            if not rows:
+                return None, None
+            moved = self._fetchall(UPDATE_APPOINTMENT_SLOT, (date, time, appointment_id))
+        return _appointment_row(rows[0]), _appointment_row(moved[0]) if moved else None
+
+    def get_doctor(self, doctor_id: int) -> Optional[DoctorRow]:
+        """Return a doctor by ID, or None if it does not exist."""
+        rows = self._fetchall(SELECT_DOCTOR, (doctor_id,))
+        return dict(rows[0]) if rows else None  # type: ignore[return-value]
+
+    def find_patients(
+        self,
+        name: Optional[str] = None,
+        age: Optional[int] = None,
+        phone: Optional[str] = None,
+        limit: int = 5,
+    ) -> List[PatientRow]:
+        """Return patients matching a phone number, or a full or leading part of a name (and age).
+
+        Exact name matches come first; at most `limit` patients are returned.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        digits = normalize_phone(phone) if phone else ""
+        if digits:
+            rows = self._fetchall(FIND_PATIENTS_BY_PHONE, (digits, age, age, limit))
+            return [_patient_row(row) for row in rows]
+        name = " ".join(name.split()) if name else ""
+        if not name:
+            return []
+        rows = self._fetchall(FIND_PATIENTS_BY_NAME, (name, name + "\uffff", age, age, name, limit))
+        return [_patient_row(row) for row in rows]
+
+    def set_patient_phones(self, phones: Iterable[Tuple[int, str]]) -> int:
+        """Store `(patient_id, phone)` pairs in one transaction; blank phones clear the number.
+
+        Returns:
+            The number of patients updated; unknown patient IDs are skipped.
+        """
+        rows = [(normalize_phone(phone or "") or None, patient_id) for patient_id, phone in phones]
+        with self.pool.transaction() as conn:
+            return conn.executemany(UPDATE_PATIENT_PHONE, rows).rowcount
+
+    def upcoming_appointments(self, patient_id: int, now: str, limit: int = 10) -> List[UpcomingAppointmentRow]:
+        """Return a patient's appointments at or after `now` ('YYYY-MM-DD HH:MM'), earliest first, with doctor names."""
+        day, _, time = now.partition(" ")
+        rows = self._fetchall(SELECT_UPCOMING_APPOINTMENTS, (patient_id, day, time, max(1, min(limit, MAX_PAGE_SIZE))))
+        return [
+            {
+                "appointment_id": row[0],
+                "date": row[1],
+                "time": row[2],
+                "doctor_id": row[3],
+                "doctor_name": row[4],
+                "specialization": row[5],
+            }
+            for row in rows
+        ]
+
+    def booked_slots(self, doctor_id: int, from_date: str) -> List[Tuple[str, str]]:
+        """Return the (date, time) of every appointment of a doctor on or after `from_date`."""
+        rows = self._fetchall(SELECT_BOOKED_SLOTS, (doctor_id, from_date))
+        return [(row[0], row[1]) for row in rows]
+
+
+def _notify(sql: str, rows: int, seconds: float) -> None:
+    for listener in query_listeners:
+        listener(sql, rows, seconds)
+
+
+# Cached so every tool in the process shares one pool
+@lru_cache(maxsize=1)
+def get_repository() -> HospitalRepository:
+    """Return the process-wide repository (override the file with APPOINTMENTS_DB_PATH)."""
+    return HospitalRepository(ConnectionPool(os.getenv("APPOINTMENTS_DB_PATH", DB_PATH)))
+
+
+T = TypeVar("T")
+
+# Size of the thread pool that serves database calls from async code
+DB_THREADS = int(os.getenv("DB_THREADS", "8"))
+
+
+@lru_cache(maxsize=1)
+def _db_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="sqlite")
+
 
-DB_PATH = "src/agent/database/appointments.db"
+async def run_in_db_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking database call on the database thread pool, preserving context variables."""
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_db_executor(), call)
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
 
-def execute_query(query, params=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query, params or [])
-        conn.commit()
-        return cursor.fetchall()
-    finally:
-        conn.close()
+def submit_to_db_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Start a blocking database call on the database thread pool from sync code, preserving context variables."""
+    return _db_executor().submit(contextvars.copy_context().run, func, *args, **kwargs)
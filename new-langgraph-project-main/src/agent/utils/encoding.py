@@ -0,0 +1,190 @@
+"""Compact, token-budgeted tool results as the model sees them.
+
+Tools return JSON for their Python callers. The tool executor re-encodes
+that JSON for the agent that made the call, and every later turn resends the
+result, so the encoding is kept small:
+
+- projection: each agent sees only the row fields it acts on
+  (`PROJECTIONS`), e.g. the cancellation agent never sees phone numbers or
+  ratings;
+- compact rows: a list of records becomes a header line of field names and
+  one `|`-separated line per record, instead of repeating every key, and
+  the `success: true` envelope is dropped;
+- budget: a result over `max_tokens` is cut at a row boundary and ends with
+  a "N more results" line, so one broad search cannot flood the prompt.
+
+`elide_stale_results` then replaces the tool results of older caller turns
+with a one-line stub when the prompt is assembled. The state keeps the
+results; only the prompt drops them.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from langchain_core.messages import AnyMessage, HumanMessage, ToolMessage
+
+from agent.utils.tokens import estimate_text_tokens, get_token_counter
+
+# Token budget of one encoded tool result
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "300"))
+# Caller turns whose tool results stay in the prompt verbatim
+TOOL_RESULT_KEEP_TURNS = int(os.getenv("TOOL_RESULT_KEEP_TURNS", "2"))
+
+# Fields each agent sees, by the key of the record or list of records in a result;
+# keys not listed are passed through whole
+PATIENT_FIELDS = ("patient_id", "name", "age")
+PROJECTIONS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "new_booking_assistant": {
+        "doctors": ("Doctor_ID", "Doctor_Name", "Specialization", "Location", "Rating"),
+        "slots": ("doctor_id", "doctor_name", "date", "time"),
+        "patients": PATIENT_FIELDS,
+    },
+    "cancel_booking_assistant": {
+        "appointment": ("appointment_id", "date", "time", "doctor_id", "patient_id"),
+        "appointments": ("appointment_id", "date", "time", "doctor_name"),
+        "patients": PATIENT_FIELDS,
+    },
+    "reschedule_booking_assistant": {
+        "appointment": ("appointment_id", "date", "time", "doctor_id", "patient_id"),
+        "appointments": ("appointment_id", "date", "time", "doctor_id", "doctor_name"),
+        "slots": ("doctor_id", "date", "time"),
+        "patients": PATIENT_FIELDS,
+    },
+}
+
+FIELD_SEPARATOR = "|"
+TRUNCATED = " …(truncated)"
+# Largest omitted-row count budgeted for in the "more results" line
+MAX_RESULTS_NOTED = 999
+
+
+def _more_results(count: int) -> str:
+    return f"({count} more results; narrow the request to see them)"
+
+
+def _value(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).replace(FIELD_SEPARATOR, "/").replace("\n", " ")
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(row, dict) for row in value)
+
+
+class ToolResultEncoder:
+    """Encodes one agent's tool results compactly within a token budget."""
+
+    def __init__(
+        self,
+        projections: Optional[Mapping[str, Sequence[str]]] = None,
+        max_tokens: int = TOOL_RESULT_MAX_TOKENS,
+    ) -> None:
+        """Create an encoder.
+
+        Args:
+            projections: Fields to keep by result key (default: keep every field).
+            max_tokens: Budget of one encoded result, in calibrated tokens.
+        """
+        self.projections = dict(projections or {})
+        self.max_tokens = max_tokens
+
+    def _columns(self, key: str, rows: List[Dict[str, Any]]) -> List[str]:
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        projection = self.projections.get(key)
+        return [column for column in projection if column in columns] if projection else columns
+
+    def _tokens(self, text: str) -> float:
+        return estimate_text_tokens(text) * get_token_counter().scale
+
+    def encode(self, content: str) -> str:
+        """Return the compact form of a tool's JSON result; other content is only cut to the budget."""
+        try:
+            payload = json.loads(content)
+        except (TypeError, ValueError):
+            return self._cut(content)
+        if not isinstance(payload, dict):
+            return self._cut(content)
+
+        # (key, header line, row lines) per table, in payload order
+        tables: List[Tuple[str, str, List[str]]] = []
+        lines: List[str] = []
+        for key, value in payload.items():
+            if value is None or (key == "success" and value is True):
+                continue
+            if isinstance(value, dict) and not any(isinstance(field, (dict, list)) for field in value.values()):
+                # a single record, e.g. one appointment
+                fields = self._columns(key, [value])
+                lines.append(f"{key}: " + ", ".join(f"{field}={_value(value[field])}" for field in fields))
+            elif _is_table(value):
+                columns = self._columns(key, value)
+                rows = [FIELD_SEPARATOR.join(_value(row.get(column)) for column in columns) for row in value]
+                tables.append((key, f"{key}[{len(rows)}] {FIELD_SEPARATOR.join(columns)}", rows))
+            elif isinstance(value, (dict, list)):
+                lines.append(f"{key}: {json.dumps(value, separators=(',', ':'))}")
+            else:
+                lines.append(f"{key}: {_value(value)}")
+        if not tables:
+            return self._cut("\n".join(lines))
+        return self._fit(lines, tables)
+
+    def _fit(self, lines: List[str], tables: List[Tuple[str, str, List[str]]]) -> str:
+        # drop trailing rows of the longest table until the result fits the budget
+        kept = [len(rows) for _, _, rows in tables]
+        costs = [[self._tokens(row) + 1 for row in rows] for _, _, rows in tables]
+        total = self._tokens("\n".join(lines)) + sum(self._tokens(header) + 1 for _, header, _ in tables)
+        total += sum(sum(table_costs) for table_costs in costs)
+        # each cut table ends with a "more results" line, which needs room too
+        note = self._tokens(_more_results(MAX_RESULTS_NOTED)) + 1
+        while total + note * sum(count < len(costs[i]) for i, count in enumerate(kept)) > self.max_tokens and any(kept):
+            longest = max(range(len(tables)), key=lambda i: kept[i])
+            kept[longest] -= 1
+            total -= costs[longest][kept[longest]]
+        for (key, header, rows), count in zip(tables, kept):
+            lines.append(header)
+            lines.extend(rows[:count])
+            if count < len(rows):
+                lines.append(_more_results(len(rows) - count))
+        return self._cut("\n".join(lines))
+
+    def _cut(self, text: str) -> str:
+        if self._tokens(text) <= self.max_tokens:
+            return text
+        # longest prefix that fits the budget with the marker
+        budget = self.max_tokens - self._tokens(TRUNCATED)
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + TRUNCATED
+
+
+def get_result_encoder(role: str) -> ToolResultEncoder:
+    """Return the tool result encoder of an agent role."""
+    return ToolResultEncoder(PROJECTIONS.get(role))
+
+
+def elide_stale_results(messages: Sequence[AnyMessage], keep_turns: int = TOOL_RESULT_KEEP_TURNS) -> List[AnyMessage]:
+    """Replace the tool results from before the last `keep_turns` caller messages with short stubs.
+
+    The tool messages themselves stay, so every tool call keeps its response.
+    """
+    human_turns = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if len(human_turns) <= keep_turns:
+        return list(messages)
+    cutoff = human_turns[-keep_turns] if keep_turns > 0 else len(messages)
+    elided: List[AnyMessage] = []
+    for i, message in enumerate(messages):
+        if i < cutoff and isinstance(message, ToolMessage):
+            name = message.name or "tool"
+            message = message.model_copy(update={
+                "content": f"[{name} result from an earlier turn elided; call {name} again if it is needed]",
+            })
+        elided.append(message)
+    return elided
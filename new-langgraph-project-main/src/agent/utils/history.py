@@ -0,0 +1,93 @@
+"""Bounded conversation history with a rolling summary.
+
+Once a conversation exceeds its token budget or `2 * keep_exchanges` user
+turns, everything before the last `keep_exchanges` exchanges is folded into
+a running summary and removed from the state. Cuts are only made at user
+turns, so an AI tool call is never separated from its tool results. Every
+agent then sees the summary plus the recent exchanges, so prompt size stops
+growing with call length.
+"""
+
+import os
+from typing import List, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessage,
+)
+
+from agent.utils.tokens import get_token_counter
+
+# Recent user exchanges always kept verbatim
+KEEP_EXCHANGES = int(os.getenv("HISTORY_KEEP_EXCHANGES", "4"))
+# Token budget of the message history before older turns are summarized
+MAX_HISTORY_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "1500"))
+
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a phone call between a hospital booking assistant and a caller. "
+    "Update the summary with the new part of the conversation below. "
+    "Keep every fact needed to continue the call: names, patient and appointment IDs, doctors, dates, times, "
+    "and what was booked, cancelled or still pending. Reply with the summary only, at most five sentences.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New conversation:\n{transcript}"
+)
+
+
+def split_history(messages: Sequence[AnyMessage], keep_exchanges: int = KEEP_EXCHANGES) -> Tuple[List[AnyMessage], List[AnyMessage]]:
+    """Split messages into (older, recent), where recent starts at the last `keep_exchanges` user turns."""
+    human_indexes = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if len(human_indexes) <= keep_exchanges:
+        return [], list(messages)
+    cut = human_indexes[-keep_exchanges] if keep_exchanges else len(messages)
+    return list(messages[:cut]), list(messages[cut:])
+
+
+def should_compact(
+    messages: Sequence[AnyMessage],
+    keep_exchanges: int = KEEP_EXCHANGES,
+    max_tokens: int = MAX_HISTORY_TOKENS,
+) -> bool:
+    """Return True when there are older turns and the history is over its budget."""
+    older, _ = split_history(messages, keep_exchanges)
+    if not older:
+        return False
+    turns = sum(isinstance(message, HumanMessage) for message in messages)
+    return turns > 2 * keep_exchanges or get_token_counter().count(messages) > max_tokens
+
+
+def render_transcript(messages: Sequence[AnyMessage]) -> str:
+    """Render messages as a plain-text transcript for the summarizer."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            role = "Caller"
+        elif isinstance(message, ToolMessage):
+            role = f"Tool {message.name or ''}".strip()
+        elif isinstance(message, AIMessage):
+            calls = ", ".join(f"{call['name']}({call['args']})" for call in message.tool_calls)
+            if calls:
+                lines.append(f"Assistant called: {calls}")
+            role = "Assistant"
+        else:
+            continue
+        if isinstance(message.content, str) and message.content:
+            lines.append(f"{role}: {message.content}")
+    return "\n".join(lines)
+
+
+def summary_request(summary: str, older: Sequence[AnyMessage]) -> List[AnyMessage]:
+    """Build the prompt asking the LLM to fold `older` into `summary`."""
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=render_transcript(older))
+    return [HumanMessage(content=prompt)]
+
+
+def compaction_update(new_summary: str, older: Sequence[AnyMessage]) -> dict:
+    """Return the state update that stores the summary and drops the summarized messages."""
+    return {
+        "summary": new_summary,
+        "messages": [RemoveMessage(id=message.id) for message in older if message.id],
+    }
+
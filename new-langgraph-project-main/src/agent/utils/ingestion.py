@@ -0,0 +1,275 @@
+"""Incremental, cached embedding pipeline for document ingestion.
+
+Pages are streamed from the source PDFs and split one page at a time, so a
+large document set is never held in memory as raw pages. Every chunk is keyed
+by the SHA-256 of its text and the embedding model; keys already in the
+on-disk `EmbeddingCache` are reused, and only new chunks are sent to the
+embedder, in batches of `batch_size` with at most `max_concurrency` batches in
+flight. A failing batch is retried on its own with exponential backoff, and
+every finished batch is written to the cache immediately, so an interrupted
+run resumes where it stopped and re-indexing an edited document only pays for
+the chunks that changed.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+CREATE_EMBEDDING_TABLE = """
+    CREATE TABLE IF NOT EXISTS embedding (
+        key TEXT PRIMARY KEY,
+        vector BLOB NOT NULL
+    ) WITHOUT ROWID
+"""
+SELECT_EMBEDDINGS = "SELECT key, vector FROM embedding WHERE key IN (SELECT value FROM json_each(?))"
+INSERT_EMBEDDING = "INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)"
+COUNT_EMBEDDINGS = "SELECT COUNT(*) FROM embedding"
+
+
+def embedding_model_name(embedding: Embeddings) -> str:
+    """Return a stable identifier for an embedding model, used to key indexes."""
+    return str(getattr(embedding, "model", None) or type(embedding).__name__)
+
+
+def chunk_key(model: str, text: str) -> str:
+    """Return the cache key of a chunk embedded with `model`."""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def iter_pages(file_paths: Sequence[str]) -> Iterator[Document]:
+    """Yield the pages of each PDF in turn, parsing lazily."""
+    # the loader stack is only needed when (re)building an index
+    from langchain_community.document_loaders import PyPDFLoader
+
+    for file_path in file_paths:
+        yield from PyPDFLoader(file_path).lazy_load()
+
+
+def iter_chunks(
+    pages: Iterable[Document],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> Iterator[Document]:
+    """Split pages into overlapping chunks as they arrive; chunks never span two pages."""
+    from langchain_text_splitters import CharacterTextSplitter
+
+    splitter = CharacterTextSplitter(
+        separator="\n",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    for page in pages:
+        metadata = {key: page.metadata[key] for key in ("source", "page") if key in page.metadata}
+        for text in splitter.split_text(page.page_content):
+            yield Document(page_content=text, metadata=dict(metadata))
+
+
+def _batched(items: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class EmbeddingCache:
+    """SQLite store of chunk embeddings keyed by `chunk_key`."""
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """Open (or create) the cache at `path`."""
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(CREATE_EMBEDDING_TABLE)
+
+    def __len__(self) -> int:
+        """Return the number of cached embeddings."""
+        with self._lock:
+            return self._conn.execute(COUNT_EMBEDDINGS).fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors of `keys`; missing keys are left out."""
+        if not keys:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(SELECT_EMBEDDINGS, (json.dumps(list(keys)),)).fetchall()
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        """Store vectors in one transaction."""
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(INSERT_EMBEDDING, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class IngestionStats:
+    """What one ingestion run did."""
+
+    chunks: int = 0
+    cached: int = 0
+    embedded: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class IngestionResult:
+    """Chunks in document order and their (unnormalized) embeddings, one row per chunk."""
+
+    texts: List[str]
+    metadatas: List[dict]
+    vectors: np.ndarray
+    stats: IngestionStats = field(default_factory=IngestionStats)
+
+
+class EmbeddingPipeline:
+    """Embeds a stream of chunks, reusing cached embeddings and batching the rest."""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        """Create a pipeline.
+
+        Args:
+            embedding: Embedding model applied to new chunks.
+            cache: Where embeddings are looked up and stored (nothing is reused without one).
+            batch_size: Chunks per `embed_documents` call.
+            max_concurrency: Batches embedded at the same time.
+            max_retries: Extra attempts for a failing batch before the run fails.
+            retry_backoff: Delay before the first retry, doubled on each further one.
+        """
+        self.embedding = embedding
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.model = embedding_model_name(embedding)
+        self._lock = threading.Lock()
+
+    def _embed_batch(self, texts: List[str], stats: IngestionStats) -> np.ndarray:
+        attempt = 0
+        while True:
+            try:
+                return np.asarray(self.embedding.embed_documents(texts), dtype=np.float32).reshape(len(texts), -1)
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    stats.retries += 1
+                time.sleep(self.retry_backoff * 2**attempt)
+                attempt += 1
+
+    def run(self, chunks: Iterable[Document]) -> IngestionResult:
+        """Embed `chunks`, returning them in order with one vector each."""
+        start = time.perf_counter()
+        stats = IngestionStats()
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        keys: List[str] = []
+        vectors: Dict[str, np.ndarray] = {}
+        queued: Dict[str, str] = {}
+        # queued or being embedded, so repeated chunks are embedded once
+        pending: Set[str] = set()
+        in_flight: Set[Future] = set()
+
+        def collect(done: Iterable[Future]) -> None:
+            for future in done:
+                batch_keys, batch_vectors = future.result()
+                vectors.update(zip(batch_keys, batch_vectors))
+                if self.cache is not None:
+                    self.cache.put_many(zip(batch_keys, batch_vectors))
+                stats.embedded += len(batch_keys)
+
+        def submit(executor: ThreadPoolExecutor, batch: Dict[str, str]) -> None:
+            # bounded: wait for a batch to finish before starting one more
+            while len(in_flight) >= self.max_concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                collect(done)
+            batch_keys = list(batch)
+            future = executor.submit(
+                lambda: (batch_keys, self._embed_batch([batch[key] for key in batch_keys], stats))
+            )
+            in_flight.add(future)
+            stats.batches += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed") as executor:
+            try:
+                for group in _batched(chunks, self.batch_size):
+                    group_keys = [chunk_key(self.model, chunk.page_content) for chunk in group]
+                    texts += [chunk.page_content for chunk in group]
+                    metadatas += [chunk.metadata for chunk in group]
+                    keys += group_keys
+
+                    unknown = [key for key in dict.fromkeys(group_keys) if key not in vectors and key not in pending]
+                    found = self.cache.get_many(unknown) if self.cache is not None else {}
+                    vectors.update(found)
+                    stats.cached += len(found)
+                    for key, chunk in zip(group_keys, group):
+                        if key not in vectors and key not in pending:
+                            queued[key] = chunk.page_content
+                            pending.add(key)
+
+                    while len(queued) >= self.batch_size:
+                        batch = dict(islice(queued.items(), self.batch_size))
+                        for key in batch:
+                            del queued[key]
+                        submit(executor, batch)
+                if queued:
+                    submit(executor, dict(queued))
+                    queued.clear()
+                collect(wait(in_flight).done)
+                in_flight.clear()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+        stats.chunks = len(texts)
+        stats.seconds = time.perf_counter() - start
+        matrix = np.stack([vectors[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        return IngestionResult(texts, metadatas, matrix, stats)
+
+
+def ingest(
+    file_paths: Sequence[str],
+    embedding: Embeddings,
+    cache: Optional[EmbeddingCache] = None,
+    **pipeline_options: Any,
+) -> IngestionResult:
+    """Stream, chunk and embed the PDFs at `file_paths`, reusing cached chunk embeddings."""
+    return EmbeddingPipeline(embedding, cache, **pipeline_options).run(iter_chunks(iter_pages(file_paths)))
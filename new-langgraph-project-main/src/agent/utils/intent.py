@@ -0,0 +1,239 @@
+"""Tiered intent classifier that lets the router skip the LLM for obvious requests.
+
+Tier 1 is a set of keyword rules; tier 2 is nearest-example similarity over a
+small labeled set using local hashing embeddings. Either tier only answers
+when it is confident; otherwise the caller falls back to the LLM router.
+`RouterMetrics` records how often each tier decided and estimates the latency
+saved from the observed cost of the LLM fallback.
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+from agent.utils.llm import HashingEmbeddings
+
+NEW_BOOKING = "new_booking_assistant"
+CANCEL_BOOKING = "cancel_booking_assistant"
+RESCHEDULE_BOOKING = "reschedule_booking_assistant"
+GENERAL = "general_hospital_assistant"
+# Assistants that hold a multi-turn flow; their replies are tagged with their name
+FLOW_INTENTS = (NEW_BOOKING, CANCEL_BOOKING, RESCHEDULE_BOOKING)
+
+RULE_TIER = "rule"
+EMBEDDING_TIER = "embedding"
+LLM_TIER = "llm"
+
+# Keyword rules with their confidence; a message matching rules of more than one
+# intent is left to later tiers. Rules naming both an action and an appointment
+# are certain; the looser ones also match answers given inside a flow.
+RULES: Tuple[Tuple[str, Pattern[str], float], ...] = (
+    (CANCEL_BOOKING, re.compile(r"\b(cancel+(ing|ed)?|call off|drop)\b.*\b(appointment|booking|visit|consultation)\b"), 1.0),
+    (CANCEL_BOOKING, re.compile(r"\b(appointment|booking|visit)\b.*\b(cancel+(ing|ed)?)\b"), 1.0),
+    (CANCEL_BOOKING, re.compile(r"\b(can't|cannot|won't be able to|not going to|unable to) (make it|come|attend)\b"), 0.9),
+    (RESCHEDULE_BOOKING, re.compile(r"\b(reschedul\w*|re-?book|move|change|postpone|push back|bring forward)\b.*\b(appointment|booking|visit|consultation)\b"), 1.0),
+    (RESCHEDULE_BOOKING, re.compile(r"\b(appointment|booking|visit)\b.*\b(reschedul\w*|to (another|a different|a later|an earlier) (day|date|time))\b"), 1.0),
+    (NEW_BOOKING, re.compile(r"\b(book|schedule|arrange|set up)\b.*\b(appointment|visit|consultation|check-?up)\b"), 1.0),
+    (NEW_BOOKING, re.compile(r"\bmake an? (new )?(appointment|booking)\b"), 1.0),
+    (NEW_BOOKING, re.compile(r"\b(book|see|consult)\b.*\b(doctor|dr|cardiologist|neurologist|pediatrician|specialist)\b"), 0.9),
+    (GENERAL, re.compile(r"\b(opening|visiting|working) hours\b|\bwhat time do you (open|close)\b"), 1.0),
+    (GENERAL, re.compile(r"\b(where is|address|located|location of|parking|directions)\b.*\b(hospital|clinic|you)\b"), 1.0),
+    (GENERAL, re.compile(r"\bwhat services\b|\bdo you (offer|provide)\b"), 1.0),
+)
+
+# Inside a booking, cancellation or rescheduling flow, only a rule this certain
+# (an explicit switch such as "cancel my appointment instead") skips the LLM
+FLOW_SWITCH_CONFIDENCE = 1.0
+
+# Labeled examples for the similarity tier
+LABELED_EXAMPLES: Dict[str, Sequence[str]] = {
+    NEW_BOOKING: (
+        "I want to book an appointment",
+        "can I get an appointment with a cardiologist",
+        "I need to see a doctor next week",
+        "is Dr. Smith free on Monday morning",
+        "I'd like a consultation with a neurologist",
+        "schedule me in with a pediatrician for my son",
+        "do you have any slots tomorrow afternoon",
+        "I need a new appointment",
+    ),
+    CANCEL_BOOKING: (
+        "cancel my appointment",
+        "I can't make it to my appointment on Friday",
+        "please remove my booking",
+        "I won't be able to come to my visit",
+        "I want to cancel the appointment I booked",
+        "drop my appointment with Dr. Lee",
+        "call off my consultation",
+    ),
+    RESCHEDULE_BOOKING: (
+        "I need to reschedule my appointment",
+        "can we move my appointment to another day",
+        "change the time of my visit with Dr. Lee",
+        "I'd like to push my appointment back a few days",
+        "could I come in on Thursday instead of Tuesday",
+        "move my booking to a later time",
+    ),
+    GENERAL: (
+        "what are your opening hours",
+        "where is the hospital located",
+        "what services does the hospital provide",
+        "do you have an emergency department",
+        "is there parking at the clinic",
+        "what are the visiting hours",
+        "which departments do you have",
+        "how do I get to the hospital",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class IntentDecision:
+    """Result of classifying a message; `intent` is None when the LLM must decide."""
+
+    intent: Optional[str]
+    confidence: float
+    tier: str
+
+
+class RouterMetrics:
+    """Counts routing decisions per tier and estimates latency saved by the fast path."""
+
+    def __init__(self) -> None:
+        """Start with empty counters."""
+        self._lock = threading.Lock()
+        self.decisions: Dict[str, int] = {RULE_TIER: 0, EMBEDDING_TIER: 0, LLM_TIER: 0}
+        self.fast_path_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.listeners: List[Callable[[str, float], None]] = []
+
+    def record(self, tier: str, seconds: float) -> None:
+        """Record one routing decision and how long it took."""
+        with self._lock:
+            self.decisions[tier] = self.decisions.get(tier, 0) + 1
+            if tier == LLM_TIER:
+                self.llm_seconds += seconds
+            else:
+                self.fast_path_seconds += seconds
+        for listener in self.listeners:
+            listener(tier, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return the fast-path rate and the estimated latency saved so far."""
+        with self._lock:
+            llm_calls = self.decisions[LLM_TIER]
+            fast = sum(count for tier, count in self.decisions.items() if tier != LLM_TIER)
+            total = fast + llm_calls
+            mean_llm = self.llm_seconds / llm_calls if llm_calls else 0.0
+            return {
+                "decisions": float(total),
+                "fast_path": float(fast),
+                "fast_path_rate": fast / total if total else 0.0,
+                "mean_llm_seconds": mean_llm,
+                "latency_saved_seconds": max(0.0, fast * mean_llm - self.fast_path_seconds),
+            }
+
+
+class IntentClassifier:
+    """Rule and embedding-similarity classifier with confidence thresholds."""
+
+    def __init__(
+        self,
+        embedding: Optional[Embeddings] = None,
+        examples: Dict[str, Sequence[str]] = LABELED_EXAMPLES,
+        threshold: float = 0.5,
+        margin: float = 0.08,
+    ) -> None:
+        """Embed the labeled examples once.
+
+        Args:
+            embedding: Embedding model for the similarity tier (local hashing by default).
+            examples: Labeled example utterances per intent.
+            threshold: Minimum cosine similarity to the best example.
+            margin: Minimum lead of the best intent over the runner-up.
+        """
+        self.embedding = embedding or HashingEmbeddings()
+        self.threshold = threshold
+        self.margin = margin
+        self.labels: List[str] = []
+        texts: List[str] = []
+        for intent, utterances in examples.items():
+            self.labels += [intent] * len(utterances)
+            texts += list(utterances)
+        self.vectors = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+
+    def _by_rules(self, text: str) -> Optional[IntentDecision]:
+        matched: Dict[str, float] = {}
+        for intent, pattern, confidence in RULES:
+            if pattern.search(text):
+                matched[intent] = max(matched.get(intent, 0.0), confidence)
+        if len(matched) != 1:
+            return None
+        ((intent, confidence),) = matched.items()
+        return IntentDecision(intent, confidence, RULE_TIER)
+
+    def _by_similarity(self, text: str) -> IntentDecision:
+        scores = self.vectors @ np.asarray(self.embedding.embed_query(text), dtype=np.float32)
+        best: Dict[str, float] = {}
+        for label, score in zip(self.labels, scores.tolist()):
+            best[label] = max(best.get(label, -1.0), score)
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if score >= self.threshold and score - runner_up >= self.margin:
+            return IntentDecision(intent, score, EMBEDDING_TIER)
+        return IntentDecision(None, score, LLM_TIER)
+
+    def classify(self, text: str) -> IntentDecision:
+        """Classify a single utterance."""
+        text = text.lower().strip()
+        if not text:
+            return IntentDecision(None, 0.0, LLM_TIER)
+        decision = self._by_rules(text)
+        if decision is not None:
+            return decision
+        return self._by_similarity(text)
+
+    def classify_messages(self, messages: Sequence[AnyMessage]) -> IntentDecision:
+        """Classify the conversation from its latest message, if that is a user turn.
+
+        While a booking, cancellation or rescheduling flow is in progress, the
+        latest message usually answers that assistant ("Thursday works") and is
+        left to the LLM router, which sees the whole exchange, unless a rule
+        reaches `FLOW_SWITCH_CONFIDENCE`.
+        """
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return IntentDecision(None, 0.0, LLM_TIER)
+        content = messages[-1].content
+        decision = self.classify(content if isinstance(content, str) else "")
+        previous = next((m for m in reversed(messages[:-1]) if isinstance(m, AIMessage)), None)
+        if previous is not None and previous.name in FLOW_INTENTS:
+            if decision.tier != RULE_TIER or decision.confidence < FLOW_SWITCH_CONFIDENCE:
+                return IntentDecision(None, decision.confidence, LLM_TIER)
+        return decision
+
+
+@lru_cache(maxsize=1)
+def get_intent_classifier() -> IntentClassifier:
+    """Return the process-wide intent classifier."""
+    return IntentClassifier()
+
+
+# Process-wide routing metrics
+router_metrics = RouterMetrics()
+
+
+def timed_classify(messages: Sequence[AnyMessage]) -> IntentDecision:
+    """Classify `messages` and record a fast-path decision in `router_metrics`."""
+    start = time.perf_counter()
+    decision = get_intent_classifier().classify_messages(messages)
+    if decision.intent is not None:
+        router_metrics.record(decision.tier, time.perf_counter() - start)
+    return decision
@@ -0,0 +1,385 @@
+"""Multi-document, multi-tenant knowledge base over one contiguous vector matrix.
+
+Documents live under namespaces: `shared` holds the documents every hospital
+sees (the bundled service statement by default), and every other namespace is
+a hospital ID holding that hospital's own guides and policies. On disk this is
+one directory per namespace under KNOWLEDGE_BASE_DIR, each containing PDFs.
+
+All chunks are embedded through the ingestion pipeline (so unchanged chunks
+are never re-embedded), L2-normalized and stored as a single float32 matrix
+with each namespace's rows contiguous. A hospital's search is a matrix-vector
+product over its own block and the shared block, followed by an
+`argpartition` top-k, so it touches no Python per chunk. Blocks larger than
+`ivf_min_chunks` get an inverted-file index that scans only the clusters
+closest to the query.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from agent.utils.ingestion import (
+    EmbeddingCache,
+    EmbeddingPipeline,
+    embedding_model_name,
+    iter_chunks,
+    iter_pages,
+)
+from agent.utils.llm import get_embedding_model
+from agent.utils.vectorstore import (
+    DOCUMENT_PATH,
+    EMBEDDING_CACHE_FILE,
+    INDEX_DIR,
+    _normalize,
+    file_digest,
+    load_index,
+    read_manifest,
+    save_index,
+)
+
+logger = logging.getLogger(__name__)
+
+# Namespace searched by every hospital
+SHARED = "shared"
+# Hospital used when a run does not name one
+DEFAULT_HOSPITAL = "default"
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(__file__), '..', 'knowledge')
+KNOWLEDGE_INDEX_DIR = os.path.join(INDEX_DIR, 'knowledge')
+
+# Blocks with at least this many chunks are searched through an IVF index
+IVF_MIN_CHUNKS = 20000
+# Hospital views kept per knowledge base; the least recently used view is dropped beyond it
+MAX_HOSPITAL_VIEWS = 64
+
+
+def discover_sources(root: str = KNOWLEDGE_BASE_DIR) -> Dict[str, List[str]]:
+    """Return the PDFs of each namespace directory under `root`.
+
+    Without a knowledge base directory, the bundled service statement is the
+    only (shared) document.
+    """
+    if not os.path.isdir(root):
+        return {SHARED: [os.path.abspath(DOCUMENT_PATH)]}
+    sources: Dict[str, List[str]] = {}
+    for namespace in sorted(os.listdir(root)):
+        directory = os.path.join(root, namespace)
+        if os.path.isdir(directory):
+            pdfs = sorted(
+                os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".pdf")
+            )
+            if pdfs:
+                sources[namespace] = pdfs
+    return sources
+
+
+class IVFIndex:
+    """Inverted-file index over one block of normalized vectors.
+
+    Rows are assigned to the nearest of `n_lists` k-means centroids; a query
+    scores the centroids, then only the rows of the `n_probe` closest lists.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, n_probe: int) -> None:
+        """Wrap a trained index; `order[offsets[i]:offsets[i + 1]]` are the rows of list `i`."""
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.n_probe = n_probe
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_probe: int = 12,
+        iterations: int = 8,
+        sample_size: int = 256,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Train spherical k-means on a sample of `vectors` and assign every row to a list.
+
+        Args:
+            vectors: Normalized float32 rows.
+            n_lists: Number of clusters (about the square root of the row count by default).
+            n_probe: Lists scanned per query.
+            iterations: k-means iterations.
+            sample_size: Training rows per list.
+            seed: Seed for the sample and the initial centroids.
+        """
+        rows = len(vectors)
+        n_lists = max(1, min(rows, n_lists or int(np.sqrt(rows))))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[rng.choice(rows, min(rows, n_lists * sample_size), replace=False)])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.bincount(assignment, minlength=n_lists).astype(bool)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        assignment = np.empty(rows, dtype=np.int64)
+        for start in range(0, rows, 8192):
+            assignment[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=n_lists))
+        return cls(centroids.astype(np.float32), order, offsets, min(n_probe, n_lists))
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Return the rows of the lists closest to `query`."""
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, self.n_probe - 1)[: self.n_probe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in probe])
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class KnowledgeBase:
+    """Chunks of every namespace in one normalized float32 matrix, searchable per hospital."""
+
+    def __init__(
+        self,
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: np.ndarray,
+        namespaces: Dict[str, Tuple[int, int]],
+        embedding: Embeddings,
+        version: str = "",
+        ivf_min_chunks: int = IVF_MIN_CHUNKS,
+        query_cache_size: int = 256,
+    ) -> None:
+        """Wrap embedded chunks; `namespaces` maps each namespace to its [start, stop) rows."""
+        self.texts = texts
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.namespaces = namespaces
+        self.embedding = embedding
+        self.version = version
+        self.ivf_min_chunks = ivf_min_chunks
+        self.query_cache_size = query_cache_size
+        self._ivf: Dict[str, Optional[IVFIndex]] = {}
+        self._views: OrderedDict[str, HospitalIndex] = OrderedDict()
+        self._queries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of indexed chunks."""
+        return len(self.texts)
+
+    @classmethod
+    def build(
+        cls,
+        sources: Mapping[str, Sequence[str]],
+        index_dir: str,
+        embedding: Embeddings,
+        cache: Optional[EmbeddingCache] = None,
+        **pipeline_options: Any,
+    ) -> "KnowledgeBase":
+        """Chunk and embed every namespace's documents and persist the result to `index_dir`."""
+        os.makedirs(index_dir, exist_ok=True)
+        own_cache = cache is None
+        cache = cache or EmbeddingCache(os.path.join(index_dir, EMBEDDING_CACHE_FILE))
+        pipeline = EmbeddingPipeline(embedding, cache, **pipeline_options)
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        blocks: List[np.ndarray] = []
+        namespaces: Dict[str, Tuple[int, int]] = {}
+        try:
+            for namespace, file_paths in sorted(sources.items()):
+                result = pipeline.run(iter_chunks(iter_pages(file_paths)))
+                namespaces[namespace] = (len(texts), len(texts) + len(result.texts))
+                texts += result.texts
+                metadatas += [{**metadata, "namespace": namespace} for metadata in result.metadatas]
+                if len(result.texts):
+                    blocks.append(result.vectors)
+        finally:
+            if own_cache:
+                cache.close()
+
+        vectors = _normalize(np.concatenate(blocks)) if blocks else np.zeros((0, 0), dtype=np.float32)
+        save_index(index_dir, texts, metadatas, vectors, {**_manifest(sources, embedding), "namespaces": namespaces})
+        return cls.load(index_dir, embedding)
+
+    @classmethod
+    def load(cls, index_dir: str, embedding: Embeddings, **kwargs: Any) -> "KnowledgeBase":
+        """Load a saved knowledge base, memory-mapping the vector matrix read-only."""
+        texts, metadatas, vectors, manifest = load_index(index_dir)
+        namespaces = {name: (start, stop) for name, (start, stop) in manifest.get("namespaces", {}).items()}
+        return cls(texts, metadatas, vectors, namespaces, embedding, manifest.get("version", ""), **kwargs)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Return the normalized embedding of `query`, reusing it for repeated queries."""
+        with self._lock:
+            vector = self._queries.get(query)
+            if vector is not None:
+                self._queries.move_to_end(query)
+                return vector
+        vector = _normalize(np.asarray(self.embedding.embed_query(query), dtype=np.float32))
+        with self._lock:
+            self._queries[query] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def _ivf_for(self, namespace: str) -> Optional[IVFIndex]:
+        start, stop = self.namespaces[namespace]
+        if stop - start < self.ivf_min_chunks:
+            return None
+        with self._lock:
+            if namespace not in self._ivf:
+                self._ivf[namespace] = IVFIndex.build(self.vectors[start:stop])
+            return self._ivf[namespace]
+
+    def _search_block(self, namespace: str, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        start, stop = self.namespaces[namespace]
+        if start == stop:
+            return []
+        block = self.vectors[start:stop]
+        ivf = self._ivf_for(namespace)
+        if ivf is None:
+            scores = block @ query
+            rows = _top_k(scores, k)
+            return [(start + int(row), float(scores[row])) for row in rows]
+        candidates = ivf.candidates(query)
+        scores = block[candidates] @ query
+        rows = _top_k(scores, k)
+        return [(start + int(candidates[row]), float(scores[row])) for row in rows]
+
+    def search(self, vector: Any, hospital_id: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the `k` chunks of `hospital_id` and the shared namespace closest to `vector`."""
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        hits: List[Tuple[int, float]] = []
+        for namespace in dict.fromkeys((hospital_id, SHARED)):
+            if namespace in self.namespaces:
+                hits += self._search_block(namespace, query, k)
+        hits.sort(key=lambda hit: -hit[1])
+        return [
+            (Document(page_content=self.texts[row], metadata=self.metadatas[row]), score)
+            for row, score in hits[:k]
+        ]
+
+    def resolve_hospital(self, hospital_id: str) -> str:
+        """Return `hospital_id` if it has documents of its own, else DEFAULT_HOSPITAL (shared documents only).
+
+        Hospital IDs come from the caller, so per-hospital state is only ever
+        keyed by the result.
+        """
+        return hospital_id if hospital_id in self.namespaces and hospital_id != SHARED else DEFAULT_HOSPITAL
+
+    def for_hospital(self, hospital_id: str) -> "HospitalIndex":
+        """Return the index a hospital's agents retrieve from; unknown hospitals get the default one."""
+        hospital_id = self.resolve_hospital(hospital_id)
+        with self._lock:
+            view = self._views.get(hospital_id)
+            if view is None:
+                view = self._views[hospital_id] = HospitalIndex(self, hospital_id)
+                while len(self._views) > MAX_HOSPITAL_VIEWS:
+                    self._views.popitem(last=False)
+            else:
+                self._views.move_to_end(hospital_id)
+            return view
+
+
+class HospitalIndex:
+    """Read-only view of a knowledge base restricted to one hospital and the shared namespace."""
+
+    def __init__(self, knowledge_base: KnowledgeBase, hospital_id: str) -> None:
+        """Bind the view to a hospital."""
+        self.knowledge_base = knowledge_base
+        self.hospital_id = hospital_id
+        # answers cached against this version never cross hospitals or index rebuilds
+        self.version = f"{knowledge_base.version}:{hospital_id}"
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Return the embedding model used for queries."""
+        return self.knowledge_base.embedding
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Return the normalized, memoized embedding of `query`."""
+        return self.knowledge_base.embed_query(query)
+
+    def similarity_search_with_score_by_vector(self, embedding: Any, k: int = 4) -> List[Tuple[Document, float]]:
+        """Return the `k` chunks closest to `embedding` with their cosine scores."""
+        return self.knowledge_base.search(embedding, self.hospital_id, k)
+
+    def similarity_search_by_vector(self, embedding: Any, k: int = 4) -> List[Document]:
+        """Return the `k` chunks closest to `embedding`."""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Embed `query` once and return the `k` closest chunks with scores."""
+        return self.similarity_search_with_score_by_vector(self.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Embed `query` once and return the `k` closest chunks."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def as_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None) -> "HospitalRetriever":
+        """Return a retriever of the `k` closest chunks (`search_kwargs={"k": ...}`, default 4)."""
+        return HospitalRetriever(index=self, k=(search_kwargs or {}).get("k", 4))
+
+
+class HospitalRetriever(BaseRetriever):
+    """Retriever over one hospital's view of the knowledge base."""
+
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.index.similarity_search(query, self.k)
+
+
+def _manifest(sources: Mapping[str, Sequence[str]], embedding: Embeddings) -> dict:
+    digests = {
+        namespace: {os.path.basename(path): file_digest(path) for path in paths}
+        for namespace, paths in sorted(sources.items())
+    }
+    model = embedding_model_name(embedding)
+    version = hashlib.sha256(json.dumps([digests, model], sort_keys=True).encode()).hexdigest()[:16]
+    return {"sources": digests, "embedding_model": model, "version": version}
+
+
+def load_or_build_knowledge_base(
+    sources: Optional[Mapping[str, Sequence[str]]] = None,
+    index_dir: str = KNOWLEDGE_INDEX_DIR,
+    embedding: Optional[Embeddings] = None,
+) -> KnowledgeBase:
+    """Load the persisted knowledge base, rebuilding it if any document or the embedder changed."""
+    namespaces = sources if sources is not None else discover_sources()
+    embedding = embedding or get_embedding_model()
+    manifest = read_manifest(index_dir)
+    if manifest is not None and manifest.get("version") == _manifest(namespaces, embedding)["version"]:
+        try:
+            return KnowledgeBase.load(index_dir, embedding)
+        except (OSError, ValueError):
+            # an index from before generations, or one whose files were damaged
+            logger.warning("Rebuilding the knowledge base in %s", index_dir, exc_info=True)
+    return KnowledgeBase.build(namespaces, index_dir, embedding)
+
+
+# Cached so the knowledge base is loaded once per process and shared by every turn
+@lru_cache(maxsize=1)
+def get_knowledge_base() -> KnowledgeBase:
+    """Return the process-wide knowledge base (override the document root with KNOWLEDGE_BASE_DIR)."""
+    return load_or_build_knowledge_base(discover_sources(os.getenv("KNOWLEDGE_BASE_DIR", KNOWLEDGE_BASE_DIR)))
@@ -1,57 +1,185 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
 from functools import lru_cache
-from langchain_google_genai import ChatGoogleGenerativeAI
-from google.genai.types import GenerateContentConfig
-from langchain_core.messages import (AIMessage, HumanMessage, BaseMessage,)
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableLambda
 
-# System instruction for the assistant behavior
-system_instruction = """
-You are a phone-agent assistant.
+from agent.utils.prompts import ContextCache, get_context_cache
 
-Be supportive and friendly.
-
-Keep all messages very short—just a single question or one answer.
-
-Act as if you’re on a live call: no long explanations or chit-chat.
-
-Always reference prior chat context and stay aligned with the conversation.
-"""
-
-# Cached function to get the LLM instance
+# Cached function to get the LLM instance; system prompts are part of each
+# agent's prompt (see agent.utils.prompts) so they can be cached with it
 @lru_cache(maxsize=4)
 def _get_llm():
+    # the Gemini SDK takes most of a cold start to import, so it is loaded on first use
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     llm = ChatGoogleGenerativeAI(
                                     model="gemini-2.5-flash-preview-05-20",
                                     temperature=0,
                                     max_tokens=None,
                                     timeout=None,
                                     max_retries=2,
-                                    config=GenerateContentConfig(
-                                        system_instruction=system_instruction.strip()
-                                    ),
                                 )
         
     return llm
 
+def _tool_key(tool: Any) -> Tuple[str, int]:
+    # the object identity catches a tool redefined under the same name
+    return (getattr(tool, "name", None) or getattr(tool, "__name__", repr(tool)), id(tool))
+
+
+class BoundLLMRegistry:
+    """Builds each agent's tool-bound chat model once and reuses it across graph steps.
+
+    `bind_tools` converts every tool and router schema to JSON on each call, so
+    binding per step costs more than the lookup it replaces. Entries are keyed
+    by agent role and tool set and are dropped with `invalidate`.
+    """
+
+    def __init__(
+        self,
+        factory: Optional[Callable[[], BaseChatModel]] = None,
+        context_cache: Optional[ContextCache] = None,
+    ) -> None:
+        """Create an empty registry over `factory` (the shared Gemini model by default).
+
+        With a `context_cache`, each role's system prompt and tool schemas are
+        sent as a provider cache name instead of inline.
+        """
+        self._factory = factory
+        self.context_cache = context_cache
+        self._entries: Dict[Tuple[str, Tuple[Tuple[str, int], ...], Optional[str]], Runnable] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+
+    def get(self, role: str, tools: Sequence[Any] = ()) -> Runnable:
+        """Return the chat model for `role` bound to `tools`, building it on first use."""
+        tool_keys = tuple(_tool_key(tool) for tool in tools)
+        llm = None
+        cached_content = None
+        if self.context_cache is not None:
+            # renewed caches get a new name, so the entry is keyed on it; creating one is
+            # a network call, so it happens before taking the lock other roles need
+            llm = (self._factory or _get_llm)()
+            cached_content = self.context_cache.lookup(getattr(llm, "model", ""), role, tools)
+        key = (role, tool_keys, cached_content)
+        with self._lock:
+            bound = self._entries.get(key)
+            if bound is not None:
+                self.hits += 1
+                return bound
+            start = time.perf_counter()
+            llm = llm or (self._factory or _get_llm)()
+            if cached_content is not None:
+                # the provider rejects a system prompt or tools next to a cache holding them
+                bound = RunnableLambda(_without_system_prompt) | llm.bind(cached_content=cached_content)
+                for stale in [k for k in self._entries if k[:2] == key[:2]]:
+                    del self._entries[stale]
+            else:
+                bound = llm.bind_tools(list(tools)) if tools else llm
+            self._entries[key] = bound
+            self.misses += 1
+            self.build_seconds += time.perf_counter() - start
+            return bound
+
+    def invalidate(self, role: Optional[str] = None) -> None:
+        """Drop cached entries for `role`, or every entry if no role is given."""
+        with self._lock:
+            for key in [key for key in self._entries if role is None or key[0] == role]:
+                del self._entries[key]
+
+    def set_factory(self, factory: Optional[Callable[[], BaseChatModel]]) -> None:
+        """Swap the underlying chat model factory and drop every cached entry."""
+        with self._lock:
+            self._factory = factory
+            self._entries.clear()
+
+
+def _without_system_prompt(messages: List[BaseMessage]) -> List[BaseMessage]:
+    return [message for message in messages if not isinstance(message, SystemMessage)]
+
+
+# Process-wide registry used by the graph nodes
+llm_registry = BoundLLMRegistry(context_cache=get_context_cache())
+
+
+def get_bound_llm(role: str, tools: Sequence[Any] = ()) -> Runnable:
+    """Return the cached tool-bound chat model for an agent role."""
+    return llm_registry.get(role, tools)
+
+
+def invalidate_bound_llms(role: Optional[str] = None) -> None:
+    """Invalidate cached bound models after an agent's tools change."""
+    llm_registry.invalidate(role)
+
 # Cached function to get the embedding instance
 @lru_cache(maxsize=2)
 def _get_embedding_model():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
     embed_model = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
     return embed_model
 
-def dummy_token_counter(messages: list[BaseMessage]) -> int:
-    # treat each message like it adds 3 default tokens at the beginning
-    # of the message and at the end of the message. 3 + 4 + 3 = 10 tokens
-    # per message.
-
-    default_content_len = 8
-    default_msg_prefix_len = 3
-    default_msg_suffix_len = 3
-
-    count = 0
-    for msg in messages:
-        if isinstance(msg.content, str):
-            count += default_msg_prefix_len + default_content_len + default_msg_suffix_len
-        if isinstance(msg.content, list):
-            count += default_msg_prefix_len + len(msg.content) *  default_content_len + default_msg_suffix_len
-    return count
+class HashingEmbeddings(Embeddings):
+    """Local, dependency-free embeddings built from hashed word and character n-grams.
+
+    Far weaker than a learned model, but deterministic, offline and fast enough
+    to run on every turn; used for intent fast paths and offline testing.
+    """
+
+    def __init__(self, size: int = 512) -> None:
+        """Create an embedder producing `size`-dimensional unit vectors."""
+        self.size = size
+        self.model = f"hashing-{size}"
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9']+", text.lower())
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts."""
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._embed(text)
+
+
+# Embedding backends selectable with EMBEDDING_BACKEND; "local" works offline
+EMBEDDING_BACKENDS: Dict[str, Callable[[], Embeddings]] = {
+    "google": _get_embedding_model,
+    "local": HashingEmbeddings,
+}
+
+
+def get_embedding_model() -> Embeddings:
+    """Return the embedder named by EMBEDDING_BACKEND (Google by default)."""
+    backend = os.getenv("EMBEDDING_BACKEND", "google")
+    try:
+        factory = EMBEDDING_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}; expected one of {sorted(EMBEDDING_BACKENDS)}") from None
+    return factory()
@@ -0,0 +1,46 @@
+"""Import patients' phone numbers from the hospital's records.
+
+`find_patient` can identify callers by phone number, but the application never
+collects one: the Patient table's Phone column stays empty until it is filled
+from an export of the hospital's patient records, a CSV file with Patient_ID
+and Phone columns:
+
+    python -m agent.utils.patient_phones phones.csv --db appointments.db
+
+Phones are stored as digits only; a blank phone clears the patient's number.
+"""
+
+import argparse
+import csv
+from typing import Iterator, Optional, Sequence, Tuple
+
+from agent.utils.db import DB_PATH, ConnectionPool, HospitalRepository
+
+
+def read_phones(path: str) -> Iterator[Tuple[int, str]]:
+    """Yield `(patient_id, phone)` pairs from a CSV file with Patient_ID and Phone columns."""
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            yield int(row["Patient_ID"]), row.get("Phone") or ""
+
+
+def import_phones(path: str, db_path: str = DB_PATH) -> int:
+    """Store the phone numbers in a CSV file and return the number of patients updated."""
+    pool = ConnectionPool(db_path)
+    try:
+        return HospitalRepository(pool).set_patient_phones(read_phones(path))
+    finally:
+        pool.close_all()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command-line entry point: import a CSV file of phone numbers and print how many were stored."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="CSV file with Patient_ID and Phone columns")
+    parser.add_argument("--db", default=DB_PATH, help="database to update")
+    args = parser.parse_args(argv)
+    print(f"{args.db}: {import_phones(args.path, args.db)} patients updated")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Speculative prefetch of booking data while the router decides.
+
+Every turn starts a prefetch in the background, on a small thread pool of its
+own, before the router runs; the graph does not wait for it. It pulls likely
+doctor names and specializations out of the latest user message, runs the
+doctor searches the booking agent is about to ask for, and loads those
+doctors' calendars into the availability index. Search results are kept per
+conversation (the LangGraph thread), so when the booking agent calls
+`search_for_doctor` or `find_available_slots` a moment later the tool answers
+from memory instead of waiting on SQLite; a tool call that arrives while the
+prefetch is running waits for it rather than repeating its queries, but
+never for one still queued behind other prefetches.
+Entries expire after `ttl_seconds`.
+"""
+
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple
+
+from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.runnables.config import ensure_config
+
+from agent.utils.availability import AvailabilityIndex, get_availability_index
+from agent.utils.db import DoctorPage, DoctorRow, HospitalRepository, get_repository
+
+# Doctors fetched per prefetched search; tool calls asking for more go to the database
+PREFETCH_LIMIT = 5
+# Best matches of each search whose calendars are loaded
+PREFETCH_CALENDARS = 3
+# Longest a tool call waits for its conversation's running prefetch
+PREFETCH_WAIT_SECONDS = 1.0
+# Threads running prefetches; kept apart from the database pool the tools use
+PREFETCH_THREADS = int(os.getenv("PREFETCH_THREADS", "2"))
+
+# True while a background prefetch runs, so its queries can be told apart
+in_prefetch: ContextVar[bool] = ContextVar("in_prefetch", default=False)
+
+# "Dr. Clara Lee", "doctor Lee": the name itself must be capitalized
+DOCTOR_NAME = re.compile(r"\b(?i:dr\.?|doctor)\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)?)")
+
+# Words that point at a specialization
+SPECIALIZATION_KEYWORDS: Tuple[Tuple[Pattern[str], str], ...] = (
+    (re.compile(r"\b(cardiolog\w*|heart)\b"), "Cardiology"),
+    (re.compile(r"\b(neurolog\w*|brain|migraines?)\b"), "Neurology"),
+    (re.compile(r"\b(pa?ediatric\w*|pa?ediatrician|child(ren)?|my (son|daughter|baby|kid))\b"), "Pediatrics"),
+    (re.compile(r"\b(dermatolog\w*|skin)\b"), "Dermatology"),
+    (re.compile(r"\b(orthopa?edic\w*|bones?|joints?)\b"), "Orthopedics"),
+)
+
+_TITLE = re.compile(r"^(dr\.?|doctor)\s+", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PrefetchHints:
+    """Doctor names and specializations mentioned in a message."""
+
+    names: Tuple[str, ...] = ()
+    specializations: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        """Return True if there is anything to prefetch."""
+        return bool(self.names or self.specializations)
+
+
+def extract_hints(text: str) -> PrefetchHints:
+    """Return the doctor names and specializations a message mentions."""
+    names = tuple(dict.fromkeys(match.group(1) for match in DOCTOR_NAME.finditer(text)))
+    lowered = text.lower()
+    specializations = tuple(dict.fromkeys(
+        specialization for pattern, specialization in SPECIALIZATION_KEYWORDS if pattern.search(lowered)
+    ))
+    return PrefetchHints(names, specializations)
+
+
+def _search_key(name: Optional[str], specialization: Optional[str]) -> Tuple[str, str]:
+    # "Dr. Clara  Lee" and "clara lee" are the same search
+    name_key = " ".join(_TITLE.sub("", name.strip()).lower().split()) if name else ""
+    return name_key, (specialization or "").strip().lower()
+
+
+def _slice(page: DoctorPage, limit: int) -> DoctorPage:
+    more = len(page["doctors"]) > limit or page["next_offset"] is not None
+    return {"doctors": page["doctors"][:limit], "next_offset": limit if more else None}
+
+
+@dataclass
+class ConversationPrefetch:
+    """Doctor searches and doctors prefetched for one conversation."""
+
+    expires: float
+    searches: Dict[Tuple[str, str], DoctorPage] = field(default_factory=dict)
+    doctors: Dict[int, DoctorRow] = field(default_factory=dict)
+
+
+class PrefetchCache:
+    """Per-conversation prefetched doctor data with TTL and LRU eviction."""
+
+    def __init__(self, ttl_seconds: float = 120.0, max_conversations: int = 1024) -> None:
+        """Create an empty cache.
+
+        Args:
+            ttl_seconds: Lifetime of a conversation's entries after its last prefetch.
+            max_conversations: Conversations kept before the least recently used is dropped.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_conversations = max_conversations
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._conversations: OrderedDict[str, ConversationPrefetch] = OrderedDict()
+        # conversation -> its prefetch still running
+        self._running: Dict[str, Future[List[int]]] = {}
+
+    def _get(self, conversation_id: Optional[str]) -> Optional[ConversationPrefetch]:
+        # caller holds the lock
+        if conversation_id is None:
+            return None
+        entry = self._conversations.get(conversation_id)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self._conversations[conversation_id]
+            return None
+        self._conversations.move_to_end(conversation_id)
+        return entry
+
+    def track(self, conversation_id: str, future: Future[List[int]]) -> None:
+        """Register a conversation's running prefetch, until `future` is done."""
+        with self._lock:
+            self._running[conversation_id] = future
+
+        def done(_: Future[List[int]]) -> None:
+            with self._lock:
+                if self._running.get(conversation_id) is future:
+                    del self._running[conversation_id]
+
+        future.add_done_callback(done)
+
+    def pending(self, conversation_id: Optional[str]) -> Optional[Future[List[int]]]:
+        """Return a conversation's prefetch that is queued or running, if any."""
+        if conversation_id is None:
+            return None
+        with self._lock:
+            return self._running.get(conversation_id)
+
+    def wait(self, conversation_id: Optional[str], timeout: float = PREFETCH_WAIT_SECONDS) -> None:
+        """Wait up to `timeout` seconds for a conversation's prefetch, if it is already running."""
+        future = self.pending(conversation_id)
+        # a queued prefetch may start later than the database answers the tool
+        if future is not None and future.running():
+            try:
+                future.result(timeout)
+            except Exception:
+                # a failed or slow prefetch just leaves the tool to query the database
+                pass
+
+    def store(
+        self,
+        conversation_id: str,
+        page: DoctorPage,
+        name: Optional[str] = None,
+        specialization: Optional[str] = None,
+    ) -> None:
+        """Remember the first page of a doctor search for a conversation."""
+        with self._lock:
+            entry = self._get(conversation_id)
+            if entry is None:
+                entry = self._conversations[conversation_id] = ConversationPrefetch(0.0)
+                while len(self._conversations) > self.max_conversations:
+                    self._conversations.popitem(last=False)
+            entry.expires = time.monotonic() + self.ttl_seconds
+            entry.searches[_search_key(name, specialization)] = page
+            for doctor in page["doctors"]:
+                entry.doctors[doctor["Doctor_ID"]] = doctor
+
+    def search(
+        self,
+        conversation_id: Optional[str],
+        name: Optional[str] = None,
+        specialization: Optional[str] = None,
+        limit: int = 5,
+    ) -> Optional[DoctorPage]:
+        """Return the first `limit` results of a prefetched search, or None if it was not prefetched."""
+        if limit > PREFETCH_LIMIT:
+            return None
+        self.wait(conversation_id)
+        with self._lock:
+            entry = self._get(conversation_id)
+            page = entry.searches.get(_search_key(name, specialization)) if entry else None
+            if page is None:
+                return None
+            self.hits += 1
+        return _slice(page, max(1, limit))
+
+    def doctor(self, conversation_id: Optional[str], doctor_id: int) -> Optional[DoctorRow]:
+        """Return a doctor found by a prefetched search, or None."""
+        self.wait(conversation_id)
+        with self._lock:
+            entry = self._get(conversation_id)
+            doctor = entry.doctors.get(doctor_id) if entry else None
+            if doctor is not None:
+                self.hits += 1
+        return doctor
+
+    def clear(self) -> None:
+        """Drop every conversation."""
+        with self._lock:
+            self._conversations.clear()
+
+
+def prefetch_enabled() -> bool:
+    """Return False when PREFETCH is set to 0."""
+    return os.getenv("PREFETCH", "1") != "0"
+
+
+@lru_cache(maxsize=1)
+def get_prefetch_cache() -> PrefetchCache:
+    """Return the process-wide prefetch cache."""
+    return PrefetchCache(ttl_seconds=float(os.getenv("PREFETCH_TTL", "120")))
+
+
+def current_conversation_id() -> Optional[str]:
+    """Return the thread ID of the graph run the caller belongs to, if any."""
+    thread_id = ensure_config().get("configurable", {}).get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+def prefetch(
+    text: str,
+    conversation_id: str,
+    repository: Optional[HospitalRepository] = None,
+    cache: Optional[PrefetchCache] = None,
+    index: Optional[AvailabilityIndex] = None,
+) -> List[int]:
+    """Run the doctor searches `text` hints at and load the found doctors' calendars.
+
+    Returns:
+        The IDs of the doctors whose data was warmed.
+    """
+    hints = extract_hints(text)
+    if not hints:
+        return []
+    repository = repository or get_repository()
+    cache = cache or get_prefetch_cache()
+    doctor_ids: Dict[int, None] = {}
+    searches = [(name, None) for name in hints.names] + [(None, spec) for spec in hints.specializations]
+    for name, specialization in searches:
+        page = repository.search_doctors(name, specialization=specialization, limit=PREFETCH_LIMIT)
+        cache.store(conversation_id, page, name, specialization)
+        doctor_ids.update(dict.fromkeys(doctor["Doctor_ID"] for doctor in page["doctors"][:PREFETCH_CALENDARS]))
+    (index or get_availability_index()).warm(doctor_ids)
+    return list(doctor_ids)
+
+
+def prefetch_turn(messages: Sequence[AnyMessage], conversation_id: Optional[str]) -> List[int]:
+    """Prefetch for the latest user message of a conversation, if prefetching applies."""
+    if not prefetch_enabled() or conversation_id is None or not messages:
+        return []
+    last = messages[-1]
+    if not isinstance(last, HumanMessage) or not isinstance(last.content, str):
+        return []
+    return prefetch(last.content, str(conversation_id))
+
+
+@lru_cache(maxsize=1)
+def _prefetch_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=PREFETCH_THREADS, thread_name_prefix="prefetch")
+
+
+def _prefetch_in_background(text: str, conversation_id: str) -> List[int]:
+    # runs in a copy of the caller's context, so the flag does not leak back
+    in_prefetch.set(True)
+    return prefetch(text, conversation_id)
+
+
+def prefetch_in_background(messages: Sequence[AnyMessage], conversation_id: Optional[str]) -> Optional[Future[List[int]]]:
+    """Start `prefetch_turn` on the prefetch thread pool without waiting for it; None if nothing applies."""
+    if not prefetch_enabled() or conversation_id is None or not messages:
+        return None
+    last = messages[-1]
+    if not isinstance(last, HumanMessage) or not isinstance(last.content, str) or not extract_hints(last.content):
+        return None
+    context = contextvars.copy_context()
+    future = _prefetch_executor().submit(context.run, _prefetch_in_background, last.content, str(conversation_id))
+    get_prefetch_cache().track(str(conversation_id), future)
+    return future
@@ -1,50 +1,276 @@
-# from langchain_core.prompts import ChatPromptTemplate
-# from datetime import datetime
-
-# def _get_cancel_appointment_prompt():
-#     cancel_appointment_prompt = ChatPromptTemplate.from_messages(
-#         [
-#             (
-#                 "system",
-#                 "You are a dedicated assistant for cancelling doctor appointments. "
-#                 "Your task begins when delegated by the primary assistant. "
-#                 "Start by verifying the appointment ID. Then ask the user to confirm cancellation explicitly. "
-#                 "Only proceed to cancel if the user confirms. Use the proper tool and clearly communicate the result. "
-#                 "Keep responses short, clear, and purposeful."
-#             ),
-#             ("placeholder", "{messages}"),
-#         ]
-#     ).partial(time=datetime.now())
-
-#     return cancel_appointment_prompt
-
-# def _get_book_doctor_prompt():
-#     book_doctor_prompt = ChatPromptTemplate.from_messages(
-#         [
-#             (
-#                 "system",
-#                 "You are an assistant for booking new doctor appointments, delegated by the main assistant. "
-#                 "Help users find doctors based on their preferences (name, specialization, location). "
-#                 "Check availability for the requested date and time before proceeding. "
-#                 "Confirm all details with the user first. "
-#                 "Do not book unless availability is verified using the appropriate tool."
-#             ),
-#             ("placeholder", "{messages}"),
-#         ]
-#     ).partial(time=datetime.now())
-
-#     return book_doctor_prompt
-
-# def _get_router_prompt():
-#     router_prompt = ChatPromptTemplate.from_messages(
-#         [
-#             (
-#                 "system",
-#                 "You are a routing assistant. "
-#                 "Based on the message history, decide whether the conversation should be handed over to a specialized agent. "
-#                 "Use the appropriate tool to route the request when needed."
-#             ),
-#             ("placeholder", "{messages}"),
-#         ]
-#     ).partial(time=datetime.now())
-#     return router_prompt
\ No newline at end of file
+"""Prompt assembly with a byte-stable prefix for provider-side context caching.
+
+Every agent prompt is laid out as
+
+    [system prompt] [conversation history] [turn context] [latest caller message ...]
+
+The system prompt is the shared phone-agent instruction followed by the
+agent's own instructions. It is a module constant with no dates, summaries or
+IDs in it, so together with the agent's tool schemas it is byte-identical on
+every turn. Data that changes (today's date, the rolling history summary) goes
+into a turn-context message placed just before the latest caller message, as
+late as possible, so it never invalidates the cached prefix.
+
+Gemini 2.5 models reuse a stable prefix implicitly. With PROMPT_CACHE=1 the
+prefix is also stored explicitly: `ContextCache` creates one provider-side
+cache per prefix fingerprint (system prompt and tool schemas) and renews it
+before it expires, and the bound chat model then sends only the cache name
+in place of that prefix.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import AnyMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+# Shared by every agent; kept first so all agents share the start of their prefix
+SYSTEM_INSTRUCTION = (
+    "You are a phone-agent assistant.\n\n"
+    "Be supportive and friendly.\n\n"
+    "Keep all messages very short—just a single question or one answer.\n\n"
+    "Act as if you’re on a live call: no long explanations or chit-chat.\n\n"
+    "Always reference prior chat context and stay aligned with the conversation."
+)
+
+ROUTER_PROMPT = (
+    "You are a routing assistant. "
+    "Based on the message history, decide whether the conversation should be handed over to a specialized agent. "
+    "Use the appropriate tool to route the request. "
+    "If no tool is needed, reply without calling a tool. "
+    "You can not use other tools on booking and cancelling. "
+    "To move an existing appointment, route to reschedule_booking_assistant rather than cancelling and booking again."
+)
+
+NEW_BOOKING_PROMPT = (
+    "You are an assistant for booking new doctor appointments, delegated by the main assistant. "
+    "Help users find doctors based on their preferences (name, specialization, location). "
+    "Identify the patient with find_patient instead of asking for their patient ID. "
+    "Check availability for the requested date and time before proceeding. "
+    "Confirm all details with the user first. "
+    "Do not book unless availability is verified using the appropriate tool."
+)
+
+CANCEL_BOOKING_PROMPT = (
+    "You are a dedicated assistant for cancelling doctor appointments, delegated by the main assistant. "
+    "Find the appointment with find_patient and list_upcoming_appointments, or verify the appointment ID "
+    "if the user gives one. Then ask the user to confirm cancellation explicitly. "
+    "Only proceed to cancel if the user confirms. Use the proper tool and clearly communicate the result."
+)
+
+RESCHEDULE_BOOKING_PROMPT = (
+    "You are a dedicated assistant for moving existing doctor appointments to another date or time, "
+    "delegated by the main assistant. "
+    "Find the appointment with find_patient and list_upcoming_appointments, or verify the appointment ID "
+    "if the user gives one. Offer free slots of the same doctor with find_available_slots. "
+    "Confirm the new date and time with the user, then move the appointment with reschedule_appointment. "
+    "Never cancel and book again to reschedule."
+)
+
+GENERAL_HOSPITAL_PROMPT = (
+    "You are an assistant for question-answering tasks about the hospital. "
+    "Use the retrieved context given with the question to answer it. "
+    "If you don't know the answer, just say that you don't know. "
+    "Use three sentences maximum and keep the answer concise."
+)
+
+# Static prompt of each agent role, as passed to `get_bound_llm`
+AGENT_PROMPTS: Dict[str, str] = {
+    role: f"{SYSTEM_INSTRUCTION}\n\n{prompt}"
+    for role, prompt in (
+        ("router_assistant", ROUTER_PROMPT),
+        ("new_booking_assistant", NEW_BOOKING_PROMPT),
+        ("cancel_booking_assistant", CANCEL_BOOKING_PROMPT),
+        ("reschedule_booking_assistant", RESCHEDULE_BOOKING_PROMPT),
+        ("general_hospital_assistant", GENERAL_HOSPITAL_PROMPT),
+    )
+}
+
+
+def system_prompt(role: str) -> SystemMessage:
+    """Return the static system message of an agent role."""
+    return SystemMessage(content=AGENT_PROMPTS[role])
+
+
+def turn_context(summary: Optional[str] = None, today: Optional[date] = None) -> Optional[HumanMessage]:
+    """Return the message carrying this turn's dynamic data, or None if there is none."""
+    lines = []
+    if today is not None:
+        lines.append(f"Today is {today:%A %Y-%m-%d}.")
+    if summary:
+        lines.append(f"Summary of the earlier conversation: {summary}")
+    if not lines:
+        return None
+    return HumanMessage(content="[Context for this turn, not said by the caller]\n" + "\n".join(lines))
+
+
+def assemble(
+    role: str,
+    messages: Sequence[AnyMessage],
+    summary: Optional[str] = None,
+    today: Optional[date] = None,
+) -> List[BaseMessage]:
+    """Lay out an agent prompt: static system prompt, history, turn context, latest caller message."""
+    prompt: List[BaseMessage] = [system_prompt(role), *messages]
+    context = turn_context(summary, today)
+    if context is not None:
+        last_human = max((i for i, message in enumerate(prompt) if isinstance(message, HumanMessage)), default=len(prompt))
+        prompt.insert(last_human, context)
+    return prompt
+
+
+def tool_schemas(tools: Sequence[Any]) -> List[dict]:
+    """Return the JSON schemas of `tools` in the order they are bound."""
+    return [convert_to_openai_tool(tool)["function"] for tool in tools]
+
+
+def prefix_fingerprint(role: str, tools: Sequence[Any] = ()) -> str:
+    """Return a hash of everything in a role's cacheable prefix: system prompt and tool schemas."""
+    payload = json.dumps({"system": AGENT_PROMPTS[role], "tools": tool_schemas(tools)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# create(model, system instruction, tool schemas, ttl seconds) -> provider cache name
+CacheCreator = Callable[[str, str, List[dict], int], str]
+
+
+@dataclass(frozen=True)
+class _CachedPrefix:
+    name: str
+    expires_at: float
+
+
+class ContextCache:
+    """Provider-side caches of agent prompt prefixes, one per prefix fingerprint."""
+
+    def __init__(
+        self,
+        create: CacheCreator,
+        ttl_seconds: int = 3600,
+        renew_before_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a cache registry.
+
+        Args:
+            create: Creates a provider cache and returns its name.
+            ttl_seconds: Lifetime requested for each provider cache.
+            renew_before_seconds: A cache this close to expiry is replaced by a new one.
+            clock: Monotonic time source.
+        """
+        self._create = create
+        self.ttl_seconds = ttl_seconds
+        self.renew_before_seconds = renew_before_seconds
+        self._clock = clock
+        self._entries: Dict[str, _CachedPrefix] = {}
+        self._fingerprints: Dict[Tuple[str, Tuple[int, ...]], str] = {}
+        # prefixes the provider refused (e.g. below its minimum size) are sent uncached
+        self._refused: Set[str] = set()
+        # prefixes whose cache is being created, resolving to its name (None if refused)
+        self._pending: Dict[str, Future[Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def lookup(self, model: str, role: str, tools: Sequence[Any] = ()) -> Optional[str]:
+        """Return the provider cache name of a role's prefix, creating it if needed; None to send it uncached.
+
+        Creating a cache is a network round-trip, so it runs outside the lock:
+        one caller creates each prefix's cache while concurrent callers for the
+        same prefix wait on its future (or keep using the old cache while it is
+        renewed), and other prefixes are not held up at all.
+        """
+        if role not in AGENT_PROMPTS:
+            return None
+        with self._lock:
+            # schemas are converted once per tool set, not on every turn
+            tools_key = (role, tuple(id(tool) for tool in tools))
+            fingerprint = self._fingerprints.get(tools_key)
+            if fingerprint is None:
+                fingerprint = self._fingerprints[tools_key] = prefix_fingerprint(role, tools)
+            entry = self._entries.get(fingerprint)
+            now = self._clock()
+            if entry is not None and entry.expires_at - self.renew_before_seconds > now:
+                return entry.name
+            if fingerprint in self._refused:
+                return None
+            pending = self._pending.get(fingerprint)
+            if pending is not None and entry is not None and entry.expires_at > now:
+                return entry.name
+            creating = pending is None
+            if creating:
+                pending = self._pending[fingerprint] = Future()
+        if not creating:
+            return pending.result()
+
+        try:
+            name: Optional[str] = self._create(model, AGENT_PROMPTS[role], tool_schemas(tools), self.ttl_seconds)
+        except Exception:
+            logger.warning("Context cache for %s was refused; sending its prompt uncached", role, exc_info=True)
+            name = None
+        with self._lock:
+            if name is None:
+                self._refused.add(fingerprint)
+            else:
+                self._entries[fingerprint] = _CachedPrefix(name, self._clock() + self.ttl_seconds)
+                self.created += 1
+            del self._pending[fingerprint]
+        pending.set_result(name)
+        return name
+
+
+@lru_cache(maxsize=1)
+def _genai_client() -> Any:
+    from google import genai
+
+    return genai.Client()
+
+
+def gemini_cache_creator() -> CacheCreator:
+    """Return a `CacheCreator` backed by the Gemini caching API (the SDK is loaded on first use)."""
+
+    def create(model: str, system: str, schemas: List[dict], ttl_seconds: int) -> str:
+        from google.genai import types
+
+        declarations = [
+            types.FunctionDeclaration(
+                name=schema["name"],
+                description=schema.get("description", ""),
+                parameters_json_schema=schema.get("parameters"),
+            )
+            for schema in schemas
+        ]
+        cache = _genai_client().caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system,
+                tools=[types.Tool(function_declarations=declarations)] if declarations else None,
+                ttl=f"{ttl_seconds}s",
+            ),
+        )
+        return str(cache.name)
+
+    return create
+
+
+def prompt_cache_enabled() -> bool:
+    """Return whether prompt prefixes are cached explicitly on the provider (PROMPT_CACHE=1)."""
+    return os.getenv("PROMPT_CACHE", "0") == "1"
+
+
+@lru_cache(maxsize=1)
+def get_context_cache() -> Optional[ContextCache]:
+    """Return the process-wide Gemini context cache, or None when PROMPT_CACHE is off."""
+    if not prompt_cache_enabled():
+        return None
+    return ContextCache(gemini_cache_creator(), ttl_seconds=int(os.getenv("PROMPT_CACHE_TTL", "3600")))
@@ -0,0 +1,300 @@
+"""Reproducible synthetic hospital databases for scale testing.
+
+The bundled database holds a handful of rows, which says nothing about how
+the tools' queries behave across a hospital network. `generate_database`
+writes the same schema filled with Doctor, Patient and Appointment rows at
+any scale, with the skew real data has:
+
+- a few doctors carry most of the bookings (Zipf-distributed popularity,
+  capped below each doctor's calendar capacity);
+- a few patients book often, most rarely;
+- specializations and locations are unevenly common, and names repeat;
+- weekdays and mornings are busier than weekends and evenings.
+
+Rows are bulk-loaded before the indexes are built, and the database is then
+migrated by `ConnectionPool` like any other, so it has exactly the indexes
+the application creates. The same seed always produces the same database.
+
+    python -m agent.utils.synthetic hospital.db --doctors 10000 --patients 2000000 --appointments 50000000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from agent.utils.availability import SLOTS_PER_DAY, time_of
+from agent.utils.db import DB_PATH, PATIENT_PHONE_MIGRATION, ConnectionPool
+
+FIRST_NAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Daniel", "Nancy", "Matthew", "Lisa", "Anthony", "Betty", "Mark", "Margaret", "Donald", "Sandra",
+    "Steven", "Ashley", "Paul", "Kimberly", "Andrew", "Emily", "Joshua", "Donna", "Kenneth", "Michelle",
+    "Wei", "Priya", "Mohammed", "Fatima", "Carlos", "Sofia", "Hiroshi", "Yuki", "Olga", "Ivan",
+)
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts",
+    "Patel", "Kim", "Chen", "Singh", "Khan", "Ivanova", "Sato", "Müller", "Rossi", "O'Brien",
+)
+# (specialization, relative share of doctors)
+SPECIALIZATIONS = (
+    ("General Practice", 20), ("Pediatrics", 10), ("Internal Medicine", 9), ("Cardiology", 7),
+    ("Obstetrics and Gynecology", 7), ("Orthopedics", 6), ("Dermatology", 5), ("Psychiatry", 5),
+    ("Neurology", 4), ("Ophthalmology", 4), ("Radiology", 4), ("Oncology", 3), ("Gastroenterology", 3),
+    ("Endocrinology", 3), ("Urology", 3), ("Pulmonology", 2), ("Nephrology", 2), ("Rheumatology", 2),
+    ("Otolaryngology", 2), ("Allergy and Immunology", 1),
+)
+LOCATIONS = (
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego",
+    "Dallas", "San Jose", "Austin", "Jacksonville", "Columbus", "Charlotte", "Indianapolis", "Seattle",
+    "Denver", "Boston", "Nashville", "Portland",
+)
+# Relative busyness of Monday..Sunday and of each slot of the day (morning peak)
+WEEKDAY_WEIGHTS = (10, 10, 9, 9, 8, 3, 1)
+SLOT_WEIGHTS = tuple(3.0 if slot < SLOTS_PER_DAY // 3 else 2.0 if slot < 2 * SLOTS_PER_DAY // 3 else 1.0 for slot in range(SLOTS_PER_DAY))
+# Share of a doctor's calendar that may be booked, so sampling free cells stays fast
+MAX_OCCUPANCY = 0.6
+# Skew of doctor popularity (Zipf exponent)
+DOCTOR_SKEW = 0.8
+# Patient booking frequency: Pareto shape, and the cap relative to the least frequent patient
+PATIENT_PARETO_SHAPE = 2.0
+PATIENT_MAX_FREQUENCY = 50.0
+# Share of patients without a phone number on file
+NO_PHONE_SHARE = 0.1
+
+INSERT_DOCTOR = "INSERT INTO Doctor (Doctor_ID, Doctor_Name, Specialization, Location, Rating) VALUES (?, ?, ?, ?, ?)"
+INSERT_PATIENT = "INSERT INTO Patient (Patient_ID, Patient_Name, Age, Phone) VALUES (?, ?, ?, ?)"
+INSERT_APPOINTMENT = """
+    INSERT INTO Appointment (Appointment_ID, Appointment_Time, Appointment_Date, Doctor_ID, Patient_ID)
+    VALUES (?, ?, ?, ?, ?)
+"""
+BATCH_SIZE = 50_000
+
+
+@dataclass
+class GeneratedDatabase:
+    """Row counts and timings of a generated database."""
+
+    path: str
+    doctors: int
+    patients: int
+    appointments: int
+    first_date: str
+    last_date: str
+    load_seconds: float
+    index_seconds: float
+
+
+def _zipf_weights(count: int, skew: float, rng: random.Random) -> List[float]:
+    # rank r gets weight 1 / r^skew, ranks shuffled over the IDs
+    weights = [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+    rng.shuffle(weights)
+    return weights
+
+
+def _quotas(weights: Sequence[float], total: int, capacity: int) -> List[int]:
+    """Split `total` in proportion to `weights` with no share above `capacity` (water filling)."""
+    if total > capacity * len(weights):
+        raise ValueError(
+            f"{total} appointments do not fit {len(weights)} doctors at {capacity} slots each; "
+            "add doctors or days"
+        )
+    quotas = [0] * len(weights)
+    open_ids = list(range(len(weights)))
+    remaining = total
+    while remaining > 0 and open_ids:
+        weight = sum(weights[i] for i in open_ids)
+        still_open = []
+        assigned = 0
+        for i in open_ids:
+            share = min(capacity - quotas[i], int(remaining * weights[i] / weight))
+            quotas[i] += share
+            assigned += share
+            if quotas[i] < capacity:
+                still_open.append(i)
+        if assigned == 0:
+            # rounding left a few rows: hand them to the heaviest open doctors
+            for i in sorted(still_open, key=lambda i: -weights[i])[:remaining]:
+                quotas[i] += 1
+                assigned += 1
+        remaining -= assigned
+        open_ids = still_open
+    return quotas
+
+
+def _doctors(count: int, rng: random.Random) -> Iterator[Tuple[int, str, str, str, float]]:
+    specializations, shares = zip(*SPECIALIZATIONS)
+    location_weights = _zipf_weights(len(LOCATIONS), 1.0, random.Random(rng.random()))
+    for doctor_id in range(1, count + 1):
+        name = f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        specialization = rng.choices(specializations, shares)[0]
+        location = rng.choices(LOCATIONS, location_weights)[0]
+        rating = round(min(5.0, max(1.0, rng.gauss(4.2, 0.45))), 1)
+        yield doctor_id, name, specialization, location, rating
+
+
+def _phone(patient_id: int) -> str:
+    # a bijection on 10-digit numbers, so phones are unique without tracking them
+    return str(2_000_000_000 + (patient_id * 2_654_435_761) % 7_999_999_999)
+
+
+def _patients(count: int, rng: random.Random) -> Iterator[Tuple[int, str, int, Optional[str]]]:
+    for patient_id in range(1, count + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        age = min(99, int(rng.triangular(0, 100, 45)))
+        phone = None if rng.random() < NO_PHONE_SHARE else _phone(patient_id)
+        yield patient_id, name, age, phone
+
+
+def _appointments(
+    doctors: int, patients: int, total: int, first_day: date, days: int, rng: random.Random
+) -> Iterator[Tuple[int, str, str, int, int]]:
+    day_weights = [WEEKDAY_WEIGHTS[(first_day + timedelta(days=i)).weekday()] for i in range(days)]
+    cells = [(day, slot) for day in range(days) for slot in range(SLOTS_PER_DAY)]
+    cell_totals = list(itertools.accumulate(day_weights[day] * SLOT_WEIGHTS[slot] for day, slot in cells))
+    patient_totals = list(itertools.accumulate(
+        min(rng.paretovariate(PATIENT_PARETO_SHAPE), PATIENT_MAX_FREQUENCY) for _ in range(patients)
+    ))
+    capacity = int(len(cells) * MAX_OCCUPANCY)
+    quotas = _quotas(_zipf_weights(doctors, DOCTOR_SKEW, rng), total, capacity)
+
+    dates = [(first_day + timedelta(days=i)).isoformat() for i in range(days)]
+    times = [time_of(slot) for slot in range(SLOTS_PER_DAY)]
+    appointment_id = 0
+    for doctor_id, quota in enumerate(quotas, start=1):
+        taken = set()
+        while len(taken) < quota:
+            for index in rng.choices(range(len(cells)), cum_weights=cell_totals, k=quota - len(taken)):
+                taken.add(index)
+        patient_ids = rng.choices(range(1, patients + 1), cum_weights=patient_totals, k=quota)
+        for index, patient_id in zip(sorted(taken), patient_ids):
+            day, slot = cells[index]
+            appointment_id += 1
+            yield appointment_id, times[slot], dates[day], doctor_id, patient_id
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    # the tables exactly as in the bundled database; indexes come from the migrations
+    template = sqlite3.connect(DB_PATH)
+    try:
+        tables = template.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ('Doctor', 'Patient', 'Appointment')"
+        ).fetchall()
+    finally:
+        template.close()
+    for (statement,) in tables:
+        conn.execute(statement)
+    if not any(column[1] == "Phone" for column in conn.execute("PRAGMA table_info(Patient)")):
+        for statement in PATIENT_PHONE_MIGRATION:
+            conn.execute(statement)
+
+
+def _load(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]) -> int:
+    count = 0
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return count
+        conn.executemany(sql, batch)
+        count += len(batch)
+
+
+def generate_database(
+    path: str,
+    doctors: int = 100,
+    patients: int = 5_000,
+    appointments: int = 50_000,
+    days_back: int = 365,
+    days_ahead: int = 90,
+    today: Optional[date] = None,
+    seed: int = 0,
+) -> GeneratedDatabase:
+    """Write a synthetic hospital database to `path`, replacing any file there.
+
+    Args:
+        path: Database file to create.
+        doctors: Number of doctors.
+        patients: Number of patients.
+        appointments: Number of appointments; must fit the doctors' calendars.
+        days_back: Days of past appointments before `today`.
+        days_ahead: Days of upcoming appointments from `today`.
+        today: Day the calendar is centred on (default: the current date).
+        seed: Random seed; the same arguments and seed give the same database.
+
+    Returns:
+        The row counts, date range and timings of the load and index build.
+    """
+    rng = random.Random(seed)
+    first_day = (today or date.today()) - timedelta(days=days_back)
+    days = days_back + days_ahead
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        # nothing to recover if the load fails, so skip the journal
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("BEGIN")
+        _create_schema(conn)
+        _load(conn, INSERT_DOCTOR, _doctors(doctors, rng))
+        _load(conn, INSERT_PATIENT, _patients(patients, rng))
+        _load(conn, INSERT_APPOINTMENT, _appointments(doctors, patients, appointments, first_day, days, rng))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    loaded = time.perf_counter() - start
+
+    # indexes, the doctor search index and the phone column, as the application creates them
+    pool = ConnectionPool(path)
+    try:
+        pool.connection()
+    finally:
+        pool.close_all()
+    return GeneratedDatabase(
+        path=path,
+        doctors=doctors,
+        patients=patients,
+        appointments=appointments,
+        first_date=first_day.isoformat(),
+        last_date=(first_day + timedelta(days=days - 1)).isoformat(),
+        load_seconds=loaded,
+        index_seconds=time.perf_counter() - start - loaded,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command-line entry point: generate a database and print its size."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="database file to create")
+    parser.add_argument("--doctors", type=int, default=10_000)
+    parser.add_argument("--patients", type=int, default=500_000)
+    parser.add_argument("--appointments", type=int, default=5_000_000)
+    parser.add_argument("--days-back", type=int, default=365)
+    parser.add_argument("--days-ahead", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generated = generate_database(
+        args.path, args.doctors, args.patients, args.appointments, args.days_back, args.days_ahead, seed=args.seed
+    )
+    print(  # noqa: T201
+        f"{generated.path}: {generated.doctors} doctors, {generated.patients} patients, "
+        f"{generated.appointments} appointments from {generated.first_date} to {generated.last_date} "
+        f"(load {generated.load_seconds:.1f} s, indexes {generated.index_seconds:.1f} s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""Spans and metrics for graph nodes, tools, LLM calls, queries and speech.
+
+Set TELEMETRY to a comma-separated list of sinks (memory, prometheus, jsonlog)
+to enable it. `instrument` then registers a process-wide callback handler,
+which turns every graph node, tool, LLM and retriever run into a span, and
+listeners for repository queries, spoken audio, routing decisions and
+answer and speech cache lookups. Span durations, token usage, retries, query rows and
+audio bytes are aggregated into counters and histograms that the Prometheus
+sink renders in the text exposition format. With TELEMETRY unset nothing is registered,
+so the only remaining cost is an empty-list check per query and reply.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Protocol, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from agent.utils import db, tts
+from agent.utils.answer_cache import answer_cache_metrics
+from agent.utils.audio_cache import audio_cache_listeners
+from agent.utils.intent import router_metrics
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+BYTE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE(?:\s+OR\s+\w+)?)\s+(\w+)", re.IGNORECASE)
+
+
+@dataclass
+class Span:
+    """One timed operation; spans of the same graph invocation share a trace ID."""
+
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    duration: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """Create an empty histogram over the given upper bounds."""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, observations at or below it) pairs, ending with +Inf."""
+        pairs, running = [], 0
+        for bound, count in zip((*[_format_number(b) for b in self.buckets], "+Inf"), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self) -> None:
+        """Start with no metrics."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def inc(self, metric: str, value: float = 1.0, /, **labels: str) -> None:
+        """Add `value` to a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(metric, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, metric: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, /, **labels: str) -> None:
+        """Record one observation in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(metric, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter(self, metric: str, /, **labels: str) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self.counters.get(metric, {}).get(tuple(sorted(labels.items())), 0.0)
+
+    def histogram(self, metric: str, /, **labels: str) -> Optional[Histogram]:
+        """Return a histogram, or None if it has no observations."""
+        with self._lock:
+            return self.histograms.get(metric, {}).get(tuple(sorted(labels.items())))
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    items = (*labels, *extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in items) + "}"
+
+
+def render_prometheus(registry: MetricsRegistry, prefix: str = "agent_") -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    with registry._lock:
+        for name, series in sorted(registry.counters.items()):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{prefix}{name}{_format_labels(labels)} {_format_number(value)}")
+        for name, histograms in sorted(registry.histograms.items()):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for labels, histogram in sorted(histograms.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{prefix}{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                lines.append(f"{prefix}{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+class TelemetrySink(Protocol):
+    """Receives every finished span."""
+
+    def export(self, span: Span) -> None:
+        """Handle one finished span."""
+        ...
+
+
+class InMemorySink:
+    """Keeps the most recent spans in process, for tests and debugging endpoints."""
+
+    def __init__(self, max_spans: int = 10000) -> None:
+        """Keep at most `max_spans` spans."""
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        """Store the span."""
+        self.spans.append(span)
+
+    def find(self, kind: Optional[str] = None, name: Optional[str] = None) -> List[Span]:
+        """Return stored spans matching `kind` and `name`."""
+        return [span for span in self.spans if (kind is None or span.kind == kind) and (name is None or span.name == name)]
+
+
+class JsonLogSink:
+    """Logs every span as one JSON object per line."""
+
+    def __init__(self, logger_name: str = "agent.telemetry.spans") -> None:
+        """Log through the named logger at INFO level."""
+        self.logger = logging.getLogger(logger_name)
+
+    def export(self, span: Span) -> None:
+        """Log the span."""
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps(asdict(span), default=str))
+
+
+class PrometheusSink:
+    """Periodically writes the registry to a file for the node_exporter textfile collector."""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 10.0) -> None:
+        """Rewrite `path` at most once every `interval` seconds."""
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._written_at = 0.0
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Flush the registry if the interval has elapsed."""
+        if time.monotonic() - self._written_at >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Atomically replace the metrics file with the current registry."""
+        with self._lock:
+            self._written_at = time.monotonic()
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as f:
+                f.write(render_prometheus(self.registry))
+            os.replace(temporary, self.path)
+
+
+def query_label(sql: str) -> str:
+    """Short label for a SQL statement, e.g. 'select Doctor'."""
+    verb = sql.split(None, 1)[0].lower() if sql.strip() else "?"
+    table = _TABLE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class Telemetry:
+    """Aggregates spans into metrics and forwards them to the sinks."""
+
+    def __init__(self, sinks: Sequence[TelemetrySink] = (), registry: Optional[MetricsRegistry] = None) -> None:
+        """Create a telemetry pipeline over `sinks`."""
+        self.registry = registry or MetricsRegistry()
+        self.sinks = list(sinks)
+
+    def record(self, span: Span) -> None:
+        """Aggregate a finished span and export it."""
+        self.registry.observe("span_duration_seconds", span.duration, kind=span.kind, name=span.name)
+        if span.status != "ok":
+            self.registry.inc("span_errors_total", kind=span.kind, name=span.name)
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception:
+                logger.exception("telemetry sink %r failed", sink)
+
+    def on_query(self, sql: str, rows: int, seconds: float) -> None:
+        """Record one repository query."""
+        label = query_label(sql)
+        self.registry.observe("db_query_seconds", seconds, query=label)
+        self.registry.observe("db_rows", rows, ROW_BUCKETS, query=label)
+
+    def on_speech(self, characters: int, audio_bytes: int, seconds: float) -> None:
+        """Record one spoken reply."""
+        self.registry.inc("audio_bytes_total", audio_bytes)
+        self.registry.observe("audio_bytes", audio_bytes, BYTE_BUCKETS)
+        self.record(Span(
+            name="speech", kind="tts", trace_id=uuid.uuid4().hex, span_id=uuid.uuid4().hex, parent_id=None,
+            start=time.time() - seconds, duration=seconds,
+            attributes={"characters": characters, "audio_bytes": audio_bytes},
+        ))
+
+    def on_route(self, tier: str, seconds: float) -> None:
+        """Record one routing decision."""
+        self.registry.inc("router_decisions_total", tier=tier)
+
+    def on_answer_cache(self, hit: bool, saved_seconds: float) -> None:
+        """Record one answer cache lookup."""
+        self.registry.inc("answer_cache_lookups_total", result="hit" if hit else "miss")
+        if hit:
+            self.registry.inc("answer_cache_saved_seconds_total", saved_seconds)
+
+    def on_audio_cache(self, hit: bool, characters: int) -> None:
+        """Record one speech cache lookup; hits save synthesizing `characters`."""
+        self.registry.inc("tts_cache_lookups_total", result="hit" if hit else "miss")
+        if hit:
+            self.registry.inc("tts_cache_saved_characters_total", characters)
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Turns graph node, tool, LLM and retriever runs into spans."""
+
+    # span bookkeeping is cheap and locked, so it runs inline even for async graphs
+    run_inline = True
+
+    def __init__(self, telemetry: Optional[Telemetry] = None) -> None:
+        """Report spans to `telemetry`; without one, events are ignored."""
+        self.telemetry = telemetry
+        self._lock = threading.Lock()
+        # run ID -> (trace ID, ID of the nearest enclosing span)
+        self._context: Dict[UUID, Tuple[str, Optional[str]]] = {}
+        self._spans: Dict[UUID, Tuple[Span, float]] = {}
+
+    def _enter(self, run_id: UUID, parent_run_id: Optional[UUID], name: Optional[str] = None, kind: Optional[str] = None, **attributes: Any) -> None:
+        if self.telemetry is None:
+            return
+        with self._lock:
+            if parent_run_id is not None and parent_run_id in self._context:
+                trace_id, parent_span = self._context[parent_run_id]
+            else:
+                trace_id, parent_span = str(parent_run_id or run_id), None
+            if kind is None:
+                self._context[run_id] = (trace_id, parent_span)
+                return
+            span = Span(name=name or kind, kind=kind, trace_id=trace_id, span_id=str(run_id), parent_id=parent_span, start=time.time(), attributes=attributes)
+            self._context[run_id] = (trace_id, span.span_id)
+            self._spans[run_id] = (span, time.perf_counter())
+
+    def _exit(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> Optional[Span]:
+        with self._lock:
+            self._context.pop(run_id, None)
+            entry = self._spans.pop(run_id, None)
+        telemetry = self.telemetry
+        if entry is None or telemetry is None:
+            return None
+        span, started = entry
+        span.duration = time.perf_counter() - started
+        span.attributes.update(attributes)
+        if error is not None:
+            span.status = "error"
+            span.attributes["error"] = type(error).__name__
+        telemetry.record(span)
+        return span
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        """Open a node span for graph nodes; only track context for other chains."""
+        node = (metadata or {}).get("langgraph_node")
+        is_node = node is not None and kwargs.get("name") == node
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        # a node's inner runnable may share its name; only the outer run is a span
+        if is_node and not (parent and parent[0].kind == "node" and parent[0].name == node):
+            self._enter(run_id, parent_run_id, node, "node", step=(metadata or {}).get("langgraph_step"))
+        else:
+            self._enter(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the run."""
+        self._exit(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the run as failed."""
+        self._exit(run_id, error)
+
+    def on_tool_start(self, serialized: Any, input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        """Open a tool span."""
+        self._enter(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name"), "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the tool span."""
+        self._exit(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the tool span as failed."""
+        self._exit(run_id, error)
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        """Open an LLM span named after the node that made the call."""
+        node = (metadata or {}).get("langgraph_node")
+        self._enter(run_id, parent_run_id, node or kwargs.get("name"), "llm", model=(metadata or {}).get("ls_model_name"))
+
+    def on_llm_start(self, serialized: Any, prompts: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        """Open an LLM span for completion-style models."""
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, metadata=metadata, **kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the LLM span and count its token usage."""
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        span = self._exit(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+        if span is not None and self.telemetry is not None:
+            registry = self.telemetry.registry
+            registry.inc("llm_tokens_total", input_tokens, name=span.name, direction="input")
+            registry.inc("llm_tokens_total", output_tokens, name=span.name, direction="output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the LLM span as failed."""
+        self._exit(run_id, error)
+
+    def on_retriever_start(self, serialized: Any, query: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        """Open a retrieval span."""
+        self._enter(run_id, parent_run_id, kwargs.get("name") or "retriever", "retriever")
+
+    def on_retriever_end(self, documents: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the retrieval span with the number of documents returned."""
+        self._exit(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        """Close the retrieval span as failed."""
+        self._exit(run_id, error)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Count a retry of the run's span (or of an untracked run)."""
+        telemetry = self.telemetry
+        if telemetry is None:
+            return
+        with self._lock:
+            entry = self._spans.get(run_id)
+        telemetry.registry.inc("retries_total", name=entry[0].name if entry else "unknown")
+
+
+def telemetry_from_env() -> Optional[Telemetry]:
+    """Build the pipeline described by TELEMETRY, or None when it is unset."""
+    names = [name.strip().lower() for name in os.getenv("TELEMETRY", "").split(",") if name.strip()]
+    if not names:
+        return None
+    telemetry = Telemetry()
+    for name in names:
+        if name == "memory":
+            telemetry.sinks.append(InMemorySink(int(os.getenv("TELEMETRY_MAX_SPANS", "10000"))))
+        elif name == "jsonlog":
+            telemetry.sinks.append(JsonLogSink())
+        elif name == "prometheus":
+            path = os.getenv("TELEMETRY_PROMETHEUS_FILE", "agent_metrics.prom")
+            telemetry.sinks.append(PrometheusSink(telemetry.registry, path, float(os.getenv("TELEMETRY_PROMETHEUS_INTERVAL", "10"))))
+        else:
+            raise ValueError(f"Unknown telemetry sink {name!r}; use memory, prometheus or jsonlog")
+    return telemetry
+
+
+@lru_cache(maxsize=1)
+def get_telemetry() -> Optional[Telemetry]:
+    """Return the process-wide telemetry pipeline, or None if it is disabled."""
+    return telemetry_from_env()
+
+
+# Graph-level callbacks are replaced wholesale when a caller passes its own, so
+# the handler joins every callback manager through a configure hook instead.
+# The hook is only registered the first time telemetry is enabled.
+_handler = TelemetryCallbackHandler()
+_hook_lock = threading.Lock()
+_hook_registered = False
+
+
+def _listeners(telemetry: Telemetry) -> List[Tuple[List[Any], Any]]:
+    return [
+        (db.query_listeners, telemetry.on_query),
+        (tts.speech_listeners, telemetry.on_speech),
+        (router_metrics.listeners, telemetry.on_route),
+        (answer_cache_metrics.listeners, telemetry.on_answer_cache),
+        (audio_cache_listeners, telemetry.on_audio_cache),
+    ]
+
+
+def enable(telemetry: Telemetry) -> None:
+    """Send every run, query, reply and routing decision in the process to `telemetry`."""
+    global _hook_registered
+    with _hook_lock:
+        if _handler.telemetry is not None:
+            _disable_locked()
+        for listeners, listener in _listeners(telemetry):
+            listeners.append(listener)
+        _handler.telemetry = telemetry
+        if not _hook_registered:
+            register_configure_hook(ContextVar("agent_telemetry_handler", default=_handler), inheritable=True)
+            _hook_registered = True
+
+
+def _disable_locked() -> None:
+    telemetry, _handler.telemetry = _handler.telemetry, None
+    if telemetry is not None:
+        for listeners, listener in _listeners(telemetry):
+            if listener in listeners:
+                listeners.remove(listener)
+
+
+def disable() -> None:
+    """Stop reporting; a registered handler stays attached but ignores events."""
+    with _hook_lock:
+        _disable_locked()
+
+
+G = TypeVar("G")
+
+
+def instrument(graph: G, telemetry: Optional[Telemetry] = None) -> G:
+    """Enable `telemetry` (by default the one configured by TELEMETRY) and return the graph.
+
+    Nothing is registered when telemetry is disabled.
+    """
+    telemetry = telemetry or get_telemetry()
+    if telemetry is not None:
+        enable(telemetry)
+    return graph
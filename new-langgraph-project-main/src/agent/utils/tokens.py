@@ -0,0 +1,190 @@
+"""Token accounting for prompts, calibrated against the model's reported usage.
+
+`TokenCounter` estimates tokens locally from word, digit and punctuation
+pieces, the way SentencePiece tokenizers such as Gemini's split text, so it
+needs no tokenizer download or network call. Raw estimates are memoized per
+message ID, so counting a growing conversation costs only its new messages.
+
+Each LLM call reports its real `input_tokens`. The counter fits those against
+its own estimates, as `actual = overhead[role] + scale * estimate`. The scale
+is shared by all agents. Each agent role gets its own fixed overhead, which
+covers the system instruction and the bound tool schemas that are not part of
+the messages. Counts are returned with the scale applied, so budgets such as
+the router's trim limit and the history compaction threshold are in real
+tokens.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    MessageLikeRepresentation,
+    convert_to_messages,
+)
+
+# Word pieces, single digits and single punctuation marks
+TOKEN_PIECES = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_")
+# Letters per token for long words; shorter words are a single token
+CHARS_PER_WORD_TOKEN = 6
+# Role and separator tokens around every message
+MESSAGE_OVERHEAD = 3
+# Scale bounds, so one odd usage report cannot derail every budget
+MIN_SCALE, MAX_SCALE = 0.25, 4.0
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Return the uncalibrated token estimate of a string."""
+    count = 0
+    for piece in TOKEN_PIECES.findall(text):
+        count += 1 + len(piece) // CHARS_PER_WORD_TOKEN if piece.isalpha() else 1
+    return count
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        text = content
+    else:
+        # multimodal content: count the text parts only
+        text = " ".join(
+            part if isinstance(part, str) else str(part.get("text", ""))
+            for part in content
+        )
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += " " + json.dumps([[call["name"], call["args"]] for call in message.tool_calls])
+    return text
+
+
+@dataclass
+class _RoleFit:
+    """Running sums for one role's least-squares fit of actual against estimated tokens."""
+
+    n: int = 0
+    sum_x: float = 0.0
+    sum_y: float = 0.0
+    sum_xx: float = 0.0
+    sum_xy: float = 0.0
+
+    def add(self, x: float, y: float) -> None:
+        self.n += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xx += x * x
+        self.sum_xy += x * y
+
+    def centered(self) -> Tuple[float, float]:
+        # (Sxx, Sxy) around this role's means; its overhead drops out of the slope
+        if not self.n:
+            return 0.0, 0.0
+        return (
+            self.sum_xx - self.sum_x * self.sum_x / self.n,
+            self.sum_xy - self.sum_x * self.sum_y / self.n,
+        )
+
+
+class TokenCounter:
+    """Fast, memoized and self-calibrating message token counter.
+
+    Instances are callable on a list of messages, so one can be passed as the
+    `token_counter` of `trim_messages`.
+    """
+
+    def __init__(self, cache_size: int = 8192, prior_weight: float = 10_000.0) -> None:
+        """Create a counter with an uncalibrated scale of 1.
+
+        Args:
+            cache_size: Message estimates remembered, least recently used first out.
+            prior_weight: Weight of the initial scale of 1 in the fit, in squared
+                tokens; larger values need more usage reports to move the scale.
+        """
+        self.cache_size = cache_size
+        self.prior_weight = prior_weight
+        self._cache: OrderedDict[Hashable, int] = OrderedDict()
+        self._fits: Dict[str, _RoleFit] = {}
+        self._scale = 1.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def scale(self) -> float:
+        """Real tokens per estimated token."""
+        return self._scale
+
+    def raw_message_tokens(self, message: BaseMessage) -> int:
+        """Return the uncalibrated estimate of one message, memoized on its ID."""
+        # the content length guards against a message replaced under the same ID
+        content = message.content
+        key = (message.id, message.type, len(content)) if message.id else None
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached
+        count = MESSAGE_OVERHEAD + estimate_text_tokens(_message_text(message))
+        if key is not None:
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = count
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return count
+
+    def raw_count(self, messages: Sequence[BaseMessage]) -> int:
+        """Return the uncalibrated estimate of `messages`."""
+        return sum(self.raw_message_tokens(message) for message in messages)
+
+    def count(self, messages: Sequence[BaseMessage]) -> int:
+        """Return the calibrated token count of `messages`."""
+        return round(self._scale * self.raw_count(messages))
+
+    def __call__(self, messages: Sequence[BaseMessage]) -> int:
+        """Count `messages`; see `count`."""
+        return self.count(messages)
+
+    def prompt_overhead(self, role: str) -> int:
+        """Return the fitted tokens `role` adds on top of its messages (tools, system instruction)."""
+        with self._lock:
+            fit = self._fits.get(role)
+            if fit is None or not fit.n:
+                return 0
+            return max(0, round((fit.sum_y - self._scale * fit.sum_x) / fit.n))
+
+    def observe(self, role: str, messages: Sequence[MessageLikeRepresentation], response: Any) -> None:
+        """Fit the estimate of a prompt sent by `role` against the input tokens the model reported."""
+        usage: Optional[dict] = getattr(response, "usage_metadata", None)
+        if not usage or not usage.get("input_tokens"):
+            return
+        estimate = float(self.raw_count(convert_to_messages(messages)))
+        with self._lock:
+            self._fits.setdefault(role, _RoleFit()).add(estimate, float(usage["input_tokens"]))
+            sxx = sxy = 0.0
+            for fit in self._fits.values():
+                role_sxx, role_sxy = fit.centered()
+                sxx += role_sxx
+                sxy += role_sxy
+            scale = (sxy + self.prior_weight) / (sxx + self.prior_weight)
+            self._scale = min(MAX_SCALE, max(MIN_SCALE, scale))
+
+    def reset(self) -> None:
+        """Forget memoized estimates and calibration."""
+        with self._lock:
+            self._cache.clear()
+            self._fits.clear()
+            self._scale = 1.0
+            self.hits = self.misses = 0
+
+
+@lru_cache(maxsize=1)
+def get_token_counter() -> TokenCounter:
+    """Return the process-wide token counter."""
+    return TokenCounter()
@@ -0,0 +1,235 @@
+"""Concurrent, batching executor for the tool calls of one LLM turn.
+
+A drop-in replacement for LangGraph's `ToolNode` on the booking agents. When
+the model fans out (a doctor search plus several availability probes, say),
+the calls of one turn are independent, so:
+
+- read-only calls run concurrently on the database thread pool;
+- several calls of a tool with a batch handler (see `tools.batch_handlers`)
+  are answered together, e.g. many availability probes become one query;
+- writes (`tools.WRITE_TOOLS`) run one at a time, in the order the model
+  emitted them, after the reads, so results never depend on thread timing.
+
+Tool messages come back in the order of the calls, with the same error
+messages `ToolNode` produces. With an encoder, the graph node hands the agent
+each result in its compact, token-budgeted form (see `encoding`).
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import (
+    get_async_callback_manager_for_config,
+    get_callback_manager_for_config,
+)
+from langchain_core.tools import BaseTool
+from langgraph.errors import GraphBubbleUp
+from langgraph.prebuilt.tool_node import (
+    INVALID_TOOL_NAME_ERROR_TEMPLATE,
+    TOOL_CALL_ERROR_TEMPLATE,
+)
+
+from agent.utils.db import run_in_db_executor, submit_to_db_executor
+from agent.utils.encoding import ToolResultEncoder
+from agent.utils.tools import WRITE_TOOLS, batch_handlers
+
+BatchHandler = Callable[[List[Dict[str, Any]]], List[str]]
+
+# One unit of work: either a single call or a batch of same-tool calls
+_Job = Tuple[str, List[ToolCall]]
+
+
+def _error_message(call: ToolCall, error: Exception) -> ToolMessage:
+    return ToolMessage(
+        content=TOOL_CALL_ERROR_TEMPLATE.format(error=repr(error)),
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+class ToolExecutor:
+    """Runs the tool calls of the latest AI message, concurrently where it is safe."""
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        write_tools: Iterable[str] = WRITE_TOOLS,
+        handlers: Optional[Dict[str, BatchHandler]] = None,
+        encoder: Optional[ToolResultEncoder] = None,
+    ) -> None:
+        """Create an executor.
+
+        Args:
+            tools: The tools the agent may call.
+            write_tools: Names of tools that must never run concurrently.
+            handlers: Batch handlers by tool name (default: `tools.batch_handlers`).
+            encoder: Re-encodes results for the model in the graph node (default: results as returned).
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.write_tools = frozenset(write_tools)
+        handlers = batch_handlers if handlers is None else handlers
+        self.handlers = {name: handler for name, handler in handlers.items() if name in self.tools}
+        self.encoder = encoder
+
+    def _plan(self, calls: Sequence[ToolCall]) -> Tuple[List[_Job], List[ToolCall]]:
+        # (read jobs, writes in emitted order); same-tool reads with a handler form one job
+        reads: Dict[str, List[ToolCall]] = {}
+        jobs: List[_Job] = []
+        writes: List[ToolCall] = []
+        for call in calls:
+            name = call["name"]
+            if name in self.write_tools or name not in self.tools:
+                writes.append(call)
+            elif name in self.handlers:
+                if name not in reads:
+                    reads[name] = []
+                    jobs.append((name, reads[name]))
+                reads[name].append(call)
+            else:
+                jobs.append((name, [call]))
+        return jobs, writes
+
+    def _run_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            return ToolMessage(
+                content=INVALID_TOOL_NAME_ERROR_TEMPLATE.format(
+                    requested_tool=call["name"], available_tools=", ".join(self.tools)
+                ),
+                name=call["name"],
+                tool_call_id=call["id"],
+                status="error",
+            )
+        try:
+            return tool.invoke({**call, "type": "tool_call"}, config)
+        except GraphBubbleUp:
+            raise
+        except Exception as error:
+            return _error_message(call, error)
+
+    async def _arun_call(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            # same message as the sync path; no I/O involved
+            return self._run_call(call, config)
+        try:
+            return await tool.ainvoke({**call, "type": "tool_call"}, config)
+        except GraphBubbleUp:
+            raise
+        except Exception as error:
+            return _error_message(call, error)
+
+    def _validated(self, calls: List[ToolCall]) -> Tuple[List[ToolCall], List[Dict[str, Any]], List[ToolCall]]:
+        # (calls with valid arguments, their parsed arguments, calls left to run one by one)
+        schema = self.tools[calls[0]["name"]].args_schema
+        valid, arguments, invalid = [], [], []
+        for call in calls:
+            try:
+                arguments.append(schema.model_validate(call["args"]).model_dump())
+            except Exception:
+                invalid.append(call)
+                continue
+            valid.append(call)
+        return valid, arguments, invalid
+
+    def _run_batch(self, name: str, calls: List[ToolCall], config: RunnableConfig) -> List[ToolMessage]:
+        valid, arguments, invalid = self._validated(calls)
+        messages = [self._run_call(call, config) for call in invalid]
+        if valid:
+            # one tool span for the whole batch
+            run = get_callback_manager_for_config(config).on_tool_start(
+                {"name": name}, str(arguments), name=name, inputs={"calls": arguments}
+            )
+            try:
+                results = self.handlers[name](arguments)
+            except Exception as error:
+                run.on_tool_error(error)
+                return messages + [_error_message(call, error) for call in valid]
+            run.on_tool_end(results)
+            messages += [
+                ToolMessage(content=result, name=name, tool_call_id=call["id"]) for call, result in zip(valid, results)
+            ]
+        return messages
+
+    async def _arun_batch(self, name: str, calls: List[ToolCall], config: RunnableConfig) -> List[ToolMessage]:
+        valid, arguments, invalid = self._validated(calls)
+        messages = list(await asyncio.gather(*(self._arun_call(call, config) for call in invalid)))
+        if valid:
+            run = await get_async_callback_manager_for_config(config).on_tool_start(
+                {"name": name}, str(arguments), name=name, inputs={"calls": arguments}
+            )
+            try:
+                results = await run_in_db_executor(self.handlers[name], arguments)
+            except Exception as error:
+                await run.on_tool_error(error)
+                return messages + [_error_message(call, error) for call in valid]
+            await run.on_tool_end(results)
+            messages += [
+                ToolMessage(content=result, name=name, tool_call_id=call["id"]) for call, result in zip(valid, results)
+            ]
+        return messages
+
+    def _run_job(self, job: _Job, config: RunnableConfig) -> List[ToolMessage]:
+        name, calls = job
+        if len(calls) > 1:
+            return self._run_batch(name, calls, config)
+        return [self._run_call(calls[0], config)]
+
+    async def _arun_job(self, job: _Job, config: RunnableConfig) -> List[ToolMessage]:
+        name, calls = job
+        if len(calls) > 1:
+            return await self._arun_batch(name, calls, config)
+        return [await self._arun_call(calls[0], config)]
+
+    def run(self, calls: Sequence[ToolCall], config: Optional[RunnableConfig] = None) -> List[ToolMessage]:
+        """Execute tool calls and return their messages in call order."""
+        config = config or {}
+        jobs, writes = self._plan(calls)
+        if len(jobs) == 1:
+            # nothing to overlap; skip the thread hop
+            messages = self._run_job(jobs[0], config)
+        else:
+            futures = [submit_to_db_executor(self._run_job, job, config) for job in jobs]
+            messages = [message for future in futures for message in future.result()]
+        messages += [self._run_call(call, config) for call in writes]
+        return _in_call_order(calls, messages)
+
+    async def arun(self, calls: Sequence[ToolCall], config: Optional[RunnableConfig] = None) -> List[ToolMessage]:
+        """Execute tool calls on the event loop and return their messages in call order."""
+        config = config or {}
+        jobs, writes = self._plan(calls)
+        messages = [message for job in await asyncio.gather(*(self._arun_job(job, config) for job in jobs)) for message in job]
+        for call in writes:
+            messages.append(await self._arun_call(call, config))
+        return _in_call_order(calls, messages)
+
+    def invoke(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        """Graph node: run the tool calls of the last message in `state`."""
+        return {"messages": self._encoded(self.run(_tool_calls(state), config))}
+
+    async def ainvoke(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        """Async graph node: run the tool calls of the last message in `state`."""
+        return {"messages": self._encoded(await self.arun(_tool_calls(state), config))}
+
+    def _encoded(self, messages: List[ToolMessage]) -> List[ToolMessage]:
+        if self.encoder is None:
+            return messages
+        for message in messages:
+            if isinstance(message.content, str):
+                message.content = self.encoder.encode(message.content)
+        return messages
+
+
+def _tool_calls(state: Dict[str, Any]) -> List[ToolCall]:
+    message = state["messages"][-1]
+    if not isinstance(message, AIMessage):
+        raise ValueError("The last message has no tool calls to execute")
+    return message.tool_calls
+
+
+def _in_call_order(calls: Sequence[ToolCall], messages: List[ToolMessage]) -> List[ToolMessage]:
+    position = {call["id"]: i for i, call in enumerate(calls)}
+    return sorted(messages, key=lambda message: position.get(message.tool_call_id, len(position)))
@@ -1,50 +1,74 @@
-from langgraph.types import Command
-from langgraph.prebuilt.chat_agent_executor import AgentState
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage,ToolMessage
-from langchain_core.messages import ToolMessage 
-from typing_extensions import Annotated
-from langgraph.prebuilt import InjectedState
-from langgraph.graph import StateGraph, MessagesState, START, END
-from pydantic import BaseModel
-from langchain_core.tools import tool
-from typing import Optional, Dict, List
-import sqlite3
 import json
-import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel
+
+from agent.utils.availability import get_availability_index
+from agent.utils.booking import get_booking_engine, validate_slot
+from agent.utils.db import (
+    MAX_PAGE_SIZE,
+    get_repository,
+    normalize_slot,
+    run_in_db_executor,
+)
+from agent.utils.prefetch import current_conversation_id, get_prefetch_cache
 
-# Define your database path
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'appointments.db')
+
+def db_tool(func: Callable[..., str]) -> StructuredTool:
+    """Make a tool like @tool, with an async variant that runs on the database thread pool."""
+    async def coroutine(**kwargs: Any) -> str:
+        return await run_in_db_executor(func, **kwargs)
+
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
 
 
 # Tool 1: Search for doctor
-@tool
-def search_for_doctor(name: Optional[str] = None) -> str:
+@db_tool
+def search_for_doctor(
+    name: Optional[str] = None,
+    specialization: Optional[str] = None,
+    location: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    limit: int = 5,
+    offset: int = 0,
+) -> str:
     """
-    Search for doctors by name (or return all if name is None).
+    Search the doctor directory, best matches first. Names are matched fuzzily,
+    so partial or misspelt names work. Without a name, doctors are listed best rated first.
 
     Args:
         name (Optional[str]): The partial or full name of the doctor.
+        specialization (Optional[str]): Only doctors with this specialization, e.g. 'Cardiology'.
+        location (Optional[str]): Only doctors at this location, e.g. 'Chicago'.
+        min_rating (Optional[float]): Only doctors rated at least this (0-5).
+        limit (int): Maximum number of doctors to return (at most 20).
+        offset (int): Number of results to skip; pass the previous next_offset to get the next page.
 
     Returns:
-        str: JSON-encoded list of matching doctors.
+        str: JSON with the matching doctors and next_offset (null on the last page).
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    if name:
-        cursor.execute("SELECT * FROM Doctor WHERE Doctor_Name LIKE ?", (f"%{name}%",))
-    else:
-        cursor.execute("SELECT * FROM Doctor")
-
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return json.dumps(results)
+    page = None
+    if location is None and min_rating is None and offset == 0:
+        # searches hinted at by the user's message were run while the router decided
+        page = get_prefetch_cache().search(current_conversation_id(), name, specialization, limit)
+    if page is None:
+        page = get_repository().search_doctors(
+            name,
+            specialization=specialization,
+            location=location,
+            min_rating=min_rating,
+            limit=limit,
+            offset=offset,
+        )
+    if not page["doctors"]:
+        return json.dumps({"success": False, "message": "No matching doctor found.", "doctors": [], "next_offset": None})
+    return json.dumps({"success": True, **page})
 
 
 # Tool 2: Check doctor's availability
-@tool
+@db_tool
 def check_doctor_availability(doctor_id: int, date: str, time: str) -> str:
     """
     Check if a doctor is available at a given date and time.
@@ -57,23 +81,99 @@ def check_doctor_availability(doctor_id: int, date: str, time: str) -> str:
     Returns:
         str: JSON with availability message.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    slot = _slot(doctor_id, date, time)
+    if slot is None:
+        return INVALID_SLOT_JSON
+    doctor_id, date, time = slot
+    # a calendar loaded by prefetch or an earlier lookup answers "booked" without a query;
+    # it may miss other workers' bookings, so "available" is confirmed against the database
+    if get_availability_index().cached_is_free(doctor_id, date, time) is False:
+        return _availability_json(False)
+    return _availability_json(not get_repository().is_slot_booked(doctor_id, date, time))
+
+
+INVALID_SLOT_JSON = json.dumps({"available": False, "message": "Invalid date or time format. Use YYYY-MM-DD and HH:MM."})
 
-    cursor.execute("""
-        SELECT 1 FROM Appointment
-        WHERE Doctor_ID = ? AND Appointment_Date = ? AND Appointment_Time = ?
-    """, (doctor_id, date, time))
 
-    result = cursor.fetchone()
-    conn.close()
+def _slot(doctor_id: int, date: str, time: str) -> Optional[Tuple[int, str, str]]:
+    # the slot as stored, or None if the date or time does not parse
+    try:
+        return (doctor_id, *normalize_slot(date, time))
+    except ValueError:
+        return None
+
 
-    available = result is None
+def _availability_json(available: bool) -> str:
     return json.dumps({"available": available, "message": "Doctor is available" if available else "Doctor is not available"})
 
 
-# Tool 3: Book appointment
-@tool
+def check_doctor_availability_batch(calls: List[Dict[str, Any]]) -> List[str]:
+    """Answer several check_doctor_availability calls with at most one query."""
+    index = get_availability_index()
+    slots = [_slot(call["doctor_id"], call["date"], call["time"]) for call in calls]
+    # only "booked" is taken from the calendar; free slots are confirmed in one query
+    known_booked = [slot is not None and index.cached_is_free(*slot) is False for slot in slots]
+    booked = get_repository().booked_slots_among([slot for slot, known in zip(slots, known_booked) if slot and not known])
+    return [
+        INVALID_SLOT_JSON if slot is None else _availability_json(not known and slot not in booked)
+        for slot, known in zip(slots, known_booked)
+    ]
+
+
+# Tool 3: Find the next free slots
+@db_tool
+def find_available_slots(
+    doctor_id: Optional[int] = None,
+    specialization: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 5,
+) -> str:
+    """
+    Find the next free appointment slots for a doctor or a specialization in one call.
+    Prefer this over probing times one by one with check_doctor_availability.
+
+    Args:
+        doctor_id (Optional[int]): The ID of the doctor.
+        specialization (Optional[str]): A specialization, e.g. 'Cardiology', used when no doctor is given.
+        start_date (Optional[str]): First date to search in 'YYYY-MM-DD' (default today).
+        end_date (Optional[str]): Last date to search in 'YYYY-MM-DD' (default 14 days after start).
+        limit (int): Maximum number of slots to return (at most 20).
+
+    Returns:
+        str: JSON with the free slots, earliest first.
+    """
+    try:
+        start = date.fromisoformat(start_date) if start_date else date.today()
+        end = date.fromisoformat(end_date) if end_date else start + timedelta(days=14)
+    except ValueError:
+        return json.dumps({"success": False, "message": "Invalid date format. Use YYYY-MM-DD."})
+
+    repository = get_repository()
+    if doctor_id is not None:
+        doctor = get_prefetch_cache().doctor(current_conversation_id(), doctor_id) or repository.get_doctor(doctor_id)
+        doctors = [doctor] if doctor else []
+    elif specialization:
+        doctors = repository.search_doctors(specialization=specialization, limit=MAX_PAGE_SIZE)["doctors"]
+    else:
+        return json.dumps({"success": False, "message": "Provide a doctor_id or a specialization."})
+
+    if not doctors:
+        return json.dumps({"success": False, "message": "No matching doctor found."})
+
+    names = {doctor["Doctor_ID"]: doctor["Doctor_Name"] for doctor in doctors}
+    slots = get_availability_index().next_free_slots(list(names), start, end, max(1, min(limit, 20)))
+    if not slots:
+        return json.dumps({"success": False, "message": "No free slots in this date range."})
+
+    return json.dumps({"success": True, "slots": [
+        {"doctor_id": slot_doctor, "doctor_name": names[slot_doctor], "date": slot_date, "time": slot_time}
+        for slot_doctor, slot_date, slot_time in slots
+    ]})
+
+
+# Tool 4: Book appointment
+@db_tool
 def book_appointment(user_id: int, doctor_id: int, date: str, time: str) -> str:
     """
     Book an appointment with a doctor if available.
@@ -88,47 +188,19 @@ def book_appointment(user_id: int, doctor_id: int, date: str, time: str) -> str:
         str: JSON with booking status.
     """
     try:
-        # Parse and validate appointment datetime
-        appointment_datetime = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-        now = datetime.now()
+        # Validate the requested slot before touching the database
+        invalid = validate_slot(date, time)
+        if invalid:
+            return invalid.to_json()
 
-        if appointment_datetime <= now:
-            return json.dumps({"success": False, "message": "Appointment must be booked for a future time."})
+        # Reserve in a single statement; the unique slot index rejects double bookings
+        return get_booking_engine().reserve(user_id, doctor_id, date, time).to_json()
 
-        if not (8 <= appointment_datetime.hour < 22):
-            return json.dumps({"success": False, "message": "Appointment time must be between 08:00 and 22:00."})
-
-        # Connect to DB and check availability
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT 1 FROM Appointment
-            WHERE Doctor_ID = ? AND Appointment_Date = ? AND Appointment_Time = ?
-        """, (doctor_id, date, time))
-        
-        if cursor.fetchone():
-            conn.close()
-            return json.dumps({"success": False, "message": "Doctor is not available at this date and time."})
-
-        # Insert the new appointment
-        cursor.execute("""
-            INSERT INTO Appointment (Appointment_Time, Appointment_Date, Doctor_ID, Patient_ID)
-            VALUES (?, ?, ?, ?)
-        """, (time, date, doctor_id, user_id))
-
-        conn.commit()
-        conn.close()
-
-        return json.dumps({"success": True, "message": "Appointment booked successfully."})
-
-    except ValueError:
-        return json.dumps({"success": False, "message": "Invalid date or time format. Use YYYY-MM-DD and HH:MM."})
     except Exception as e:
         return json.dumps({"success": False, "message": f"An error occurred: {str(e)}"})
 
-# Tool 4: Search for an appointment by ID
-@tool
+# Tool 5: Search for an appointment by ID
+@db_tool
 def search_for_appointment(appointment_id: int) -> str:
     """
     Search for an appointment by its ID.
@@ -139,35 +211,24 @@ def search_for_appointment(appointment_id: int) -> str:
     Returns:
         str: JSON string with appointment details or failure message.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT Appointment_ID, Appointment_Date, Appointment_Time, Doctor_ID, Patient_ID
-        FROM Appointment
-        WHERE Appointment_ID = ?
-    """, (appointment_id,))
-    
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return json.dumps({
-            "success": True,
-            "appointment": {
-                "appointment_id": result[0],
-                "date": result[1],
-                "time": result[2],
-                "doctor_id": result[3],
-                "patient_id": result[4]
-            }
-        })
+    return _appointment_json(get_repository().get_appointment(appointment_id))
+
+
+def _appointment_json(appointment: Optional[Dict[str, Any]]) -> str:
+    if appointment:
+        return json.dumps({"success": True, "appointment": appointment})
     else:
         return json.dumps({"success": False, "message": "Appointment not found."})
 
 
-# Tool 5: Cancel an appointment by ID
-@tool
+def search_for_appointment_batch(calls: List[Dict[str, Any]]) -> List[str]:
+    """Answer several search_for_appointment calls with one query."""
+    appointments = get_repository().get_appointments([call["appointment_id"] for call in calls])
+    return [_appointment_json(appointments.get(call["appointment_id"])) for call in calls]
+
+
+# Tool 6: Cancel an appointment by ID
+@db_tool
 def cancel_appointment(appointment_id: int) -> str:
     """
     Cancel an existing appointment by its ID.
@@ -178,26 +239,10 @@ def cancel_appointment(appointment_id: int) -> str:
     Returns:
         str: JSON string with success/failure status and message.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Check if appointment exists
-    cursor.execute("SELECT 1 FROM Appointment WHERE Appointment_ID = ?", (appointment_id,))
-    result = cursor.fetchone()
-
-    if not result:
-        conn.close()
-        return json.dumps({"success": False, "message": "Appointment not found."})
+    return get_booking_engine().cancel(appointment_id).to_json()
 
-    # Cancel appointment
-    cursor.execute("DELETE FROM Appointment WHERE Appointment_ID = ?", (appointment_id,))
-    conn.commit()
-    conn.close()
-
-    return json.dumps({"success": True, "message": "Appointment cancelled successfully."})
-
-# Tool 5: Cancel an appointment by ID
-@tool
+# Tool 7: Reschedule an appointment by ID
+@db_tool
 def reschedule_appointment(appointment_id: int, date: str, time: str) -> str:
     """
     Reschedule an existing appointment to a new date and time if the doctor is available.
@@ -210,40 +255,65 @@ def reschedule_appointment(appointment_id: int, date: str, time: str) -> str:
     Returns:
         str: JSON string with success/failure status and message.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Get doctor ID for the existing appointment
-    cursor.execute("SELECT Doctor_ID FROM Appointment WHERE Appointment_ID = ?", (appointment_id,))
-    result = cursor.fetchone()
-    if not result:
-        conn.close()
-        return json.dumps({"success": False, "message": "Appointment not found."})
+    # Validate the new slot before touching the database
+    invalid = validate_slot(date, time)
+    if invalid:
+        return invalid.to_json()
+
+    # Move in one transaction; the unique slot index rejects conflicts
+    return get_booking_engine().move(appointment_id, date, time).to_json()
 
-    doctor_id = result[0]
+# Tool 8: Identify a patient
+@db_tool
+def find_patient(name: Optional[str] = None, age: Optional[int] = None, phone: Optional[str] = None) -> str:
+    """
+    Find a patient's ID from their phone number, or from their name (full or leading part) and optionally age.
+    Use this instead of asking the caller for their patient ID. Phone numbers are only on file for patients
+    whose records the hospital has imported; if a phone finds nobody, ask for their name instead.
+
+    Args:
+        name (Optional[str]): The patient's name.
+        age (Optional[int]): The patient's age, to tell apart patients with the same name.
+        phone (Optional[str]): The patient's phone number, in any format.
 
-    # Check if doctor is already booked at the new time (excluding current appointment)
-    cursor.execute("""
-        SELECT 1 FROM Appointment
-        WHERE Doctor_ID = ? AND Appointment_Date = ? AND Appointment_Time = ? AND Appointment_ID != ?
-    """, (doctor_id, date, time, appointment_id))
+    Returns:
+        str: JSON with the matching patients; ask the caller to confirm when there is more than one.
+    """
+    patients = get_repository().find_patients(name, age=age, phone=phone)
+    if not patients:
+        return json.dumps({"success": False, "message": "No matching patient found.", "patients": []})
+    return json.dumps({"success": True, "patients": patients})
+
+# Tool 9: List a patient's upcoming appointments
+@db_tool
+def list_upcoming_appointments(patient_id: int, limit: int = 10) -> str:
+    """
+    List a patient's upcoming appointments with their doctors, earliest first.
+    Use this instead of asking the caller for an appointment ID.
 
-    if cursor.fetchone():
-        conn.close()
-        return json.dumps({"success": False, "message": "Doctor is not available at the requested time."})
+    Args:
+        patient_id (int): The ID of the patient, e.g. from find_patient.
+        limit (int): Maximum number of appointments to return (at most 20).
 
-    # Update appointment
-    cursor.execute("""
-        UPDATE Appointment
-        SET Appointment_Date = ?, Appointment_Time = ?
-        WHERE Appointment_ID = ?
-    """, (date, time, appointment_id))
+    Returns:
+        str: JSON with the upcoming appointments.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    appointments = get_repository().upcoming_appointments(patient_id, now, limit)
+    if not appointments:
+        return json.dumps({"success": False, "message": "No upcoming appointments found.", "appointments": []})
+    return json.dumps({"success": True, "appointments": appointments})
 
-    conn.commit()
-    conn.close()
 
-    return json.dumps({"success": True, "message": "Appointment Rescheduled successfully."})
+# Tools that change appointments; the tool executor never runs two of them at once
+WRITE_TOOLS = frozenset({"book_appointment", "cancel_appointment", "reschedule_appointment"})
 
+# Read-only tools that can answer several calls of one LLM turn together:
+# name -> function from the calls' validated arguments to their results, in order
+batch_handlers: Dict[str, Callable[[List[Dict[str, Any]]], List[str]]] = {
+    "check_doctor_availability": check_doctor_availability_batch,
+    "search_for_appointment": search_for_appointment_batch,
+}
 
 
 class new_booking_assistant(BaseModel):
@@ -252,5 +322,8 @@ class new_booking_assistant(BaseModel):
 class cancel_booking_assistant(BaseModel):
     """based on conversation history,If user needs to cancel an appointment"""
 
+class reschedule_booking_assistant(BaseModel):
+    """based on conversation history,If user needs to move an existing appointment to another date or time"""
+
 class general_hospital_assistant(BaseModel):
     """based on conversation history,If user needs information about hospital"""
\ No newline at end of file
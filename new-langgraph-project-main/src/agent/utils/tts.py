@@ -0,0 +1,380 @@
+"""Streaming text-to-speech output stage.
+
+Text (a full reply or an LLM token stream) is cut into sentence-sized chunks,
+each chunk is synthesized as soon as it is complete, and audio frames are
+yielded in order as an async generator, so the first sentence is audible
+before the rest is synthesized. Synthesis of the next sentences overlaps
+with delivery of the current one. The booking agents stream their replies
+into the player through `SpeechPlayer.open_stream`, so the first sentence is
+heard while the rest is still being generated; other replies are submitted
+once finished.
+
+The synthesis backend is pluggable (`TTS_BACKEND`): ElevenLabs with a pooled
+async client, a deterministic local stub for tests and benchmarks, or none.
+ElevenLabs audio is cached on disk per chunk (`TTS_CACHE`), so repeated
+phrases are not synthesized again.
+Playback runs on a dedicated background event loop, so graph nodes hand a
+reply off and return immediately.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    Union,
+)
+
+from agent.utils.audio_cache import (
+    AudioCache,
+    audio_cache_listeners,
+    cache_key,
+    get_audio_cache,
+    tts_cache_enabled,
+)
+
+logger = logging.getLogger(__name__)
+
+# ElevenLabs voice settings used for every reply
+VOICE_ID = "Xb7hH8MSUJpSbSDYk0k2"
+MODEL_ID = "eleven_multilingual_v2"
+OUTPUT_FORMAT = "mp3_44100_128"
+
+# Titles whose period does not end a sentence, so "Dr. Smith" is spoken as one name
+ABBREVIATIONS = ("Dr", "Mr", "Mrs", "Ms", "St")
+_SENTENCE_END = re.compile(
+    r"(?<=[.!?])" + "".join(rf"(?<!\b{abbreviation}\.)" for abbreviation in ABBREVIATIONS) + r"\s+"
+)
+
+
+class TTSBackend(Protocol):
+    """Synthesizes one chunk of text into a stream of audio frames."""
+
+    def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        """Yield audio frames for `text`."""
+        ...
+
+
+# Consumes the audio frames of one reply and returns the number of bytes played
+AudioSink = Callable[[AsyncIterator[bytes]], Awaitable[int]]
+
+# Called with (characters, audio bytes, seconds) after every reply the player speaks
+SpeechListener = Callable[[int, int, float], None]
+speech_listeners: List[SpeechListener] = []
+
+
+@lru_cache(maxsize=1)
+def _get_elevenlabs_client() -> Any:
+    from elevenlabs.client import AsyncElevenLabs
+
+    return AsyncElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+
+
+class ElevenLabsBackend:
+    """ElevenLabs streaming synthesis over one shared async client."""
+
+    def __init__(self, voice_id: str = VOICE_ID, model_id: str = MODEL_ID, output_format: str = OUTPUT_FORMAT) -> None:
+        """Configure the voice, model and audio format."""
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        """Yield MP3 frames as ElevenLabs produces them."""
+        async for frame in _get_elevenlabs_client().text_to_speech.stream(
+            voice_id=self.voice_id,
+            text=text,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        ):
+            yield frame
+
+
+class StubTTSBackend:
+    """Offline backend that emits deterministic fake frames after a simulated delay."""
+
+    def __init__(self, seconds_per_char: float = 0.0, frame_size: int = 1024) -> None:
+        """Simulate `seconds_per_char` of synthesis time per input character."""
+        self.seconds_per_char = seconds_per_char
+        self.frame_size = frame_size
+        self.requests: List[str] = []
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        """Yield the UTF-8 text padded into fixed-size frames."""
+        self.requests.append(text)
+        if self.seconds_per_char:
+            await asyncio.sleep(self.seconds_per_char * len(text))
+        data = text.encode("utf-8")
+        for start in range(0, len(data), self.frame_size):
+            yield data[start:start + self.frame_size]
+
+
+class NullTTSBackend:
+    """Backend that produces no audio."""
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        """Yield nothing."""
+        return
+        yield b""
+
+
+class CachedTTSBackend:
+    """Serves chunks from an audio cache and stores what the wrapped backend synthesizes."""
+
+    def __init__(
+        self,
+        backend: TTSBackend,
+        cache: AudioCache,
+        voice_id: str = VOICE_ID,
+        model_id: str = MODEL_ID,
+        output_format: str = OUTPUT_FORMAT,
+    ) -> None:
+        """Wrap `backend`, whose audio is cached under its voice, model and output format."""
+        self.backend = backend
+        self.cache = cache
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        """Yield the cached audio of `text`, or synthesize it and cache it once complete."""
+        key = cache_key(text, self.voice_id, self.model_id, self.output_format)
+        # disk reads and writes run off the event loop, which is also streaming other audio
+        cached = await asyncio.to_thread(self._read, key)
+        for listener in audio_cache_listeners:
+            listener(cached is not None, len(text))
+        if cached is not None:
+            for frame in cached:
+                yield frame
+            return
+        frames = []
+        async for frame in self.backend.synthesize(text):
+            frames.append(frame)
+            yield frame
+        # only audio that was synthesized to the end is stored
+        await asyncio.to_thread(self.cache.write, key, b"".join(frames))
+
+    def _read(self, key: str) -> Optional[List[bytes]]:
+        frames = self.cache.read(key)
+        return list(frames) if frames is not None else None
+
+
+def get_tts_backend() -> TTSBackend:
+    """Return the backend selected by TTS_BACKEND (elevenlabs, stub or none)."""
+    name = os.getenv("TTS_BACKEND", "elevenlabs").lower()
+    if name == "stub":
+        return StubTTSBackend()
+    if name == "none":
+        return NullTTSBackend()
+    backend = ElevenLabsBackend()
+    if tts_cache_enabled():
+        return CachedTTSBackend(backend, get_audio_cache(), backend.voice_id, backend.model_id, backend.output_format)
+    return backend
+
+
+async def _as_stream(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def iter_sentences(tokens: AsyncIterable[str], min_chars: int = 24, max_chars: int = 240) -> AsyncIterator[str]:
+    """Regroup a token stream into sentence-sized chunks.
+
+    A chunk is emitted at the first sentence boundary after `min_chars`
+    characters, or at the last space before `max_chars` for run-on text.
+    """
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        while True:
+            cut = None
+            for match in _SENTENCE_END.finditer(buffer):
+                if match.start() >= min_chars:
+                    cut = match
+                    break
+            if cut is not None:
+                yield buffer[:cut.start()].strip()
+                buffer = buffer[cut.end():]
+            elif len(buffer) > max_chars:
+                split = buffer.rfind(" ", 0, max_chars)
+                split = split if split > 0 else max_chars
+                yield buffer[:split].strip()
+                buffer = buffer[split:]
+            else:
+                break
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def stream_speech(
+    tokens: Union[str, AsyncIterable[str]],
+    backend: Optional[TTSBackend] = None,
+    prefetch: int = 2,
+) -> AsyncIterator[bytes]:
+    """Yield audio frames for `tokens`, synthesizing up to `prefetch` sentences ahead."""
+    backend = backend or get_tts_backend()
+    stream = _as_stream(tokens) if isinstance(tokens, str) else tokens
+    pending: asyncio.Queue[Optional[Tuple[asyncio.Task[None], asyncio.Queue[Optional[bytes]]]]] = asyncio.Queue(maxsize=prefetch)
+    tasks: List[asyncio.Task[None]] = []
+
+    async def synthesize_into(sentence: str, frames: "asyncio.Queue[Optional[bytes]]") -> None:
+        try:
+            async for frame in backend.synthesize(sentence):
+                await frames.put(frame)
+        finally:
+            await frames.put(None)
+
+    async def produce() -> None:
+        try:
+            async for sentence in iter_sentences(stream):
+                frames: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+                task = asyncio.create_task(synthesize_into(sentence, frames))
+                tasks.append(task)
+                await pending.put((task, frames))
+        finally:
+            await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await pending.get()) is not None:
+            task, frames = item
+            while (frame := await frames.get()) is not None:
+                yield frame
+            await task
+        await producer
+    finally:
+        for task in [producer, *tasks]:
+            task.cancel()
+
+
+async def drain_sink(frames: AsyncIterator[bytes]) -> int:
+    """Consume frames without playing them."""
+    total = 0
+    async for frame in frames:
+        total += len(frame)
+    return total
+
+
+async def local_playback_sink(frames: AsyncIterator[bytes]) -> int:
+    """Play frames on the local speaker through mpv as they arrive."""
+    from elevenlabs import stream as play_stream
+
+    chunks: queue.Queue[Optional[bytes]] = queue.Queue()
+
+    def iterate() -> Any:
+        while (chunk := chunks.get()) is not None:
+            yield chunk
+
+    player = asyncio.get_running_loop().run_in_executor(None, play_stream, iterate())
+    total = 0
+    try:
+        async for frame in frames:
+            chunks.put(frame)
+            total += len(frame)
+    finally:
+        chunks.put(None)
+    await player
+    return total
+
+
+class SpeechPlayer:
+    """Runs speech synthesis and playback on a background event loop."""
+
+    def __init__(self, backend: Optional[TTSBackend] = None, sink: Optional[AudioSink] = None) -> None:
+        """Start the background loop; defaults come from TTS_BACKEND and AUDIO_PLAYBACK."""
+        self.backend = backend or get_tts_backend()
+        if sink is None:
+            sink = local_playback_sink if os.getenv("AUDIO_PLAYBACK", "1") != "0" else drain_sink
+        self.sink = sink
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="speech-player", daemon=True)
+        self._thread.start()
+
+    async def _speak(self, text: Union[str, "SpeechStream"]) -> int:
+        start = time.perf_counter()
+        try:
+            played = await self.sink(stream_speech(text if isinstance(text, str) else text.tokens(), self.backend))
+        except Exception:
+            logger.exception("speech output failed")
+            played = 0
+        characters = len(text) if isinstance(text, str) else text.characters
+        for listener in speech_listeners:
+            listener(characters, played, time.perf_counter() - start)
+        return played
+
+    def submit(self, text: str) -> "Future[int]":
+        """Queue a finished reply for synthesis and playback; the future resolves to the bytes played."""
+        return asyncio.run_coroutine_threadsafe(self._speak(text), self._loop)
+
+    def open_stream(self) -> "SpeechStream":
+        """Start speaking a reply that is still being generated; feed its text to the returned stream."""
+        stream = SpeechStream(self._loop)
+        stream.future = asyncio.run_coroutine_threadsafe(self._speak(stream), self._loop)
+        return stream
+
+
+class SpeechStream:
+    """Text of a reply being spoken as it is generated, fed from any thread or event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Create a stream consumed on the player's `loop`."""
+        self._loop = loop
+        self._queue: Optional[asyncio.Queue[Optional[str]]] = None
+        self.characters = 0
+        self.future: Optional[Future[int]] = None
+
+    def _get_queue(self) -> "asyncio.Queue[Optional[str]]":
+        # created on the player's loop, by whichever of feed or tokens gets there first
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def _put(self, text: Optional[str]) -> None:
+        self._loop.call_soon_threadsafe(lambda: self._get_queue().put_nowait(text))
+
+    def feed(self, text: str) -> None:
+        """Append generated text."""
+        self.characters += len(text)
+        self._put(text)
+
+    def close(self) -> None:
+        """Mark the reply complete; the rest of it is spoken."""
+        self._put(None)
+
+    def cancel(self) -> None:
+        """Stop speaking, e.g. because the reply turned out to be a tool call."""
+        if self.future is not None:
+            self.future.cancel()
+
+    async def tokens(self) -> AsyncIterator[str]:
+        """Yield the fed text until the stream is closed."""
+        queue = self._get_queue()
+        while (text := await queue.get()) is not None:
+            yield text
+
+
+@lru_cache(maxsize=1)
+def get_speech_player() -> SpeechPlayer:
+    """Return the process-wide speech player."""
+    return SpeechPlayer()
+
+
+def warm_up_speech() -> None:
+    """Start the speech player and, for ElevenLabs, load the SDK and its client."""
+    player = get_speech_player()
+    backend = player.backend.backend if isinstance(player.backend, CachedTTSBackend) else player.backend
+    if isinstance(backend, ElevenLabsBackend):
+        _get_elevenlabs_client()
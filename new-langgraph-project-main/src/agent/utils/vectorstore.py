@@ -1,33 +1,100 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import CharacterTextSplitter
-from agent.utils.llm import _get_embedding_model
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain.tools.retriever import create_retriever_tool
-
-def load_document(file_path):
-    loader = PyPDFLoader(file_path)
-    return loader.load()
-
-def split_text(pages):
-    text_splitter = CharacterTextSplitter(
-        separator="\n",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    return text_splitter.create_documents([page.page_content for page in pages])
-
-def create_vectorstore(documents):
-    return InMemoryVectorStore.from_documents(
-        documents=documents,
-        embedding=_get_embedding_model()
-    )
-
-def get_retriever_tool(vectorstore):
-    retriever = vectorstore.as_retriever()
-    return create_retriever_tool(
-        retriever,
-        "retrieve_hospital_information",
-        "Search and return information about hospital and services.",
-    )
+"""On-disk storage of the hospital document index.
+
+The index is built once, saved next to the package and memory-mapped on
+load: chunk texts and metadata in a JSON file, unit-length embeddings in a
+float32 ``.npy`` matrix, and a manifest recording the source documents'
+digests, so the index is rebuilt only when a document or the embedder
+changes. `agent.utils.knowledge_base` builds, loads and searches it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Bundled service statement and the directory persisted indexes live under
+DOCUMENT_PATH = os.path.join(os.path.dirname(__file__), '..', 'Scope-of-Services-Statement-of-Purpose.pdf')
+INDEX_DIR = os.path.join(os.path.dirname(__file__), '..', 'index')
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+# Chunk embeddings reused across rebuilds, kept next to the index
+EMBEDDING_CACHE_FILE = "embeddings.db"
+
+
+def file_digest(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def save_index(index_dir: str, texts: List[str], metadatas: List[dict], vectors: np.ndarray, manifest: dict) -> None:
+    """Write an index to a new generation directory under `index_dir`, then point the manifest at it.
+
+    Files of a generation are never rewritten, so workers that memory-mapped an
+    older one keep reading it; the manifest is swapped in atomically, so a
+    reader sees either the old index or the new one, never a mix.
+    """
+    generation = f"{manifest.get('version', 'index')}-{uuid.uuid4().hex[:8]}"
+    generation_dir = os.path.join(index_dir, generation)
+    os.makedirs(generation_dir)
+    np.save(os.path.join(generation_dir, VECTORS_FILE), np.ascontiguousarray(vectors, dtype=np.float32))
+    chunks_path = os.path.join(generation_dir, CHUNKS_FILE)
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        json.dump({"texts": texts, "metadatas": metadatas}, f)
+    manifest = {**manifest, "count": len(texts), "generation": generation, "chunks_digest": file_digest(chunks_path)}
+    handle, tmp_path = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+    with os.fdopen(handle, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(index_dir, MANIFEST_FILE))
+    # unlinked files stay readable through the memory maps still open on them
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name != generation and os.path.exists(os.path.join(path, VECTORS_FILE)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_index(index_dir: str) -> Tuple[List[str], List[dict], np.ndarray, dict]:
+    """Return the texts, metadatas, read-only memory-mapped vectors and manifest of a saved index.
+
+    Raises:
+        FileNotFoundError: If there is no complete index in `index_dir`.
+        ValueError: If the files of the index do not match its manifest.
+    """
+    manifest = read_manifest(index_dir)
+    if manifest is None or "generation" not in manifest:
+        raise FileNotFoundError(f"No index in {index_dir}")
+    generation_dir = os.path.join(index_dir, manifest["generation"])
+    chunks_path = os.path.join(generation_dir, CHUNKS_FILE)
+    if file_digest(chunks_path) != manifest.get("chunks_digest"):
+        raise ValueError(f"Chunks of {generation_dir} do not match the manifest")
+    with open(chunks_path, encoding="utf-8") as f:
+        chunks = json.load(f)
+    vectors = np.load(os.path.join(generation_dir, VECTORS_FILE), mmap_mode="r")
+    if not vectors.shape[0] == len(chunks["texts"]) == manifest.get("count"):
+        raise ValueError(f"Vectors of {generation_dir} do not match its chunks")
+    return chunks["texts"], chunks["metadatas"], vectors, manifest
+
+
+def read_manifest(index_dir: str) -> Optional[dict]:
+    """Return the manifest of a saved index, or None if there is no complete index."""
+    try:
+        with open(os.path.join(index_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,56 @@
+"""Warm-up hooks that prepare a new worker's clients off the request path.
+
+Heavy SDKs (the Gemini client, the PDF loader stack, ElevenLabs) are imported
+on first use, so importing the graph stays fast. The first call on a new
+worker would then pay for those imports and for opening the database, the
+intent classifier and the knowledge base. Instead, modules register hooks in
+`warm_up_hooks`, and `warm_up_in_background` runs them on a daemon thread as
+soon as the graph is built. The worker takes calls while the thread runs,
+and each hook makes the later first use a cache hit. A failing hook is logged
+and skipped; the component then initializes on first use as before.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+WarmUpHook = Tuple[str, Callable[[], Any]]
+
+# (name, hook) pairs run by `warm_up`, in order
+warm_up_hooks: List[WarmUpHook] = []
+
+
+def warm_up_enabled() -> bool:
+    """Return whether building the graph starts a background warm-up.
+
+    Off unless WARM_UP=1, so importing the graph in tests and scripts stays cheap;
+    .env.example turns it on for deployments.
+    """
+    return os.getenv("WARM_UP", "0") == "1"
+
+
+def warm_up(hooks: Optional[Sequence[WarmUpHook]] = None) -> Dict[str, Optional[float]]:
+    """Run warm-up hooks and return the seconds each took (None for a hook that failed)."""
+    timings: Dict[str, Optional[float]] = {}
+    for name, hook in warm_up_hooks if hooks is None else hooks:
+        start = time.perf_counter()
+        try:
+            hook()
+        except Exception:
+            logger.warning("Warm-up of %s failed; it will initialize on first use", name, exc_info=True)
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info("Warm-up finished: %s", timings)
+    return timings
+
+
+def warm_up_in_background(hooks: Optional[Sequence[WarmUpHook]] = None) -> threading.Thread:
+    """Start `warm_up` on a daemon thread and return the thread."""
+    thread = threading.Thread(target=warm_up, args=(hooks,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1 @@
+"""Offline performance benchmarks; run with `make benchmarks`."""
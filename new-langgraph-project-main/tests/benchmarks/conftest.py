@@ -0,0 +1,48 @@
+import importlib
+import shutil
+
+import pytest
+
+from agent.utils import db
+from agent.utils.availability import get_availability_index
+from agent.utils.knowledge_base import SHARED, load_or_build_knowledge_base
+from agent.utils.llm import HashingEmbeddings, llm_registry
+from agent.utils.vectorstore import DOCUMENT_PATH
+
+from .harness import BenchmarkHarness, ReplayChatModel
+
+
+@pytest.fixture(autouse=True)
+def offline_services(tmp_path, monkeypatch):
+    """Run every benchmark against a scratch database with audio output disabled."""
+    path = tmp_path / "appointments.db"
+    shutil.copy(db.DB_PATH, path)
+    monkeypatch.setenv("APPOINTMENTS_DB_PATH", str(path))
+    monkeypatch.setenv("TTS_BACKEND", "none")
+    monkeypatch.setenv("AUDIO_PLAYBACK", "0")
+    db.get_repository.cache_clear()
+    yield
+    db.get_repository().pool.close_all()
+    db.get_repository.cache_clear()
+
+
+@pytest.fixture(scope="session")
+def local_knowledge_base(tmp_path_factory):
+    """Knowledge base over the bundled document, built with the offline hashing embedder instead of Gemini."""
+    return load_or_build_knowledge_base({SHARED: [DOCUMENT_PATH]}, str(tmp_path_factory.mktemp("index")), HashingEmbeddings())
+
+
+@pytest.fixture
+def harness(local_knowledge_base, monkeypatch):
+    """End-to-end harness over the real graph with a replaying chat model and the local knowledge base."""
+    # `agent.graph` the attribute is the compiled graph, so fetch the module itself
+    agent_graph = importlib.import_module("agent.graph")
+    # a few milliseconds per call, so the background prefetch starts before the agent's tool calls as it
+    # would behind a real model, instead of racing an instant reply
+    model = ReplayChatModel(latency=0.005)
+    monkeypatch.setattr(agent_graph, "get_knowledge_base", lambda: local_knowledge_base)
+    llm_registry.set_factory(lambda: model)
+    try:
+        yield BenchmarkHarness(agent_graph.graph_builder, model, db.get_repository(), get_availability_index())
+    finally:
+        llm_registry.set_factory(None)
@@ -0,0 +1,48 @@
+"""Offline stand-ins for the chat model used by the benchmarks."""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Callable, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+Policy = Callable[[List[BaseMessage]], AIMessage]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose replies come from a policy over the prompt, after a simulated latency."""
+
+    policy: Policy
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self.bind(tool_names=[getattr(tool, "name", getattr(tool, "__name__", "")) for tool in tools])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.policy(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.policy(messages))])
+
+
+def tool_call(name: str, **args: Any) -> AIMessage:
+    """Return an AI message requesting one tool call."""
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:8]}"}])
+
+
+def booking_policy(messages: List[BaseMessage]) -> AIMessage:
+    """Look up free slots once, then answer."""
+    if isinstance(messages[-1], ToolMessage):
+        return AIMessage(content="Dr. Clara Lee is free at 08:00. Shall I book it?")
+    return tool_call("find_available_slots", doctor_id=3, start_date="2999-01-01", limit=3)
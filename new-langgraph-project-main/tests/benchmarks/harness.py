@@ -0,0 +1,368 @@
+"""Deterministic end-to-end benchmark harness for the compiled graph.
+
+Conversations are scripted: every user turn comes with the exact replies the
+chat model will give, in call order, and `ReplayChatModel` plays them back
+for whichever agent role asks next. Each run starts from a pristine copy of
+the appointments database and an empty answer cache, so bookings,
+cancellations and FAQ answers replay identically.
+`GraphProfiler` records per-node latency, tool calls, LLM calls and token
+usage from LangChain callbacks; SQL statements are counted with the
+connection pool's trace hook.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult, LLMResult
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph
+from pydantic import PrivateAttr
+
+from agent.utils.answer_cache import get_answer_cache
+from agent.utils.availability import AvailabilityIndex
+from agent.utils.db import HospitalRepository
+from agent.utils.prefetch import get_prefetch_cache, in_prefetch
+
+PERCENTILES = (50, 95, 99)
+
+
+class ScriptExhausted(AssertionError):
+    """The graph asked the model for more replies than the script provides."""
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that returns scripted replies in order, stamped with approximate token usage."""
+
+    latency: float = 0.0
+    _replies: List[AIMessage] = PrivateAttr(default_factory=list)
+    _cursor: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def load(self, replies: Sequence[AIMessage]) -> None:
+        """Replace the script and rewind to its first reply."""
+        with self._lock:
+            self._replies = list(replies)
+            self._cursor = 0
+
+    @property
+    def remaining(self) -> int:
+        """Number of scripted replies not yet played."""
+        return len(self._replies) - self._cursor
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        return self.bind(tool_names=[getattr(tool, "name", getattr(tool, "__name__", "")) for tool in tools])
+
+    def _next(self, messages: List[BaseMessage]) -> ChatResult:
+        with self._lock:
+            if self._cursor >= len(self._replies):
+                raise ScriptExhausted(f"no scripted reply left for a prompt ending in {messages[-1].content!r}")
+            position = self._cursor
+            reply = self._replies[position]
+            self._cursor += 1
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([reply])
+        usage = UsageMetadata(input_tokens=input_tokens, output_tokens=output_tokens, total_tokens=input_tokens + output_tokens)
+        # unique per conversation, so add_messages appends instead of replacing
+        message = reply.model_copy(update={"id": f"replay-{position}", "usage_metadata": usage})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._next(messages)
+
+
+def call(tool: str, /, **args: Any) -> AIMessage:
+    """Scripted reply requesting one tool call."""
+    return AIMessage(content="", tool_calls=[{"name": tool, "args": args, "id": f"call_{uuid.uuid4().hex[:8]}"}])
+
+
+def say(text: str) -> AIMessage:
+    """Scripted plain-text reply."""
+    return AIMessage(content=text)
+
+
+@dataclass(frozen=True)
+class Turn:
+    """One user message and the model replies it should trigger, in call order."""
+
+    user: str
+    replies: Sequence[AIMessage]
+
+
+@dataclass(frozen=True)
+class Conversation:
+    """A named multi-turn script run on a fresh thread."""
+
+    name: str
+    turns: Sequence[Turn]
+
+
+@dataclass
+class TurnStats:
+    """Measurements of one user turn."""
+
+    conversation: str
+    turn: int
+    seconds: float
+    node_seconds: Dict[str, List[float]] = field(default_factory=dict)
+    tool_calls: Dict[str, int] = field(default_factory=dict)
+    tool_failures: int = 0
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    sql_queries: int = 0
+    # of which issued by the background prefetch, off the critical path
+    prefetch_queries: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+class GraphProfiler(BaseCallbackHandler):
+    """Callback handler that times graph nodes and counts tool calls and token usage."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._open: Dict[Any, tuple] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._open.clear()
+            self.node_seconds: Dict[str, List[float]] = {}
+            self.tool_calls: Counter = Counter()
+            self.tool_failures = 0
+            self.llm_calls = 0
+            self.input_tokens = 0
+            self.output_tokens = 0
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: Any, parent_run_id: Any = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        with self._lock:
+            # a node's inner runnable may share its name; only the outer run is timed
+            parent = self._open.get(parent_run_id)
+            if parent is None or parent[0] != node:
+                self._open[run_id] = (node, time.perf_counter())
+
+    def _close(self, run_id: Any) -> None:
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            if opened is not None:
+                node, start = opened
+                self.node_seconds.setdefault(node, []).append(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs: Any, *, run_id: Any, **kwargs: Any) -> None:
+        self._close(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: Any, **kwargs: Any) -> None:
+        self._close(run_id)
+
+    def on_tool_start(self, serialized: Any, input_str: str, *, run_id: Any, **kwargs: Any) -> None:
+        with self._lock:
+            self.tool_calls[kwargs.get("name") or (serialized or {}).get("name", "?")] += 1
+
+    def on_tool_end(self, output: Any, *, run_id: Any, **kwargs: Any) -> None:
+        content = getattr(output, "content", output)
+        # tools report handled errors as JSON rather than raising
+        if isinstance(content, str) and '"success": false' in content:
+            with self._lock:
+                self.tool_failures += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: Any, **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage:
+                        self.input_tokens += usage["input_tokens"]
+                        self.output_tokens += usage["output_tokens"]
+
+
+class SQLCounter:
+    """Trace callback counting the queries run through the connection pool."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.prefetch = 0
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.count = self.prefetch = 0
+
+    def __call__(self, statement: str) -> None:
+        # statements run inside triggers are traced with a "--" prefix, and the
+        # full-text index reads its shadow tables with schema-qualified names
+        if statement.startswith("--") or "'main'." in statement:
+            return
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        # pragmas and transaction control are connection housekeeping, not queries
+        if keyword not in ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"):
+            # the trace hook runs on the querying thread, inside the caller's context
+            prefetching = in_prefetch.get()
+            with self._lock:
+                self.count += 1
+                self.prefetch += prefetching
+
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    values = np.percentile(np.asarray(samples, dtype=np.float64) * 1e3, PERCENTILES)
+    return {f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, values)}
+
+
+@dataclass
+class BenchmarkReport:
+    """Per-turn measurements of every run, with aggregate views."""
+
+    turns: List[TurnStats]
+
+    def node_latency(self) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles and call counts per graph node."""
+        samples: Dict[str, List[float]] = {}
+        for stats in self.turns:
+            for node, seconds in stats.node_seconds.items():
+                samples.setdefault(node, []).extend(seconds)
+        return {node: {"calls": float(len(values)), **_percentiles(values)} for node, values in sorted(samples.items())}
+
+    def conversations(self) -> Dict[str, Dict[str, Any]]:
+        """Per-run averages for each conversation: latency, tool calls, LLM calls, SQL queries and tokens per turn.
+
+        `critical_path_queries` leaves out the queries the background prefetch runs alongside the router.
+        """
+        grouped: Dict[str, List[TurnStats]] = {}
+        for stats in self.turns:
+            grouped.setdefault(stats.conversation, []).append(stats)
+        summary = {}
+        for name, turns in grouped.items():
+            runs = sum(1 for stats in turns if stats.turn == 0)
+            tool_calls: Counter = Counter()
+            for stats in turns:
+                tool_calls.update(stats.tool_calls)
+            summary[name] = {
+                "runs": runs,
+                "turn_latency": _percentiles([stats.seconds for stats in turns]),
+                "tool_calls": {tool: count / runs for tool, count in sorted(tool_calls.items())},
+                "tool_failures": sum(stats.tool_failures for stats in turns),
+                "llm_calls": sum(stats.llm_calls for stats in turns) / runs,
+                "sql_queries": sum(stats.sql_queries for stats in turns) / runs,
+                "critical_path_queries": sum(stats.sql_queries - stats.prefetch_queries for stats in turns) / runs,
+                "tokens_per_turn": float(np.mean([stats.tokens for stats in turns])),
+                "max_tokens_per_turn": max(stats.tokens for stats in turns),
+            }
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"nodes": self.node_latency(), "conversations": self.conversations(), "turns": [asdict(stats) for stats in self.turns]}
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format(self) -> str:
+        """Render the aggregates as plain-text tables."""
+        lines = ["node                         |  calls |   p50 ms |   p95 ms |   p99 ms"]
+        for node, row in self.node_latency().items():
+            lines.append(f"{node:28s} | {int(row['calls']):6d} | {row['p50_ms']:8.2f} | {row['p95_ms']:8.2f} | {row['p99_ms']:8.2f}")
+        lines.append("")
+        lines.append("conversation | turn p50 ms | turn p99 ms | tool calls | llm calls | sql queries | critical sql | tokens/turn")
+        for name, row in self.conversations().items():
+            lines.append(
+                f"{name:12s} | {row['turn_latency']['p50_ms']:11.2f} | {row['turn_latency']['p99_ms']:11.2f} | "
+                f"{sum(row['tool_calls'].values()):10.1f} | {row['llm_calls']:9.1f} | {row['sql_queries']:11.1f} | "
+                f"{row['critical_path_queries']:12.1f} | {row['tokens_per_turn']:11.1f}"
+            )
+        return "\n".join(lines)
+
+
+class BenchmarkHarness:
+    """Drives scripted conversations through a graph and collects a `BenchmarkReport`."""
+
+    def __init__(
+        self,
+        builder: StateGraph,
+        model: ReplayChatModel,
+        repository: HospitalRepository,
+        availability: AvailabilityIndex,
+    ) -> None:
+        """Compile `builder` with an in-memory checkpointer and snapshot the database."""
+        self.graph = builder.compile(checkpointer=InMemorySaver())
+        self.model = model
+        self.repository = repository
+        self.availability = availability
+        self.profiler = GraphProfiler()
+        self.sql = SQLCounter()
+        # copied through the pool so the snapshot already carries its schema migrations
+        self._pristine = sqlite3.connect(":memory:", check_same_thread=False)
+        repository.pool.connection().backup(self._pristine)
+
+    def _restore(self) -> None:
+        self._pristine.backup(self.repository.pool.connection())
+        self.availability.invalidate()
+        get_answer_cache.cache_clear()
+        get_prefetch_cache().clear()
+
+    def run_conversation(self, conversation: Conversation) -> List[TurnStats]:
+        """Replay one conversation on a fresh thread and database; return one entry per turn."""
+        self._restore()
+        self.model.load([reply for turn in conversation.turns for reply in turn.replies])
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}, "callbacks": [self.profiler]}
+        self.repository.pool.set_trace_callback(self.sql)
+        results = []
+        try:
+            for number, turn in enumerate(conversation.turns):
+                self.profiler.reset()
+                self.sql.reset()
+                start = time.perf_counter()
+                self.graph.invoke({"messages": [HumanMessage(turn.user)]}, config)
+                # the turn's background prefetch is counted with it
+                prefetching = get_prefetch_cache().pending(config["configurable"]["thread_id"])
+                if prefetching is not None:
+                    prefetching.result()
+                results.append(TurnStats(
+                    conversation=conversation.name,
+                    turn=number,
+                    seconds=time.perf_counter() - start,
+                    node_seconds={node: list(seconds) for node, seconds in self.profiler.node_seconds.items()},
+                    tool_calls=dict(self.profiler.tool_calls),
+                    tool_failures=self.profiler.tool_failures,
+                    llm_calls=self.profiler.llm_calls,
+                    input_tokens=self.profiler.input_tokens,
+                    output_tokens=self.profiler.output_tokens,
+                    sql_queries=self.sql.count,
+                    prefetch_queries=self.sql.prefetch,
+                ))
+        finally:
+            self.repository.pool.set_trace_callback(None)
+        if self.model.remaining:
+            raise AssertionError(f"{conversation.name}: {self.model.remaining} scripted replies were never requested")
+        return results
+
+    def run(self, conversations: Sequence[Conversation], iterations: int) -> BenchmarkReport:
+        """Run every conversation `iterations` times, interleaved."""
+        turns: List[TurnStats] = []
+        for _ in range(iterations):
+            for conversation in conversations:
+                turns.extend(self.run_conversation(conversation))
+        return BenchmarkReport(turns)
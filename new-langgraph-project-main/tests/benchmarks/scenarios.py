@@ -0,0 +1,56 @@
+"""Scripted conversations replayed by the end-to-end benchmark.
+
+Replies are listed in the order the graph asks for them; follow-up turns
+that the local intent classifier cannot route start with the router's reply.
+"""
+
+from .harness import Conversation, Turn, call, say
+
+BOOKING = Conversation("booking", (
+    Turn("I'd like to book an appointment with Dr. Clara Lee.", (
+        call("search_for_doctor", name="Clara Lee"),
+        call("find_available_slots", doctor_id=3, start_date="2999-01-04", limit=3),
+        say("Dr. Clara Lee is free on January 4th at 08:00, 08:30 and 09:00. Which time suits you?"),
+    )),
+    Turn("Eight o'clock please, my patient ID is 2.", (
+        call("new_booking_assistant"),
+        call("book_appointment", user_id=2, doctor_id=3, date="2999-01-04", time="08:00"),
+        say("You're booked with Dr. Clara Lee on January 4th at 08:00."),
+    )),
+))
+
+CANCELLATION = Conversation("cancellation", (
+    Turn("I need to cancel my appointment, the ID is 15.", (
+        call("search_for_appointment", appointment_id=15),
+        say("Appointment 15 is with Dr. Clara Lee on July 30th at 17:00. Shall I cancel it?"),
+    )),
+    Turn("Yes, please go ahead.", (
+        call("cancel_booking_assistant"),
+        call("cancel_appointment", appointment_id=15),
+        say("Done, appointment 15 is cancelled."),
+    )),
+))
+
+RESCHEDULE = Conversation("reschedule", (
+    Turn("Can I move my appointment 15 to another day?", (
+        call("search_for_appointment", appointment_id=15),
+        call("find_available_slots", doctor_id=3, start_date="2999-01-04", limit=3),
+        say("Dr. Clara Lee is free on January 4th at 08:00, 08:30 and 09:00. Which time suits you?"),
+    )),
+    Turn("Half past eight please.", (
+        call("reschedule_booking_assistant"),
+        call("reschedule_appointment", appointment_id=15, date="2999-01-04", time="08:30"),
+        say("Done, appointment 15 is now on January 4th at 08:30."),
+    )),
+))
+
+FAQ = Conversation("faq", (
+    Turn("What services does the hospital provide?", (
+        say("The hospital offers emergency care, cardiology, neurology and pediatrics."),
+    )),
+    Turn("Is there parking at the hospital?", (
+        say("Yes, there is a visitor car park next to the main entrance."),
+    )),
+))
+
+CONVERSATIONS = (BOOKING, CANCELLATION, RESCHEDULE, FAQ)
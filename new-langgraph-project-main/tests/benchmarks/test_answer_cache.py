@@ -0,0 +1,64 @@
+import importlib
+import time
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils.answer_cache import AnswerCacheMetrics, SemanticAnswerCache
+from agent.utils.llm import llm_registry
+
+from .fakes import ScriptedChatModel
+
+# simulated Gemini generation latency
+LLM_LATENCY = 0.05
+
+QUESTIONS = (
+    "What are the opening hours of the hospital?",
+    "What services does the hospital provide?",
+    "Where is the hospital located?",
+    "Do you have an emergency department?",
+    "Is there parking at the hospital?",
+    "Which departments do you have?",
+)
+# how callers actually phrase the same questions
+VARIANTS = (
+    lambda q: q,
+    lambda q: q.lower(),
+    lambda q: q.rstrip("?") + " please?",
+    lambda q: "Hi, " + q[0].lower() + q[1:],
+    lambda q: q.upper(),
+)
+TRAFFIC = [variant(question) for variant in VARIANTS for question in QUESTIONS]
+
+
+def _serve(rag_node, traffic) -> list:
+    latencies = []
+    for question in traffic:
+        start = time.perf_counter()
+        rag_node({"messages": [HumanMessage(question)]}, {})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def test_answer_cache_hit_rate_and_latency(local_knowledge_base, monkeypatch) -> None:
+    agent_graph = importlib.import_module("agent.graph")
+    monkeypatch.setattr(agent_graph, "get_knowledge_base", lambda: local_knowledge_base)
+    llm_registry.set_factory(lambda: ScriptedChatModel(policy=lambda messages: AIMessage("An answer."), latency=LLM_LATENCY))
+    metrics = AnswerCacheMetrics()
+    try:
+        monkeypatch.setattr(agent_graph, "_answer_cache", lambda hospital_id: None)
+        uncached = _serve(agent_graph.rag_node, TRAFFIC)
+        cache = SemanticAnswerCache(metrics=metrics)
+        monkeypatch.setattr(agent_graph, "_answer_cache", lambda hospital_id: cache)
+        cached = _serve(agent_graph.rag_node, TRAFFIC)
+    finally:
+        llm_registry.set_factory(None)
+
+    snapshot = metrics.snapshot()
+    print(
+        f"\n{len(TRAFFIC)} questions: hit rate {snapshot['hit_rate']:.0%}, "
+        f"mean latency {np.mean(uncached) * 1e3:.1f} ms uncached vs {np.mean(cached) * 1e3:.1f} ms cached, "
+        f"estimated saving {snapshot['latency_saved_seconds'] * 1e3:.0f} ms"
+    )
+    assert snapshot["hit_rate"] >= 0.6
+    assert sum(cached) < 0.5 * sum(uncached)
@@ -0,0 +1,41 @@
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agent.graph import graph
+from agent.utils.llm import llm_registry
+
+from .fakes import ScriptedChatModel, booking_policy
+
+# simulated Gemini latency per call
+LLM_LATENCY = 0.05
+CONCURRENCY = (1, 10, 100, 300)
+
+
+async def _conversation() -> float:
+    start = time.perf_counter()
+    await graph.ainvoke({"messages": [HumanMessage("I want to book an appointment with Dr. Clara Lee")]})
+    return time.perf_counter() - start
+
+
+async def _run(concurrency: int) -> tuple:
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_conversation() for _ in range(concurrency)))
+    return concurrency / (time.perf_counter() - start), statistics.median(latencies)
+
+
+def test_async_graph_scaling_curve() -> None:
+    llm_registry.set_factory(lambda: ScriptedChatModel(policy=booking_policy, latency=LLM_LATENCY))
+    try:
+        curve = {level: asyncio.run(_run(level)) for level in CONCURRENCY}
+    finally:
+        llm_registry.set_factory(None)
+
+    print("\nconcurrent calls | conversations/s | p50 latency (ms)")
+    for level, (throughput, p50) in curve.items():
+        print(f"{level:16d} | {throughput:15.1f} | {p50 * 1e3:16.1f}")
+
+    # conversations wait on the (simulated) LLM concurrently instead of queueing on threads
+    assert curve[100][0] > 10 * curve[1][0]
@@ -0,0 +1,40 @@
+import os
+
+from .scenarios import CONVERSATIONS
+
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", "20"))
+
+# tool calls per run; the scripts fix these, so a difference means the graph misrouted
+EXPECTED_TOOL_CALLS = {
+    "booking": {"book_appointment": 1, "find_available_slots": 1, "search_for_doctor": 1},
+    "cancellation": {"cancel_appointment": 1, "search_for_appointment": 1},
+    "reschedule": {"find_available_slots": 1, "reschedule_appointment": 1, "search_for_appointment": 1},
+    "faq": {},
+}
+# SQL queries per run, those left on the critical path once the background prefetch has
+# warmed the booking data, and approximate prompt + completion tokens per turn
+# (every LLM call carries its agent's static system prompt, the cacheable prefix;
+# tool results are sent in their compact encoding)
+SQL_BUDGET = {"booking": 4, "cancellation": 2, "reschedule": 5, "faq": 0}
+CRITICAL_PATH_SQL_BUDGET = {"booking": 1, "cancellation": 2, "reschedule": 5, "faq": 0}
+TOKENS_PER_TURN_BUDGET = {"booking": 1500, "cancellation": 1100, "reschedule": 1450, "faq": 1500}
+
+
+def test_end_to_end_conversations(harness) -> None:
+    report = harness.run(CONVERSATIONS, ITERATIONS)
+    print("\n" + report.format())
+    if os.getenv("BENCHMARK_REPORT"):
+        report.to_json(os.environ["BENCHMARK_REPORT"])
+
+    summary = report.conversations()
+    for conversation in CONVERSATIONS:
+        row = summary[conversation.name]
+        assert row["tool_calls"] == EXPECTED_TOOL_CALLS[conversation.name]
+        assert row["tool_failures"] == 0
+        assert row["sql_queries"] <= SQL_BUDGET[conversation.name]
+        assert row["critical_path_queries"] <= CRITICAL_PATH_SQL_BUDGET[conversation.name]
+        assert row["max_tokens_per_turn"] <= TOKENS_PER_TURN_BUDGET[conversation.name]
+
+    # every user turn is spoken exactly once, never on tool-call steps
+    turns = sum(len(conversation.turns) for conversation in CONVERSATIONS) * ITERATIONS
+    assert report.node_latency()["audio_output"]["calls"] == turns
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Framework imports every worker pays anyway; the agent's own cost is measured on top
+BASELINE = "import langgraph.graph, langgraph.prebuilt, langchain_core.tools"
+# SDKs that must only load inside the nodes or warm-up hooks that use them
+DEFERRED = ("langchain_google_genai", "google.genai", "elevenlabs", "langchain_community", "pypdf", "dotenv")
+# Seconds `import agent.graph` may add to the framework imports
+AGENT_IMPORT_BUDGET = 0.5
+REPEATS = 3
+
+
+def _import_times(statement: str) -> List[Tuple[str, int, int]]:
+    # (module, self us, cumulative us) from a fresh interpreter's -X importtime report
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, ["src", os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", statement],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _total_seconds(rows: List[Tuple[str, int, int]]) -> float:
+    return sum(self_us for _, self_us, _ in rows) / 1e6
+
+
+def test_graph_import_time() -> None:
+    baseline = min(_total_seconds(_import_times(BASELINE)) for _ in range(REPEATS))
+    runs = [_import_times("import agent.graph") for _ in range(REPEATS)]
+    rows = min(runs, key=_total_seconds)
+    total = _total_seconds(rows)
+
+    by_package: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] = by_package.get(name.split(".")[0], 0) + self_us
+    print(f"\nimport agent.graph: {total * 1e3:.0f} ms ({baseline * 1e3:.0f} ms framework baseline)")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:12]:
+        print(f"{package:28s} | {self_us / 1e3:8.1f} ms")
+
+    imported = {name for name, _, _ in rows}
+    assert not [name for name in imported if name.startswith(DEFERRED)]
+    assert total - baseline < AGENT_IMPORT_BUDGET
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from agent.graph import new_booking_tools
+from agent.utils import llm
+from agent.utils.llm import BoundLLMRegistry
+
+STEPS = 50
+
+
+@pytest.fixture
+def offline_gemini(monkeypatch):
+    # the Gemini client can be built and bound offline with any key
+    monkeypatch.setenv("GOOGLE_API_KEY", "offline-benchmark")
+    llm._get_llm.cache_clear()
+    yield
+    llm._get_llm.cache_clear()
+
+
+def test_bound_llm_per_step_overhead(offline_gemini) -> None:
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        base = llm._get_llm().bind_tools([])
+        base.bind_tools(new_booking_tools)
+    rebinding = (time.perf_counter() - start) / STEPS
+
+    registry = BoundLLMRegistry()
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        registry.get("new_booking_assistant", new_booking_tools)
+    cached = (time.perf_counter() - start) / STEPS
+
+    print(f"\nper-step bind overhead: rebinding {rebinding * 1e3:.3f} ms, registry {cached * 1e3:.3f} ms")
+    assert (registry.hits, registry.misses) == (STEPS - 1, 1)
+    assert cached < rebinding
@@ -0,0 +1,153 @@
+import os
+import random
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+
+from agent.utils.availability import AvailabilityIndex, time_of
+from agent.utils.db import ConnectionPool, HospitalRepository
+from agent.utils.synthetic import LOCATIONS, SPECIALIZATIONS, generate_database
+
+# Scale of the generated database; point SCALE_DB at a file to reuse (or create) a large one, e.g.
+# SCALE_DB=hospital.db SCALE_DOCTORS=10000 SCALE_PATIENTS=2000000 SCALE_APPOINTMENTS=50000000
+SCALE_DOCTORS = int(os.getenv("SCALE_DOCTORS", "500"))
+SCALE_PATIENTS = int(os.getenv("SCALE_PATIENTS", "20000"))
+SCALE_APPOINTMENTS = int(os.getenv("SCALE_APPOINTMENTS", "150000"))
+# Calls per operation, and threads of the concurrent run
+SAMPLES = int(os.getenv("SCALE_SAMPLES", "200"))
+THREADS = int(os.getenv("SCALE_THREADS", "8"))
+# Plans that read a whole large table (a bare SCAN, not a SEARCH using an index)
+FULL_SCAN = re.compile(r"^SCAN (Appointment|Patient|a)\b")
+# Writes go to this year, clear of the generated calendar
+WRITE_YEAR = 2999
+
+Operation = Callable[[random.Random], object]
+# Single-threaded median latency no tool query should exceed
+MAX_P50_MS = 50.0
+
+
+@pytest.fixture(scope="module")
+def scale_db(tmp_path_factory):
+    path = os.getenv("SCALE_DB") or str(tmp_path_factory.mktemp("scale") / "hospital.db")
+    if not os.path.exists(path):
+        generated = generate_database(path, SCALE_DOCTORS, SCALE_PATIENTS, SCALE_APPOINTMENTS, seed=1)
+        print(f"\ngenerated {path}: load {generated.load_seconds:.1f} s, indexes {generated.index_seconds:.1f} s")
+    repository = HospitalRepository(ConnectionPool(path))
+    yield repository
+    repository.pool.close_all()
+
+
+def _operations(repository: HospitalRepository) -> Dict[str, Operation]:
+    conn = repository.pool.connection()
+    doctors = conn.execute("SELECT MAX(Doctor_ID) FROM Doctor").fetchone()[0]
+    patients = conn.execute("SELECT MAX(Patient_ID) FROM Patient").fetchone()[0]
+    appointments = conn.execute("SELECT MAX(Appointment_ID) FROM Appointment").fetchone()[0]
+    names = [row[0] for row in conn.execute("SELECT Doctor_Name FROM Doctor ORDER BY random() LIMIT 200")]
+    patient_names = [tuple(row) for row in conn.execute("SELECT Patient_Name, Age FROM Patient ORDER BY random() LIMIT 200")]
+    phones = [row[0] for row in conn.execute("SELECT Phone FROM Patient WHERE Phone IS NOT NULL ORDER BY random() LIMIT 200")]
+    today = date.today()
+    specializations = [name for name, _ in SPECIALIZATIONS]
+
+    def slot(rng: random.Random) -> Tuple[int, str, str]:
+        day = today + timedelta(days=rng.randrange(-30, 60))
+        return rng.randint(1, doctors), day.isoformat(), time_of(rng.randrange(28))
+
+    def free_slots(doctor_ids: List[int]) -> object:
+        # a fresh index loads each doctor's calendar, as on a cold worker
+        return AvailabilityIndex(repository).next_free_slots(doctor_ids, today, today + timedelta(days=14), 5)
+
+    def write_path(rng: random.Random) -> object:
+        day = date(WRITE_YEAR, 1, 1) + timedelta(days=rng.randrange(365))
+        doctor_id = rng.randint(1, doctors)
+        appointment_id = repository.create_appointment(rng.randint(1, patients), doctor_id, day.isoformat(), "09:00")
+        if appointment_id is not None:
+            repository.move_appointment(appointment_id, day.isoformat(), "10:00")
+            repository.delete_appointment(appointment_id)
+        return appointment_id
+
+    return {
+        "search_for_doctor: name": lambda rng: repository.search_doctors(rng.choice(names)),
+        "search_for_doctor: surname": lambda rng: repository.search_doctors(rng.choice(names).split()[-1]),
+        "search_for_doctor: specialization": lambda rng: repository.search_doctors(specialization=rng.choice(specializations)),
+        "search_for_doctor: location, rating": lambda rng: repository.search_doctors(location=rng.choice(LOCATIONS), min_rating=4.5),
+        "check_doctor_availability": lambda rng: repository.is_slot_booked(*slot(rng)),
+        "check_doctor_availability x8": lambda rng: repository.booked_slots_among([slot(rng) for _ in range(8)]),
+        "find_available_slots: doctor": lambda rng: free_slots([rng.randint(1, doctors)]),
+        "find_available_slots: specialization": lambda rng: free_slots([
+            doctor["Doctor_ID"] for doctor in repository.search_doctors(specialization=rng.choice(specializations), limit=20)["doctors"]
+        ]),
+        "search_for_appointment": lambda rng: repository.get_appointment(rng.randint(1, appointments)),
+        "search_for_appointment x4": lambda rng: repository.get_appointments([rng.randint(1, appointments) for _ in range(4)]),
+        "find_patient: phone": lambda rng: repository.find_patients(phone=rng.choice(phones)),
+        "find_patient: name, age": lambda rng: repository.find_patients(*rng.choice(patient_names)),
+        "find_patient: first name": lambda rng: repository.find_patients(rng.choice(patient_names)[0].split()[0]),
+        "list_upcoming_appointments": lambda rng: repository.upcoming_appointments(
+            rng.randint(1, patients), f"{today.isoformat()} 08:00"
+        ),
+        "book, reschedule, cancel": write_path,
+    }
+
+
+def _latencies(operation: Operation, threads: int) -> List[float]:
+    def timed(seed: int) -> float:
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        operation(rng)
+        return time.perf_counter() - start
+
+    if threads == 1:
+        return [timed(seed) for seed in range(SAMPLES)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(timed, range(SAMPLES)))
+
+
+def _plans(operation: Operation, repository: HospitalRepository) -> Dict[str, List[str]]:
+    # statements as run, with their values inlined, mapped to their query plans
+    statements: List[str] = []
+    repository.pool.set_trace_callback(statements.append)
+    try:
+        operation(random.Random(0))
+    finally:
+        repository.pool.set_trace_callback(None)
+    conn = repository.pool.connection()
+    plans = {}
+    for statement in statements:
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"):
+            plans[" ".join(statement.split())] = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    return plans
+
+
+def _percentiles(values: List[float]) -> Tuple[float, float]:
+    # p50 and p99, in milliseconds
+    cuts = statistics.quantiles(values, n=100)
+    return cuts[49] * 1e3, cuts[98] * 1e3
+
+
+def test_tool_queries_at_scale(scale_db) -> None:
+    operations = _operations(scale_db)
+    rows = []
+    full_scans = []
+    plan_lines = []
+    for name, operation in operations.items():
+        single = _latencies(operation, 1)
+        concurrent = _latencies(operation, THREADS)
+        rows.append((name, *_percentiles(single), *_percentiles(concurrent)))
+        plan_lines.append(f"-- {name}")
+        for statement, plan in _plans(operation, scale_db).items():
+            plan_lines.append(f"   {statement[:150]}")
+            plan_lines.extend(f"     {line}" for line in plan)
+            full_scans += [(name, line) for line in plan if FULL_SCAN.match(line)]
+
+    print(f"\n{'operation':38s} | p50 ms | p99 ms | p50 ms x{THREADS} | p99 ms x{THREADS}")
+    for name, p50, p99, concurrent_p50, concurrent_p99 in rows:
+        print(f"{name:38s} | {p50:6.2f} | {p99:6.2f} | {concurrent_p50:9.2f} | {concurrent_p99:9.2f}")
+    print("\n" + "\n".join(plan_lines))
+
+    # every tool query reaches the large tables through an index
+    assert full_scans == []
+    assert [name for name, p50, *_ in rows if p50 > MAX_P50_MS] == []
@@ -0,0 +1,27 @@
+import numpy as np
+
+from agent.utils.telemetry import InMemorySink, Telemetry, disable, enable
+
+from .scenarios import CONVERSATIONS
+
+ITERATIONS = 20
+
+
+def _turn_seconds(harness) -> list:
+    return [stats.seconds for _ in range(ITERATIONS) for conversation in CONVERSATIONS for stats in harness.run_conversation(conversation)]
+
+
+def test_telemetry_overhead(harness) -> None:
+    # warm caches first; the disabled run must come before the hook is ever registered
+    _turn_seconds(harness)
+    plain = _turn_seconds(harness)
+    sink = InMemorySink()
+    enable(Telemetry([sink]))
+    try:
+        traced = _turn_seconds(harness)
+    finally:
+        disable()
+
+    p50_plain, p50_traced = np.median(plain) * 1e3, np.median(traced) * 1e3
+    print(f"\nturn p50: {p50_plain:.2f} ms without telemetry, {p50_traced:.2f} ms with ({len(sink.spans)} spans)")
+    assert {span.kind for span in sink.spans} == {"node", "tool", "llm", "retriever", "tts"}
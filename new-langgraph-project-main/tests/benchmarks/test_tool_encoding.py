@@ -0,0 +1,43 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agent.utils.encoding import elide_stale_results, get_result_encoder
+from agent.utils.tokens import TokenCounter
+from agent.utils.tools import find_available_slots, search_for_doctor
+
+# each caller turn, the booking agent browses doctors and their free slots
+TURNS = (
+    ("Which cardiologists do you have?", search_for_doctor, {"specialization": "Cardiology", "limit": 10}),
+    ("Who is the best rated doctor?", search_for_doctor, {"limit": 10}),
+    ("When is Dr. Clara Lee free?", find_available_slots, {"doctor_id": 3, "start_date": "2999-01-04", "limit": 10}),
+    ("Any free neurology slots?", find_available_slots, {"specialization": "Neurology", "start_date": "2999-01-04", "limit": 10}),
+)
+
+
+def _prompt_tokens(encoded: bool) -> list:
+    encoder = get_result_encoder("new_booking_assistant")
+    counter = TokenCounter()
+    history, tokens = [], []
+    for turn, (question, tool, args) in enumerate(TURNS):
+        history.append(HumanMessage(question, id=f"h{turn}"))
+        history.append(AIMessage("", id=f"a{turn}", tool_calls=[{"name": tool.name, "args": args, "id": f"c{turn}"}]))
+        result = tool.invoke(args)
+        history.append(ToolMessage(encoder.encode(result) if encoded else result, name=tool.name, tool_call_id=f"c{turn}", id=f"t{turn}"))
+        # the history part of the prompt answering this turn's tool result; the static
+        # system prompt in front of it is the same either way
+        tokens.append(counter.count(elide_stale_results(history) if encoded else history))
+        history.append(AIMessage("Here is what I found.", id=f"r{turn}"))
+    return tokens
+
+
+def test_prompt_tokens_per_turn() -> None:
+    raw = _prompt_tokens(encoded=False)
+    compact = _prompt_tokens(encoded=True)
+
+    print("\nturn | history tokens, raw JSON | compact")
+    for turn, (before, after) in enumerate(zip(raw, compact), start=1):
+        print(f"{turn:4d} | {before:25d} | {after:7d}")
+
+    assert all(after < before for before, after in zip(raw, compact))
+    # and stale results are elided, so the history grows more slowly with the call
+    assert compact[-1] < 0.6 * raw[-1]
+    assert compact[-1] - compact[-2] < raw[-1] - raw[-2]
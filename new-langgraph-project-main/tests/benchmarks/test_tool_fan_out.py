@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+
+from agent.graph import new_booking_tools
+from agent.utils import db
+from agent.utils.availability import get_availability_index
+from agent.utils.tool_executor import ToolExecutor
+from agent.utils.tools import search_for_appointment
+
+# simulated round trip of a database on another host, per query
+QUERY_LATENCY = 0.002
+PROBES = 8
+LOOKUPS = 4
+REPEATS = 10
+
+
+def _fan_out_turn() -> AIMessage:
+    # the model searches for a doctor and probes several times in one turn
+    calls = [{"name": "search_for_doctor", "args": {"name": "Clara"}, "id": "search"}]
+    calls += [
+        {"name": "check_doctor_availability", "args": {"doctor_id": 3, "date": "2999-01-04", "time": f"{9 + i:02d}:00"}, "id": f"probe{i}"}
+        for i in range(PROBES)
+    ]
+    calls += [
+        {"name": "search_for_appointment", "args": {"appointment_id": 10 + i}, "id": f"lookup{i}"}
+        for i in range(LOOKUPS)
+    ]
+    return AIMessage("", tool_calls=calls)
+
+
+def _measure(node, monkeypatch) -> tuple:
+    queries = []
+
+    def round_trip(sql: str, rows: int, seconds: float) -> None:
+        queries.append(sql)
+        time.sleep(QUERY_LATENCY)
+
+    monkeypatch.setattr(db, "query_listeners", [round_trip])
+    state = {"messages": [_fan_out_turn()]}
+    timings = []
+    for _ in range(REPEATS):
+        # calendars loaded by earlier runs would answer probes without queries
+        get_availability_index().invalidate()
+        queries.clear()
+        start = time.perf_counter()
+        messages = node.invoke(state, {})["messages"]
+        timings.append(time.perf_counter() - start)
+    monkeypatch.setattr(db, "query_listeners", [])
+    return statistics.median(timings), len(queries), [(m.tool_call_id, m.content) for m in messages]
+
+
+def test_fan_out_tool_step(monkeypatch) -> None:
+    tools = [*new_booking_tools, search_for_appointment]
+    node_seconds, node_queries, expected = _measure(ToolNode(tools), monkeypatch)
+    executor_seconds, executor_queries, actual = _measure(ToolExecutor(tools), monkeypatch)
+
+    print(f"\n{len(expected)} tool calls | queries | p50 step (ms)")
+    print(f"{'ToolNode':13s} | {node_queries:7d} | {node_seconds * 1e3:13.1f}")
+    print(f"{'ToolExecutor':13s} | {executor_queries:7d} | {executor_seconds * 1e3:13.1f}")
+
+    assert actual == expected
+    # one query for the search, one for all probes, one for all lookups
+    assert executor_queries == 3 < node_queries
+    assert executor_seconds < node_seconds
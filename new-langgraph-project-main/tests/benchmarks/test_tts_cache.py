@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from agent.utils.audio_cache import AudioCache
+from agent.utils.tts import CachedTTSBackend, StubTTSBackend, stream_speech
+
+# simulated synthesis time per character, in the range of a streaming TTS service
+SECONDS_PER_CHAR = 0.0005
+# a day of replies: templated confirmations recur, details differ
+REPLIES = [
+    f"Appointment booked successfully. Your appointment ID is {1000 + i}." for i in range(5)
+] + [
+    "Appointment not found. Could you check the appointment ID?",
+    "Appointment cancelled successfully.",
+    "Doctor is not available at this date and time. Would another time suit you?",
+] * 3
+
+
+async def _first_frame_seconds(backend, text: str) -> float:
+    start = time.perf_counter()
+    first = None
+    async for _ in stream_speech(text, backend):
+        first = first if first is not None else time.perf_counter() - start
+    return first or 0.0
+
+
+def _replay(backend) -> list:
+    async def run() -> list:
+        return [await _first_frame_seconds(backend, reply) for reply in REPLIES]
+
+    return asyncio.run(run())
+
+
+def test_repeated_replies_skip_synthesis(tmp_path) -> None:
+    uncached_stub = StubTTSBackend(seconds_per_char=SECONDS_PER_CHAR)
+    uncached = _replay(uncached_stub)
+    cached_stub = StubTTSBackend(seconds_per_char=SECONDS_PER_CHAR)
+    backend = CachedTTSBackend(cached_stub, AudioCache(str(tmp_path)))
+    cold = _replay(backend)
+    warm = _replay(backend)
+
+    characters = [sum(len(text) for text in stub.requests) for stub in (uncached_stub, cached_stub)]
+    print("\nrun                | characters synthesized | mean first frame ms")
+    print(f"uncached, two days | {2 * characters[0]:22d} | {1e3 * sum(uncached) / len(uncached):19.2f}")
+    print(f"cached, two days   | {characters[1]:22d} | {1e3 * sum(cold + warm) / len(cold + warm):19.2f}")
+    print(f"cached, second day | {0:22d} | {1e3 * sum(warm) / len(warm):19.2f}")
+
+    # the cold run already reuses repeated sentences, and the warm run synthesizes nothing
+    assert characters[1] < 0.5 * characters[0]
+    assert len(cached_stub.requests) == len(set(cached_stub.requests))
+    assert sum(warm) < 0.2 * sum(uncached)
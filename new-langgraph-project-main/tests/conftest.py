@@ -4,3 +4,20 @@ import pytest
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+@pytest.fixture
+def hospital_db(tmp_path, monkeypatch):
+    """Point the tools at a scratch copy of the bundled appointments database."""
+    import shutil
+
+    from agent.utils import db
+
+    path = tmp_path / "appointments.db"
+    shutil.copy(db.DB_PATH, path)
+    monkeypatch.setenv("APPOINTMENTS_DB_PATH", str(path))
+    db.get_repository.cache_clear()
+    repository = db.get_repository()
+    yield repository
+    repository.pool.close_all()
+    db.get_repository.cache_clear()
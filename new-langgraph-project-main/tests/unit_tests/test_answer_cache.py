@@ -0,0 +1,81 @@
+import numpy as np
+
+from agent.utils.answer_cache import AnswerCacheMetrics, SemanticAnswerCache
+
+
+def _unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_duplicates_hit_and_distant_questions_miss() -> None:
+    metrics = AnswerCacheMetrics()
+    cache = SemanticAnswerCache(capacity=4, threshold=0.9, metrics=metrics)
+    cache.put("opening hours?", _unit(1, 0, 0), "8am to 10pm", "v1", cost_seconds=2.0)
+
+    hit = cache.lookup(_unit(1, 0.1, 0), "v1")
+    assert hit is not None and hit.answer == "8am to 10pm"
+    assert cache.lookup(_unit(0, 1, 0), "v1") is None
+
+    snapshot = metrics.snapshot()
+    assert (snapshot["hits"], snapshot["hit_rate"]) == (1.0, 0.5)
+    assert 1.9 < snapshot["latency_saved_seconds"] <= 2.0
+
+
+def test_ttl_lru_and_version_invalidation() -> None:
+    cache = SemanticAnswerCache(capacity=2, threshold=0.9, metrics=AnswerCacheMetrics())
+    cache.put("a", _unit(1, 0, 0), "A", "v1")
+    cache.put("b", _unit(0, 1, 0), "B", "v1")
+    assert cache.lookup(_unit(1, 0, 0), "v1") is not None  # "a" is now the most recent
+    cache.put("c", _unit(0, 0, 1), "C", "v1")
+    assert cache.lookup(_unit(0, 1, 0), "v1") is None
+    assert cache.lookup(_unit(1, 0, 0), "v1").answer == "A"
+
+    # a new document version drops every entry
+    assert cache.lookup(_unit(1, 0, 0), "v2") is None
+    assert len(cache) == 0
+
+    expiring = SemanticAnswerCache(ttl_seconds=0.0, metrics=AnswerCacheMetrics())
+    expiring.put("a", _unit(1, 0, 0), "A", "v1")
+    assert expiring.lookup(_unit(1, 0, 0), "v1") is None
+
+
+def test_rag_cache_miss_embeds_the_question_once_off_the_event_loop(monkeypatch) -> None:
+    import asyncio
+    import importlib
+    import threading
+
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    # the package re-exports the compiled graph under the module's name
+    graph = importlib.import_module("agent.graph")
+    embedded_on = []
+
+    class FakeIndex:
+        hospital_id = "default"
+        version = "v1"
+
+        def embed_query(self, text: str) -> np.ndarray:
+            embedded_on.append(threading.current_thread())
+            return _unit(1, 0, 0)
+
+        def as_retriever(self, **kwargs):
+            class Retriever:
+                async def ainvoke(self, question):
+                    return []
+
+            return Retriever()
+
+    class FakeLLM:
+        async def ainvoke(self, prompt):
+            return AIMessage("8am to 10pm")
+
+    cache = SemanticAnswerCache(capacity=2, threshold=0.9, metrics=AnswerCacheMetrics())
+    monkeypatch.setattr(graph, "_hospital_index", lambda hospital_id: FakeIndex())
+    monkeypatch.setattr(graph, "_answer_cache", lambda hospital_id: cache)
+    monkeypatch.setattr(graph, "get_bound_llm", lambda name: FakeLLM())
+
+    state = {"messages": [HumanMessage("opening hours?")]}
+    assert asyncio.run(graph.arag_node(state, {}))["messages"].content == "8am to 10pm"
+    assert len(embedded_on) == 1 and embedded_on[0] is not threading.main_thread()
+    assert cache.lookup(_unit(1, 0, 0), "v1").answer == "8am to 10pm"
@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+from agent.utils.audio_cache import AudioCache, audio_cache_listeners, cache_key
+from agent.utils.tts import CachedTTSBackend, StubTTSBackend, drain_sink, stream_speech
+
+
+def _speak(backend, text: str) -> int:
+    return asyncio.run(drain_sink(stream_speech(text, backend)))
+
+
+def _voice(backend: CachedTTSBackend) -> tuple:
+    return backend.voice_id, backend.model_id, backend.output_format
+
+
+def test_keys_normalize_text_and_separate_voices() -> None:
+    key = cache_key("Appointment  booked\nsuccessfully.", "voice", "model", "mp3")
+    assert key == cache_key(" Appointment booked successfully. ", "voice", "model", "mp3")
+    assert key != cache_key("Appointment booked successfully.", "voice", "model", "pcm")
+    assert key != cache_key("appointment booked successfully.", "voice", "model", "mp3")
+
+
+def test_repeated_phrases_are_served_from_disk(tmp_path) -> None:
+    stub = StubTTSBackend(frame_size=8)
+    backend = CachedTTSBackend(stub, AudioCache(str(tmp_path)))
+    lookups = []
+
+    def listener(hit: bool, characters: int) -> None:
+        lookups.append(hit)
+
+    audio_cache_listeners.append(listener)
+    try:
+        reply = "Appointment booked successfully. Your appointment ID is 15."
+        assert _speak(backend, reply) == len(reply) - 1
+        assert _speak(backend, "Appointment booked successfully. Your appointment ID is 16.") == len(reply) - 1
+    finally:
+        audio_cache_listeners.remove(listener)
+    # the shared sentence was synthesized once
+    assert stub.requests == ["Appointment booked successfully.", "Your appointment ID is 15.", "Your appointment ID is 16."]
+    assert lookups == [False, False, True, False]
+
+    # a new process finds the cached audio
+    frames = list(AudioCache(str(tmp_path)).read(cache_key("Appointment booked successfully.", *_voice(backend)), 10))
+    assert b"".join(frames) == b"Appointment booked successfully."
+    assert [len(frame) for frame in frames] == [10, 10, 10, 2]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path) -> None:
+    cache = AudioCache(str(tmp_path), max_bytes=25)
+    cache.write("a", b"x" * 10)
+    cache.write("b", b"y" * 10)
+    assert cache.read("a") is not None
+    cache.write("c", b"z" * 10)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.total_bytes == 20
+    assert sorted(os.listdir(tmp_path)) == ["a.audio", "c.audio"]
+    # an entry removed behind the cache's back is a miss
+    os.remove(tmp_path / "a.audio")
+    assert cache.read("a") is None
+    assert cache.total_bytes == 10
+
+
+def test_workers_sharing_a_directory_see_each_others_entries(tmp_path) -> None:
+    first = AudioCache(str(tmp_path), max_bytes=25)
+    second = AudioCache(str(tmp_path), max_bytes=25)
+    first.write("a", b"x" * 10)
+    # written by another worker after this one indexed the directory
+    assert "a" in second and second.read("b") is None
+    assert b"".join(second.read("a")) == b"x" * 10
+    first.write("b", b"y" * 10)
+    second.write("c", b"z" * 10)
+    # the bound holds for the directory, not for each worker's own writes
+    assert sorted(os.listdir(tmp_path)) == ["b.audio", "c.audio"]
+    assert second.total_bytes == 20
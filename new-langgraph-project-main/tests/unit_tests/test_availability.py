@@ -0,0 +1,80 @@
+import json
+from datetime import date, datetime
+
+from agent.utils.availability import AvailabilityIndex, get_availability_index, slot_of, time_of
+from agent.utils.booking import BookingEngine
+from agent.utils.tools import check_doctor_availability, find_available_slots
+
+NOW = datetime(2999, 5, 1, 7, 0)
+DAY = date(2999, 5, 1)
+
+
+def test_slot_round_trip() -> None:
+    assert slot_of("08:00") == 0
+    assert time_of(slot_of("10:30")) == "10:30"
+    assert slot_of("10:45") == slot_of("10:30")
+    assert slot_of("22:00") is None
+    assert slot_of("7:59") is None
+
+
+def test_index_follows_engine_writes(hospital_db) -> None:
+    index = AvailabilityIndex(hospital_db)
+    engine = BookingEngine(hospital_db, index)
+    assert index.next_free_slots([1], DAY, DAY, 2, NOW) == [(1, "2999-05-01", "08:00"), (1, "2999-05-01", "08:30")]
+
+    booked = engine.reserve(1, 1, "2999-05-01", "08:00")
+    assert not index.is_free(1, "2999-05-01", "08:00")
+    assert index.next_free_slots([1], DAY, DAY, 1, NOW) == [(1, "2999-05-01", "08:30")]
+
+    engine.move(booked.appointment_id, "2999-05-01", "09:00")
+    assert index.is_free(1, "2999-05-01", "08:00")
+    assert not index.is_free(1, "2999-05-01", "09:00")
+
+    engine.cancel(booked.appointment_id)
+    assert index.is_free(1, "2999-05-01", "09:00")
+
+
+def test_today_hides_elapsed_slots(hospital_db) -> None:
+    index = AvailabilityIndex(hospital_db)
+    slots = index.next_free_slots([1], DAY, DAY, 1, datetime(2999, 5, 1, 21, 10))
+    assert slots == [(1, "2999-05-01", "21:30")]
+
+
+def test_find_available_slots_by_specialization(hospital_db) -> None:
+    result = json.loads(find_available_slots.invoke(
+        {"specialization": "pediatrics", "start_date": "2999-05-01", "limit": 3}
+    ))
+    assert result["success"]
+    assert [slot["doctor_name"] for slot in result["slots"]] == ["Dr. Clara Lee"] * 3
+    assert not json.loads(find_available_slots.invoke({}))["success"]
+
+
+def test_reload_racing_a_booking_is_not_kept(hospital_db) -> None:
+    index = AvailabilityIndex(hospital_db)
+    load = hospital_db.booked_slots
+
+    def booked_during_load(doctor_id, since):
+        rows = load(doctor_id, since)
+        # the booking commits after the snapshot was read
+        index.mark_booked(doctor_id, "2999-05-01", "08:00")
+        return rows
+
+    hospital_db.booked_slots = booked_during_load
+    try:
+        index.warm([1])
+    finally:
+        del hospital_db.booked_slots
+    # the stale snapshot is not cached, so the next lookup reloads
+    assert index.cached_is_free(1, "2999-05-01", "08:00") is None
+
+
+def test_availability_is_confirmed_against_the_database(hospital_db) -> None:
+    index = get_availability_index()
+    index.invalidate()
+    index.warm([1])
+    # booked by another worker: this process's calendar has not seen it
+    hospital_db.create_appointment(1, 1, "2999-05-01", "10:00")
+    assert index.cached_is_free(1, "2999-05-01", "10:00")
+    result = json.loads(check_doctor_availability.invoke({"doctor_id": 1, "date": "2999-05-01", "time": "10:00"}))
+    assert not result["available"]
+    index.invalidate()
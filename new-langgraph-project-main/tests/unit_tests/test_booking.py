@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from agent.utils.availability import AvailabilityIndex
+from agent.utils.booking import (
+    INVALID_FORMAT,
+    NOT_FOUND,
+    OUTSIDE_HOURS,
+    PAST_TIME,
+    SLOT_TAKEN,
+    BookingEngine,
+    validate_slot,
+)
+from agent.utils.db import SELECT_SLOT_BOOKED
+from agent.utils.tools import reschedule_appointment
+
+
+def test_concurrent_reservations_book_a_slot_once(hospital_db) -> None:
+    engine = BookingEngine(hospital_db)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda patient: engine.reserve(patient, 1, "2999-03-01", "10:00"), range(1, 17)))
+
+    assert sum(result.success for result in results) == 1
+    assert {result.error for result in results if not result.success} == {SLOT_TAKEN}
+
+
+def test_move_reports_structured_errors(hospital_db) -> None:
+    engine = BookingEngine(hospital_db)
+    first = engine.reserve(1, 2, "2999-03-02", "09:00")
+    second = engine.reserve(2, 2, "2999-03-02", "10:00")
+
+    assert engine.move(second.appointment_id, "2999-03-02", "09:00").error == SLOT_TAKEN
+    assert engine.move(second.appointment_id, "2999-03-02", "11:00").success
+    assert engine.move(10_000, "2999-03-02", "12:00").error == NOT_FOUND
+    assert engine.cancel(first.appointment_id).success
+
+
+def test_move_frees_the_old_slot_in_the_availability_index(hospital_db) -> None:
+    index = AvailabilityIndex(hospital_db)
+    engine = BookingEngine(hospital_db, index)
+    booked = engine.reserve(1, 2, "2999-03-03", "09:00")
+    assert not index.is_free(2, "2999-03-03", "09:00")
+
+    assert engine.move(booked.appointment_id, "2999-03-03", "10:30").success
+    assert index.is_free(2, "2999-03-03", "09:00") and not index.is_free(2, "2999-03-03", "10:30")
+    assert hospital_db.is_slot_booked(2, "2999-03-03", "10:30")
+
+
+def test_reschedule_tool_validates_the_new_slot(hospital_db) -> None:
+    booked = BookingEngine(hospital_db).reserve(1, 2, "2999-03-04", "09:00")
+    moved = json.loads(reschedule_appointment.invoke({"appointment_id": booked.appointment_id, "date": "2000-01-01", "time": "09:00"}))
+    assert moved["error"] == PAST_TIME
+    moved = json.loads(reschedule_appointment.invoke({"appointment_id": booked.appointment_id, "date": "2999-03-04", "time": "23:30"}))
+    assert moved["error"] == OUTSIDE_HOURS
+    assert hospital_db.get_appointment(booked.appointment_id)["time"] == "09:00"
+
+
+def test_validate_slot() -> None:
+    now = datetime(2025, 1, 1, 12, 0)
+    assert validate_slot("2025-01-02", "09:30", now) is None
+    assert validate_slot("2024-12-31", "09:30", now).error == PAST_TIME
+    assert validate_slot("2025-01-02", "23:00", now).error == OUTSIDE_HOURS
+
+
+def test_slot_lookup_uses_index(hospital_db) -> None:
+    plan = hospital_db.pool.connection().execute(
+        "EXPLAIN QUERY PLAN " + SELECT_SLOT_BOOKED, (1, "2999-01-01", "10:00", -1)
+    ).fetchall()
+    assert "ux_appointment_doctor_slot" in " ".join(row[-1] for row in plan)
+
+
+def test_unpadded_slots_are_stored_in_one_form(hospital_db) -> None:
+    engine = BookingEngine(hospital_db)
+    first = engine.reserve(1, 3, "2999-3-5", "9:00")
+    assert first.success
+    assert hospital_db.get_appointment(first.appointment_id)["date"] == "2999-03-05"
+    assert hospital_db.get_appointment(first.appointment_id)["time"] == "09:00"
+
+    second = engine.reserve(2, 3, "2999-03-05", "09:00")
+    assert second.error == SLOT_TAKEN
+    assert hospital_db.is_slot_booked(3, "2999-03-05", "9:00")
+    assert hospital_db.booked_slots_among([(3, "2999-3-5", "09:00")]) == {(3, "2999-03-05", "09:00")}
+    assert engine.reserve(2, 3, "2999-03-05", "9 o'clock").error == INVALID_FORMAT
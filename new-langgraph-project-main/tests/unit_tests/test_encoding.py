@@ -0,0 +1,65 @@
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agent.utils.encoding import (
+    ToolResultEncoder,
+    elide_stale_results,
+    get_result_encoder,
+)
+from agent.utils.tokens import estimate_text_tokens
+
+
+def _doctors(count: int) -> str:
+    return json.dumps({"success": True, "next_offset": None, "doctors": [
+        {"Doctor_ID": i, "Doctor_Name": f"Dr. Name {i}", "Specialization": "Cardiology", "Location": "Chicago", "Rating": 4.5}
+        for i in range(count)
+    ]})
+
+
+def test_results_are_projected_and_compact() -> None:
+    found = json.dumps({"success": True, "patients": [{"patient_id": 2, "name": "John | Doe", "age": 40, "phone": "5550100"}]})
+    assert get_result_encoder("cancel_booking_assistant").encode(found) == "patients[1] patient_id|name|age\n2|John / Doe|40"
+
+    appointment = json.dumps({"success": True, "appointment": {
+        "appointment_id": 15, "date": "2025-07-30", "time": "17:00", "doctor_id": 3, "patient_id": 2,
+    }})
+    assert get_result_encoder("reschedule_booking_assistant").encode(appointment) == (
+        "appointment: appointment_id=15, date=2025-07-30, time=17:00, doctor_id=3, patient_id=2"
+    )
+    failed = json.dumps({"success": False, "message": "Appointment not found."})
+    assert get_result_encoder("cancel_booking_assistant").encode(failed) == "success: false\nmessage: Appointment not found."
+
+    doctors = _doctors(5)
+    encoded = get_result_encoder("new_booking_assistant").encode(doctors)
+    assert encoded.splitlines()[0] == "doctors[5] Doctor_ID|Doctor_Name|Specialization|Location|Rating"
+    assert estimate_text_tokens(encoded) < estimate_text_tokens(doctors) / 2
+
+
+def test_results_are_cut_at_rows_to_the_budget() -> None:
+    encoder = ToolResultEncoder(max_tokens=120)
+    encoded = encoder.encode(_doctors(20))
+    lines = encoded.splitlines()
+    assert estimate_text_tokens(encoded) <= 120
+    assert lines[-1].startswith(f"({20 - (len(lines) - 2)} more results")
+    assert lines[-2].startswith(f"{len(lines) - 3}|Dr. Name")
+    # text that is not JSON is cut too
+    assert encoder.encode("word " * 500).endswith("…(truncated)")
+    assert encoder.encode("short") == "short"
+
+
+def test_stale_tool_results_are_elided_from_the_prompt() -> None:
+    history = []
+    for turn in range(3):
+        history += [
+            HumanMessage(f"turn {turn}", id=f"h{turn}"),
+            AIMessage("", id=f"a{turn}", tool_calls=[{"name": "search_for_doctor", "args": {}, "id": f"c{turn}"}]),
+            ToolMessage(_doctors(3), name="search_for_doctor", tool_call_id=f"c{turn}", id=f"t{turn}"),
+        ]
+    prompt = elide_stale_results(history, keep_turns=2)
+    assert [m.id for m in prompt] == [m.id for m in history]
+    assert prompt[2].content.startswith("[search_for_doctor result from an earlier turn elided")
+    assert prompt[5].content == prompt[8].content == _doctors(3)
+    # the state itself is not changed
+    assert history[2].content == _doctors(3)
+    assert elide_stale_results(history, keep_turns=3) == history
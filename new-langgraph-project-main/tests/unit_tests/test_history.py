@@ -0,0 +1,52 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from agent.utils.checkpoint import sqlite_checkpointer
+from agent.utils.history import compaction_update, should_compact, split_history
+
+
+def _conversation(turns: int) -> list:
+    messages = []
+    for turn in range(turns):
+        messages += [
+            HumanMessage(f"question {turn}", id=f"h{turn}"),
+            AIMessage("", id=f"a{turn}", tool_calls=[{"name": "lookup", "args": {}, "id": f"c{turn}"}]),
+            ToolMessage("result", id=f"t{turn}", tool_call_id=f"c{turn}"),
+            AIMessage(f"answer {turn}", id=f"r{turn}"),
+        ]
+    return messages
+
+
+def test_split_keeps_tool_results_with_their_call() -> None:
+    older, recent = split_history(_conversation(5), keep_exchanges=2)
+    assert recent[0].id == "h3"
+    assert [m.id for m in older][-4:] == ["h2", "a2", "t2", "r2"]
+    assert split_history(_conversation(2), keep_exchanges=2) == ([], _conversation(2))
+
+
+def test_compaction_thresholds_and_update() -> None:
+    assert not should_compact(_conversation(4), keep_exchanges=2, max_tokens=10_000)
+    assert should_compact(_conversation(5), keep_exchanges=2, max_tokens=10_000)
+    assert should_compact(_conversation(3), keep_exchanges=2, max_tokens=10)
+
+    older, _ = split_history(_conversation(5), keep_exchanges=2)
+    update = compaction_update("caller asked five questions", older)
+    assert update["summary"] == "caller asked five questions"
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+
+
+def test_checkpoints_survive_restart(tmp_path) -> None:
+    path = str(tmp_path / "checkpoints.db")
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", lambda state: {"messages": [AIMessage(f"seen {len(state['messages'])}")]})
+    builder.add_edge(START, "echo")
+    config = {"configurable": {"thread_id": "call-1"}}
+
+    builder.compile(checkpointer=sqlite_checkpointer(path)).invoke({"messages": [HumanMessage("hi")]}, config)
+
+    # a fresh checkpointer on the same file resumes the thread, on the async path too
+    resumed = builder.compile(checkpointer=sqlite_checkpointer(path))
+    result = asyncio.run(resumed.ainvoke({"messages": [HumanMessage("again")]}, config))
+    assert result["messages"][-1].content == "seen 3"
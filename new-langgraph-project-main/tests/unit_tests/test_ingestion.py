@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agent.utils import vectorstore
+from agent.utils.ingestion import EmbeddingCache, EmbeddingPipeline
+from agent.utils.knowledge_base import SHARED, load_or_build_knowledge_base
+from agent.utils.llm import HashingEmbeddings, get_embedding_model
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Counts embedded texts, tracks concurrent batches and fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0) -> None:
+        super().__init__(size=8)
+        self._state = {"texts": 0, "calls": 0, "active": 0, "peak": 0, "failures": failures}
+        self._lock = threading.Lock()
+        self._delay = delay
+
+    def embed_documents(self, texts):
+        with self._lock:
+            state = self._state
+            state["calls"] += 1
+            if state["failures"]:
+                state["failures"] -= 1
+                raise RuntimeError("transient embedding error")
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(self._delay)
+        with self._lock:
+            state["active"] -= 1
+            state["texts"] += len(texts)
+        return super().embed_documents(texts)
+
+
+def _chunks(texts):
+    return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+
+
+def test_only_new_chunks_are_embedded() -> None:
+    cache = EmbeddingCache()
+    embedding = CountingEmbedding()
+    first = EmbeddingPipeline(embedding, cache, batch_size=2).run(_chunks(["a", "b", "c", "a"]))
+    assert (first.stats.chunks, first.stats.embedded, first.stats.cached) == (4, 3, 0)
+    assert np.array_equal(first.vectors[0], first.vectors[3])
+    assert len(cache) == 3
+
+    second = EmbeddingPipeline(embedding, cache, batch_size=2).run(_chunks(["a", "b", "d"]))
+    assert (second.stats.embedded, second.stats.cached) == (1, 2)
+    assert embedding._state["texts"] == 4
+    assert np.array_equal(second.vectors[1], first.vectors[1])
+    assert second.metadatas == [{"page": 0}, {"page": 1}, {"page": 2}]
+
+
+def test_batches_are_bounded_and_retried_in_isolation() -> None:
+    embedding = CountingEmbedding(failures=2, delay=0.02)
+    pipeline = EmbeddingPipeline(embedding, batch_size=3, max_concurrency=2, retry_backoff=0.0)
+    result = pipeline.run(_chunks([f"chunk {i}" for i in range(20)]))
+    assert result.vectors.shape == (20, 8)
+    assert (result.stats.batches, result.stats.retries) == (7, 2)
+    assert embedding._state["peak"] <= 2
+
+    with pytest.raises(RuntimeError):
+        EmbeddingPipeline(CountingEmbedding(failures=5), max_retries=1, retry_backoff=0.0).run(_chunks(["x"]))
+
+
+def test_rebuilding_the_index_reuses_cached_embeddings(tmp_path) -> None:
+    pdf = str(tmp_path / "services.pdf")
+    with open(vectorstore.DOCUMENT_PATH, "rb") as src, open(pdf, "wb") as dst:
+        dst.write(src.read())
+    index_dir = str(tmp_path / "index")
+    embedding = CountingEmbedding()
+    first = load_or_build_knowledge_base({SHARED: [pdf]}, index_dir, embedding)
+    embedded = embedding._state["texts"]
+    assert embedded == len(first) and first.metadatas[0]["page"] == 0
+
+    # a new revision of the PDF with unchanged text costs no embedding calls
+    with open(pdf, "ab") as f:
+        f.write(b"\n% revised\n")
+    rebuilt = load_or_build_knowledge_base({SHARED: [pdf]}, index_dir, embedding)
+    assert embedding._state["texts"] == embedded
+    assert rebuilt.version != first.version
+    assert np.allclose(rebuilt.vectors, first.vectors)
+
+
+def test_embedding_backend_is_selected_from_the_environment(monkeypatch) -> None:
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    assert isinstance(get_embedding_model(), HashingEmbeddings)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "bogus")
+    with pytest.raises(ValueError):
+        get_embedding_model()
@@ -0,0 +1,81 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils.intent import (
+    CANCEL_BOOKING,
+    EMBEDDING_TIER,
+    GENERAL,
+    LLM_TIER,
+    NEW_BOOKING,
+    RESCHEDULE_BOOKING,
+    RULE_TIER,
+    IntentClassifier,
+    RouterMetrics,
+)
+
+
+def test_rules_and_similarity_tiers() -> None:
+    classifier = IntentClassifier()
+    assert classifier.classify("Please cancel my appointment").intent == CANCEL_BOOKING
+    assert classifier.classify("Can you book me in with Dr. Smith?").tier == RULE_TIER
+    assert classifier.classify("What are your visiting hours?").intent == GENERAL
+
+    decision = classifier.classify("I would like an appointment next week")
+    assert (decision.intent, decision.tier) == (NEW_BOOKING, EMBEDDING_TIER)
+
+
+def test_unsure_messages_fall_back_to_llm() -> None:
+    classifier = IntentClassifier()
+    assert classifier.classify("hello").tier == LLM_TIER
+    assert classifier.classify("yes, 10am works").intent is None
+    assert classifier.classify_messages([HumanMessage("cancel my booking"), AIMessage("Sure")]).intent is None
+
+
+def test_replies_within_a_flow_go_to_the_llm_router() -> None:
+    classifier = IntentClassifier()
+    reply = HumanMessage("I'd like to see a doctor on Thursday")
+    assert classifier.classify_messages([AIMessage("Hello, how can I help?"), reply]).intent == NEW_BOOKING
+    rescheduling = [
+        HumanMessage("I need to reschedule my appointment"),
+        AIMessage("Which day suits you?", name=RESCHEDULE_BOOKING),
+        reply,
+    ]
+    assert classifier.classify_messages(rescheduling).tier == LLM_TIER
+    assert classifier.classify_messages(rescheduling[:-1] + [HumanMessage("Thursday works")]).tier == LLM_TIER
+
+
+def test_explicit_switch_within_a_flow_is_fast_routed() -> None:
+    classifier = IntentClassifier()
+    booking = [
+        HumanMessage("I want to book an appointment"),
+        AIMessage("Which doctor would you like to see?", name=NEW_BOOKING),
+        HumanMessage("actually, cancel my appointment instead"),
+    ]
+    decision = classifier.classify_messages(booking)
+    assert (decision.intent, decision.tier) == (CANCEL_BOOKING, RULE_TIER)
+
+    # looser rules also match answers to the flow's questions
+    booking[-1] = HumanMessage("I can't make it on Monday, is Tuesday free?")
+    assert classifier.classify_messages(booking).tier == LLM_TIER
+
+
+def test_metrics_report_latency_saved() -> None:
+    metrics = RouterMetrics()
+    seen = []
+    metrics.listeners.append(lambda tier, seconds: seen.append(tier))
+    metrics.record(LLM_TIER, 0.8)
+    metrics.record(RULE_TIER, 0.001)
+    metrics.record(EMBEDDING_TIER, 0.001)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["fast_path_rate"] == 2 / 3
+    assert abs(snapshot["latency_saved_seconds"] - 1.598) < 1e-9
+    assert seen == [LLM_TIER, RULE_TIER, EMBEDDING_TIER]
+
+
+def test_reschedule_requests_have_their_own_intent() -> None:
+    classifier = IntentClassifier()
+    assert classifier.classify("I need to reschedule my appointment").intent == RESCHEDULE_BOOKING
+    assert classifier.classify("Can we move my booking to Friday?").tier == RULE_TIER
+    assert classifier.classify("Can I schedule an appointment?").intent == NEW_BOOKING
+    # rules of two intents match, so the rule tier stays out of it
+    assert classifier.classify("cancel my appointment and move the booking").tier != RULE_TIER
@@ -0,0 +1,108 @@
+import shutil
+import time
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agent.utils import knowledge_base
+from agent.utils.knowledge_base import (
+    DEFAULT_HOSPITAL,
+    SHARED,
+    IVFIndex,
+    KnowledgeBase,
+    discover_sources,
+    load_or_build_knowledge_base,
+)
+from agent.utils.vectorstore import DOCUMENT_PATH
+
+
+def _unit(rows: np.ndarray) -> np.ndarray:
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _synthetic(namespaces: dict, dim: int = 16, seed: int = 0) -> KnowledgeBase:
+    rng = np.random.default_rng(seed)
+    texts, ranges, blocks = [], {}, []
+    for name, count in namespaces.items():
+        ranges[name] = (len(texts), len(texts) + count)
+        texts += [f"{name}-{i}" for i in range(count)]
+        blocks.append(_unit(rng.normal(size=(count, dim))))
+    vectors = np.concatenate(blocks)
+    return KnowledgeBase(texts, [{} for _ in texts], vectors, ranges, DeterministicFakeEmbedding(size=dim), "v1")
+
+
+def test_hospitals_search_their_own_and_shared_documents() -> None:
+    kb = _synthetic({SHARED: 50, "north": 50, "south": 50})
+    north, south = kb.for_hospital("north"), kb.for_hospital("south")
+    query = kb.vectors[kb.namespaces["north"][0] + 7]
+
+    hits = north.similarity_search_with_score_by_vector(query, k=5)
+    assert hits[0][0].page_content == "north-7"
+    assert hits[0][1] > 0.999 and [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+    assert all(not doc.page_content.startswith("south") for doc, _ in hits)
+    assert all(doc.page_content.split("-")[0] in (SHARED, "south") for doc in south.similarity_search_by_vector(query, k=10))
+    # an unknown hospital still sees the shared documents, through the one default view
+    assert {doc.page_content.split("-")[0] for doc in kb.for_hospital("east").similarity_search_by_vector(query, k=10)} == {SHARED}
+    assert north.version != south.version and kb.for_hospital("north") is north
+
+
+def test_hospital_ids_from_callers_do_not_grow_state() -> None:
+    kb = _synthetic({SHARED: 10, "north": 10})
+    views = {kb.for_hospital(f"caller-{i}") for i in range(1000)} | {kb.for_hospital(SHARED)}
+    assert [view.hospital_id for view in views] == [DEFAULT_HOSPITAL]
+    assert kb.for_hospital("north").hospital_id == "north"
+    assert len(kb._views) == 2
+
+
+def test_ivf_index_finds_nearest_neighbours() -> None:
+    rng = np.random.default_rng(1)
+    centers = _unit(rng.normal(size=(64, 64)))
+    vectors = _unit(centers[rng.integers(0, 64, 20000)] + 0.15 * rng.normal(size=(20000, 64)))
+    kb = KnowledgeBase(
+        [str(i) for i in range(20000)], [{} for _ in range(20000)], vectors, {SHARED: (0, 20000)},
+        DeterministicFakeEmbedding(size=64), ivf_min_chunks=10000,
+    )
+    queries = _unit(vectors[:50] + 0.05 * rng.normal(size=(50, 64)))
+    recall = 0
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:4].tolist())
+        recall += len(exact & {int(doc.page_content) for doc, _ in kb.search(query, SHARED, k=4)})
+    assert isinstance(kb._ivf[SHARED], IVFIndex)
+    assert recall / (4 * len(queries)) >= 0.9
+
+    start = time.perf_counter()
+    for query in queries:
+        kb.search(query, SHARED, k=4)
+    assert (time.perf_counter() - start) / len(queries) < 0.01
+
+
+def test_knowledge_base_is_built_per_namespace_and_reloaded(tmp_path, monkeypatch) -> None:
+    root = tmp_path / "knowledge"
+    for namespace in (SHARED, "north"):
+        (root / namespace).mkdir(parents=True)
+        shutil.copy(DOCUMENT_PATH, root / namespace / "services.pdf")
+    (root / "empty").mkdir()
+    sources = discover_sources(str(root))
+    assert list(sources) == ["north", SHARED]
+
+    embedding = DeterministicFakeEmbedding(size=16)
+    index_dir = str(tmp_path / "index")
+    built = load_or_build_knowledge_base(sources, index_dir, embedding)
+    start, stop = built.namespaces["north"]
+    assert stop - start == len(built) // 2
+    assert built.metadatas[start]["namespace"] == "north"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("knowledge base should not be rebuilt")
+
+    monkeypatch.setattr(knowledge_base.KnowledgeBase, "build", fail)
+    loaded = load_or_build_knowledge_base(sources, index_dir, embedding)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.version == built.version
+    # both namespaces hold the same document, so its best chunk comes back once from each
+    hits = loaded.for_hospital("north").similarity_search("emergency", k=2)
+    assert {doc.metadata["namespace"] for doc in hits} == {"north", SHARED}
+    assert hits[0].page_content == hits[1].page_content
+    # agents retrieve through a plain retriever over the hospital's view
+    retrieved = loaded.for_hospital("north").as_retriever(search_kwargs={"k": 2}).invoke("emergency")
+    assert [doc.page_content for doc in retrieved] == [doc.page_content for doc in hits]
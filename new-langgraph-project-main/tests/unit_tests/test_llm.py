@@ -0,0 +1,29 @@
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from agent.utils.llm import BoundLLMRegistry
+
+
+class BindableFakeChatModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[tool.name for tool in tools])
+
+
+def test_registry_builds_each_binding_once() -> None:
+    from agent.graph import cancel_booking_tools, new_booking_tools
+
+    builds = []
+
+    def factory():
+        builds.append(1)
+        return BindableFakeChatModel(messages=iter([]))
+
+    registry = BoundLLMRegistry(factory)
+    first = registry.get("new_booking_assistant", new_booking_tools)
+    assert registry.get("new_booking_assistant", new_booking_tools) is first
+    assert registry.get("cancel_booking_assistant", cancel_booking_tools) is not first
+    assert len(builds) == 2
+
+    registry.invalidate("new_booking_assistant")
+    assert registry.get("new_booking_assistant", new_booking_tools) is not first
+    assert registry.get("cancel_booking_assistant", cancel_booking_tools) is not None
+    assert (registry.hits, registry.misses) == (2, 3)
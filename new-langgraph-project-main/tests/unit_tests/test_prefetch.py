@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils import db
+from agent.utils.availability import get_availability_index
+from agent.utils.prefetch import (
+    PREFETCH_THREADS,
+    PREFETCH_WAIT_SECONDS,
+    PrefetchCache,
+    _prefetch_executor,
+    extract_hints,
+    get_prefetch_cache,
+    prefetch_in_background,
+    prefetch_turn,
+)
+from agent.utils.tools import (
+    check_doctor_availability,
+    find_available_slots,
+    search_for_doctor,
+)
+
+CONFIG = {"configurable": {"thread_id": "thread-1"}}
+
+
+def test_extract_hints() -> None:
+    hints = extract_hints("Can I see dr. Clara Lee or a heart specialist for my son next Monday?")
+    assert hints.names == ("Clara Lee",)
+    assert hints.specializations == ("Cardiology", "Pediatrics")
+    assert not extract_hints("I need to see a doctor for my appointment")
+
+
+def test_prefetch_cache_expires_and_scopes_by_conversation() -> None:
+    cache = PrefetchCache(ttl_seconds=0.0)
+    page = {"doctors": [{"Doctor_ID": 3, "Doctor_Name": "Dr. Clara Lee"}], "next_offset": None}
+    cache.store("a", page, "Clara Lee")
+    assert cache.search("a", "dr. clara  lee") is None
+
+    cache = PrefetchCache()
+    cache.store("a", page, "Clara Lee")
+    assert cache.search("a", "dr. clara  lee", limit=1) == page
+    assert cache.search("b", "Clara Lee") is None
+    assert cache.doctor("a", 3)["Doctor_Name"] == "Dr. Clara Lee"
+
+
+def test_booking_tools_answer_from_prefetched_data(hospital_db) -> None:
+    get_prefetch_cache.cache_clear()
+    get_availability_index().invalidate()
+    messages = [HumanMessage("I'd like to book an appointment with Dr. Clara Lee.")]
+    assert prefetch_turn([*messages, AIMessage("Sure.")], "thread-1") == []
+    assert prefetch_turn(messages, "thread-1") == [3]
+
+    queries = []
+    db.query_listeners.append(lambda sql, rows, seconds: queries.append(sql))
+    try:
+        found = json.loads(search_for_doctor.invoke({"name": "Clara Lee"}, CONFIG))
+        slots = json.loads(find_available_slots.invoke({"doctor_id": 3, "start_date": "2999-01-04", "limit": 2}, CONFIG))
+        assert queries == []
+        # a free slot in the calendar is confirmed against the database
+        free = json.loads(check_doctor_availability.invoke({"doctor_id": 3, "date": "2999-01-04", "time": "08:00"}, CONFIG))
+        assert len(queries) == 1
+
+        # another conversation, or a filtered search, still goes to the database
+        json.loads(search_for_doctor.invoke({"name": "Clara Lee"}, {"configurable": {"thread_id": "thread-2"}}))
+        json.loads(search_for_doctor.invoke({"name": "Clara Lee", "location": "Chicago"}, CONFIG))
+        assert len(queries) == 3
+    finally:
+        db.query_listeners.clear()
+        get_prefetch_cache.cache_clear()
+
+    assert [d["Doctor_ID"] for d in found["doctors"]] == [3]
+    assert [slot["time"] for slot in slots["slots"]] == ["08:00", "08:30"]
+    assert free["available"]
+
+
+def test_tools_wait_for_a_running_background_prefetch(hospital_db) -> None:
+    get_prefetch_cache.cache_clear()
+    get_availability_index().invalidate()
+    assert prefetch_in_background([HumanMessage("Is there a slot tomorrow?")], "thread-1") is None
+    future = prefetch_in_background([HumanMessage("Can I see Dr. Clara Lee?")], "thread-1")
+    try:
+        # the tool call may arrive before the prefetch is done; it waits and answers from it
+        found = json.loads(search_for_doctor.invoke({"name": "Clara Lee"}, CONFIG))
+        assert future.done() and future.result() == [3]
+        assert get_prefetch_cache().hits == 1
+        assert [d["Doctor_ID"] for d in found["doctors"]] == [3]
+    finally:
+        get_prefetch_cache.cache_clear()
+
+
+def test_tools_do_not_wait_on_queued_prefetches(hospital_db) -> None:
+    get_prefetch_cache.cache_clear()
+    get_availability_index().invalidate()
+    release = threading.Event()
+    # every database worker busy: the prefetch still runs, on its own threads
+    busy = [db._db_executor().submit(release.wait, 10) for _ in range(db.DB_THREADS)]
+    try:
+        future = prefetch_in_background([HumanMessage("Can I see Dr. Clara Lee?")], "thread-1")
+        assert future.result(5) == [3]
+
+        # every prefetch thread busy too: the next prefetch is queued, and the tool does not wait for it
+        busy += [_prefetch_executor().submit(release.wait, 10) for _ in range(PREFETCH_THREADS)]
+        queued = prefetch_in_background([HumanMessage("Can I see Dr. Clara Lee?")], "thread-2")
+        start = time.perf_counter()
+        found = json.loads(search_for_doctor.invoke({"name": "Clara Lee"}, {"configurable": {"thread_id": "thread-2"}}))
+        assert time.perf_counter() - start < PREFETCH_WAIT_SECONDS / 2
+        assert not queued.done()
+        assert [d["Doctor_ID"] for d in found["doctors"]] == [3]
+    finally:
+        release.set()
+        for future in busy:
+            future.result()
+        get_prefetch_cache.cache_clear()
@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agent.utils.llm import BoundLLMRegistry
+from agent.utils.prompts import (
+    AGENT_PROMPTS,
+    ContextCache,
+    assemble,
+    prefix_fingerprint,
+)
+
+
+class RecordingFakeChatModel(GenericFakeChatModel):
+    """Fake model that keeps the messages and options of every call."""
+
+    calls: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[tool.name for tool in tools])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append((messages, kwargs))
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def test_prompt_prefix_is_byte_identical_across_turns() -> None:
+    from agent.graph import reschedule_booking_tools
+
+    history = [HumanMessage("Move my appointment please", id="h1")]
+    first = assemble("reschedule_booking_assistant", history, today=date(2999, 1, 4))
+    history += [AIMessage("Which appointment?", id="a1"), HumanMessage("Number 15", id="h2")]
+    second = assemble("reschedule_booking_assistant", history, "Caller wants to move an appointment.", date(2999, 1, 5))
+
+    assert first[0] == second[0] and isinstance(first[0], SystemMessage)
+    # dynamic data sits right before the latest caller message, after the stable history
+    assert [m.id for m in second[1:3]] == ["h1", "a1"]
+    assert "2999-01-05" in second[3].content and "move an appointment" in second[3].content
+    assert second[4].id == "h2"
+    assert assemble("router_assistant", history)[1:] == history
+
+    assert prefix_fingerprint("reschedule_booking_assistant", reschedule_booking_tools) == prefix_fingerprint(
+        "reschedule_booking_assistant", list(reschedule_booking_tools)
+    )
+    for prompt in AGENT_PROMPTS.values():
+        assert "{" not in prompt and not any(char.isdigit() for char in prompt)
+
+
+def test_registry_sends_the_cached_prefix_by_name() -> None:
+    from agent.graph import cancel_booking_tools, new_booking_tools
+
+    created = []
+    now = [0.0]
+
+    def create(model, system, schemas, ttl):
+        created.append((system, [schema["name"] for schema in schemas]))
+        return f"cachedContents/{len(created)}"
+
+    def factory():
+        return RecordingFakeChatModel(messages=iter([AIMessage("ok")] * 10))
+
+    cache = ContextCache(create, ttl_seconds=600, clock=lambda: now[0])
+    registry = BoundLLMRegistry(factory, context_cache=cache)
+    RecordingFakeChatModel.calls = []
+    for turn in range(3):
+        prompt = assemble("new_booking_assistant", [HumanMessage(f"turn {turn}")], today=date(2999, 1, 1 + turn))
+        registry.get("new_booking_assistant", new_booking_tools).invoke(prompt)
+
+    # one provider cache for three turns; the system prompt is not sent next to it
+    assert created == [(AGENT_PROMPTS["new_booking_assistant"], [tool.name for tool in new_booking_tools])]
+    assert all(kwargs["cached_content"] == "cachedContents/1" for _, kwargs in RecordingFakeChatModel.calls)
+    assert not any(isinstance(m, SystemMessage) for messages, _ in RecordingFakeChatModel.calls for m in messages)
+    assert registry.get("cancel_booking_assistant", cancel_booking_tools) is not None and len(created) == 2
+
+    # caches are renewed before they expire
+    now[0] = 550.0
+    registry.get("new_booking_assistant", new_booking_tools)
+    assert cache.lookup("", "new_booking_assistant", new_booking_tools) == "cachedContents/3"
+
+
+def test_refused_prefixes_are_sent_inline() -> None:
+    from agent.graph import new_booking_tools
+
+    attempts = []
+
+    def create(model, system, schemas, ttl):
+        attempts.append(1)
+        raise ValueError("cached content is too small")
+
+    registry = BoundLLMRegistry(lambda: RecordingFakeChatModel(messages=iter([])), ContextCache(create))
+    bound = registry.get("new_booking_assistant", new_booking_tools)
+    assert registry.get("new_booking_assistant", new_booking_tools) is bound
+    assert bound.kwargs["tools"] == [tool.name for tool in new_booking_tools]
+    # roles without a static prompt are never cached
+    registry.get("history_summarizer")
+    assert attempts == [1]
+
+
+def test_caches_are_created_outside_the_lock() -> None:
+    from agent.graph import cancel_booking_tools, new_booking_tools
+
+    release = threading.Event()
+    created = []
+
+    def create(model, system, schemas, ttl):
+        created.append(system)
+        if system == AGENT_PROMPTS["new_booking_assistant"]:
+            release.wait(5)
+        return f"cachedContents/{len(created)}"
+
+    cache = ContextCache(create)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        waiting = [executor.submit(cache.lookup, "", "new_booking_assistant", new_booking_tools) for _ in range(3)]
+        # a slow create for one prefix does not hold up another
+        assert cache.lookup("", "cancel_booking_assistant", cancel_booking_tools) is not None
+        release.set()
+        names = {future.result() for future in waiting}
+    # concurrent lookups of one prefix share a single create
+    assert len(names) == 1 and created.count(AGENT_PROMPTS["new_booking_assistant"]) == 1
@@ -0,0 +1,55 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from agent.utils.synthetic import _quotas, generate_database
+
+
+def _dump(path: str) -> list:
+    conn = sqlite3.connect(path)
+    try:
+        return [
+            conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+            for table in ("Doctor", "Patient", "Appointment")
+        ]
+    finally:
+        conn.close()
+
+
+def test_generated_database_is_reproducible_and_consistent(tmp_path) -> None:
+    first = str(tmp_path / "first.db")
+    generated = generate_database(first, doctors=10, patients=50, appointments=400, today=date(2030, 1, 1), seed=3)
+    assert (generated.doctors, generated.patients, generated.appointments) == (10, 50, 400)
+    assert generated.last_date == "2030-03-31"
+
+    second = str(tmp_path / "second.db")
+    generate_database(second, doctors=10, patients=50, appointments=400, today=date(2030, 1, 1), seed=3)
+    assert _dump(first) == _dump(second)
+
+    conn = sqlite3.connect(first)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM Appointment").fetchone() == (400,)
+        # no doctor is booked twice for a slot, and every row points at real people
+        assert conn.execute(
+            "SELECT COUNT(*) FROM (SELECT DISTINCT Doctor_ID, Appointment_Date, Appointment_Time FROM Appointment)"
+        ).fetchone() == (400,)
+        assert conn.execute(
+            "SELECT COUNT(*) FROM Appointment WHERE Doctor_ID NOT IN (SELECT Doctor_ID FROM Doctor) "
+            "OR Patient_ID NOT IN (SELECT Patient_ID FROM Patient)"
+        ).fetchone() == (0,)
+        phones = [row[0] for row in conn.execute("SELECT Phone FROM Patient WHERE Phone IS NOT NULL")]
+        assert len(phones) == len(set(phones))
+        # the application's indexes are built
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"ux_appointment_doctor_slot", "ix_patient_phone"} <= indexes
+    finally:
+        conn.close()
+
+
+def test_quotas_respect_capacity() -> None:
+    quotas = _quotas([100.0, 1.0, 1.0], total=25, capacity=10)
+    assert sum(quotas) == 25
+    assert max(quotas) == 10
+    with pytest.raises(ValueError):
+        _quotas([1.0, 1.0], total=21, capacity=10)
@@ -0,0 +1,99 @@
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.utils import db, tts
+from agent.utils.intent import router_metrics
+from agent.utils.llm import llm_registry
+from agent.utils.telemetry import (
+    InMemorySink,
+    MetricsRegistry,
+    PrometheusSink,
+    Telemetry,
+    disable,
+    get_telemetry,
+    instrument,
+    query_label,
+    render_prometheus,
+    telemetry_from_env,
+)
+
+
+class BindableFakeChatModel(GenericFakeChatModel):
+    # the fake cannot stream tool calls, so streamed calls get the whole reply at once
+    disable_streaming: bool = True
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[tool.name for tool in tools])
+
+
+def _usage(input_tokens: int, output_tokens: int) -> dict:
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+def test_prometheus_text_format(tmp_path) -> None:
+    registry = MetricsRegistry()
+    registry.inc("llm_tokens_total", 12, name="router", direction="input")
+    registry.observe("db_rows", 3, (0, 1, 5), query="select Doctor")
+    registry.observe("db_rows", 7, (0, 1, 5), query="select Doctor")
+
+    text = render_prometheus(registry)
+    assert 'agent_llm_tokens_total{direction="input",name="router"} 12' in text
+    assert 'agent_db_rows_bucket{query="select Doctor",le="5"} 1' in text
+    assert 'agent_db_rows_bucket{query="select Doctor",le="+Inf"} 2' in text
+    assert 'agent_db_rows_count{query="select Doctor"} 2' in text
+
+    sink = PrometheusSink(registry, str(tmp_path / "metrics.prom"))
+    sink.flush()
+    assert (tmp_path / "metrics.prom").read_text() == text
+    assert query_label("UPDATE OR IGNORE Appointment SET x = 1") == "update Appointment"
+
+
+def test_disabled_telemetry_leaves_graph_untouched(monkeypatch) -> None:
+    from agent.graph import graph_builder
+
+    monkeypatch.delenv("TELEMETRY", raising=False)
+    get_telemetry.cache_clear()
+    compiled = graph_builder.compile()
+    assert instrument(compiled) is compiled
+    monkeypatch.setenv("TELEMETRY", "memory,jsonlog")
+    assert [type(sink).__name__ for sink in telemetry_from_env().sinks] == ["InMemorySink", "JsonLogSink"]
+    get_telemetry.cache_clear()
+
+
+def test_spans_and_metrics_for_a_turn(hospital_db, monkeypatch) -> None:
+    from agent.graph import graph_builder
+
+    monkeypatch.setenv("TTS_BACKEND", "stub")
+    monkeypatch.setenv("AUDIO_PLAYBACK", "0")
+    tts.get_speech_player.cache_clear()
+    model = BindableFakeChatModel(messages=iter([
+        AIMessage("", tool_calls=[{"name": "search_for_appointment", "args": {"appointment_id": 15}, "id": "call_1"}], usage_metadata=_usage(40, 5)),
+        AIMessage("Appointment 15 is on July 30th at 17:00.", usage_metadata=_usage(60, 10)),
+    ]))
+    llm_registry.set_factory(lambda: model)
+    sink = InMemorySink()
+    telemetry = Telemetry([sink])
+    try:
+        graph = instrument(graph_builder.compile(), telemetry)
+        graph.invoke({"messages": [HumanMessage("Please cancel my appointment 15")]})
+        played = tts.get_speech_player().submit("Goodbye for now.").result(timeout=5)
+    finally:
+        disable()
+        llm_registry.set_factory(None)
+        tts.get_speech_player.cache_clear()
+
+    nodes = {span.name: span for span in sink.find(kind="node")}
+    assert {"compact_history", "router_assistant", "cancel_booking_assistant", "cancel_booking_tools", "audio_output"} <= set(nodes)
+    [tool] = sink.find(kind="tool")
+    assert (tool.name, tool.parent_id) == ("search_for_appointment", nodes["cancel_booking_tools"].span_id)
+    assert len({span.trace_id for span in sink.spans if span.kind != "tts"}) == 1
+    assert [span.attributes["output_tokens"] for span in sink.find(kind="llm")] == [5, 10]
+
+    registry = telemetry.registry
+    assert registry.counter("llm_tokens_total", name="cancel_booking_assistant", direction="input") == 100
+    assert registry.histogram("span_duration_seconds", kind="tool", name="search_for_appointment").count == 1
+    assert registry.histogram("db_rows", query="select Appointment").sum == 1
+    assert registry.counter("router_decisions_total", tier="rule") == 1
+    assert registry.counter("audio_bytes_total") >= played > 0
+    assert telemetry.on_query not in db.query_listeners
+    assert telemetry.on_route not in router_metrics.listeners
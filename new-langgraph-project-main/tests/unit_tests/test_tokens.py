@@ -0,0 +1,66 @@
+import importlib
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import trim_messages
+
+from agent.utils.tokens import TokenCounter, estimate_text_tokens, get_token_counter
+
+
+def test_estimates_grow_with_length() -> None:
+    assert estimate_text_tokens("Book me in with Dr. Lee") == 7
+    assert estimate_text_tokens("2999-01-04") == 10
+    short, long = HumanMessage("yes", id="a"), HumanMessage("please book it " * 200, id="b")
+    counter = TokenCounter()
+    assert counter.count([long]) > 100 * counter.count([short])
+    call = AIMessage("", id="c", tool_calls=[{"name": "cancel_appointment", "args": {"appointment_id": 15}, "id": "x"}])
+    assert counter.count([call]) > counter.count([AIMessage("", id="d")])
+
+
+def test_counts_are_memoized_per_message() -> None:
+    counter = TokenCounter()
+    history = [HumanMessage(f"message number {i}", id=str(i)) for i in range(50)]
+    counter.count(history)
+    assert (counter.hits, counter.misses) == (0, 50)
+    counter.count([*history, AIMessage("a new reply", id="new")])
+    assert (counter.hits, counter.misses) == (50, 51)
+    # a message replaced under the same ID is counted again
+    counter.count([HumanMessage("a different message number 0", id="0")])
+    assert counter.misses == 52
+
+
+def test_calibrates_scale_and_per_role_overhead() -> None:
+    counter = TokenCounter(prior_weight=100.0)
+
+    class Reply:
+        def __init__(self, input_tokens: int) -> None:
+            self.usage_metadata = {"input_tokens": input_tokens, "output_tokens": 1, "total_tokens": input_tokens + 1}
+
+    for words in range(5, 200, 15):
+        prompt = [HumanMessage("word " * words)]
+        estimate = counter.raw_count(prompt)
+        counter.observe("router_assistant", prompt, Reply(round(1.5 * estimate) + 120))
+        counter.observe("general_hospital_assistant", prompt, Reply(round(1.5 * estimate) + 900))
+    counter.observe("router_assistant", [HumanMessage("no usage reported")], AIMessage("ok"))
+
+    assert abs(counter.scale - 1.5) < 0.02
+    assert abs(counter.prompt_overhead("router_assistant") - 120) <= 3
+    assert abs(counter.prompt_overhead("general_hospital_assistant") - 900) <= 3
+    assert counter.prompt_overhead("history_summarizer") == 0
+
+
+def test_router_prompt_fits_the_budget_and_keeps_the_latest_question(monkeypatch) -> None:
+    graph = importlib.import_module("agent.graph")
+    get_token_counter().reset()
+    history = []
+    for i in range(30):
+        history += [HumanMessage(f"question {i} " + "detail " * 20, id=f"h{i}"), AIMessage(f"answer {i}", id=f"a{i}")]
+    history.append(HumanMessage("Can I cancel?", id="last"))
+
+    prompt = graph._router_messages({"messages": history})
+    assert get_token_counter().count(prompt) <= graph.ROUTER_MAX_TOKENS
+    assert prompt[-1].id == "last" and isinstance(prompt[1], HumanMessage) and len(prompt) < len(history)
+
+    monkeypatch.setattr(graph, "ROUTER_MAX_TOKENS", 150)
+    huge = HumanMessage("please help " * 500, id="huge")
+    assert [m.id for m in graph._router_messages({"messages": [*history, huge]})[1:]] == ["huge"]
+    assert trim_messages([huge], max_tokens=150, token_counter=get_token_counter()) == []
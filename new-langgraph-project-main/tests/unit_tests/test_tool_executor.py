@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage
+from langgraph.prebuilt import ToolNode
+
+from agent.utils import db
+from agent.utils.tool_executor import ToolExecutor
+from agent.utils.tools import search_for_appointment
+
+
+def _fan_out_turn(write: bool = True) -> AIMessage:
+    probes = [("2999-01-04", "09:00"), ("2999-01-04", "09:30"), ("2999-01-05", "10:00")]
+    calls = [{"name": "search_for_doctor", "args": {"name": "Clara"}, "id": "search"}]
+    calls += [
+        {"name": "check_doctor_availability", "args": {"doctor_id": 2, "date": day, "time": time}, "id": f"probe{i}"}
+        for i, (day, time) in enumerate(probes)
+    ]
+    if write:
+        calls.append(
+            {"name": "book_appointment", "args": {"user_id": 1, "doctor_id": 2, "date": "2999-01-04", "time": "09:00"}, "id": "book"}
+        )
+    calls += [
+        {"name": "search_for_appointment", "args": {"appointment_id": 15}, "id": "find15"},
+        {"name": "search_for_appointment", "args": {"appointment_id": 999999}, "id": "missing"},
+        {"name": "check_doctor_availability", "args": {"doctor_id": "two"}, "id": "bad_args"},
+        {"name": "delete_everything", "args": {}, "id": "unknown"},
+    ]
+    return AIMessage("", tool_calls=calls)
+
+
+def test_fan_out_matches_tool_node_with_fewer_queries(hospital_db, monkeypatch) -> None:
+    from agent.graph import new_booking_tools
+
+    tools = [*new_booking_tools, search_for_appointment]
+    queries = []
+    monkeypatch.setattr(db, "query_listeners", [lambda sql, rows, seconds: queries.append(sql)])
+
+    messages = ToolExecutor(tools).invoke({"messages": [_fan_out_turn()]}, {})["messages"]
+    assert [m.tool_call_id for m in messages] == [call["id"] for call in _fan_out_turn().tool_calls]
+    by_id = {m.tool_call_id: m for m in messages}
+    # probes and lookups run before the write, each tool's calls in a single query
+    assert [json.loads(by_id[f"probe{i}"].content)["available"] for i in range(3)] == [True, True, True]
+    assert json.loads(by_id["book"].content)["success"]
+    assert json.loads(by_id["find15"].content)["appointment"]["appointment_id"] == 15
+    assert not json.loads(by_id["missing"].content)["success"]
+    assert by_id["bad_args"].status == by_id["unknown"].status == "error"
+    assert sum("WITH probe" in sql for sql in queries) == 1
+    assert sum("Appointment_ID IN" in sql for sql in queries) == 1
+
+    # the reads give the same answers as LangGraph's ToolNode, sync and async
+    reads = {"messages": [_fan_out_turn(write=False)]}
+    expected = [(m.tool_call_id, m.content) for m in ToolNode(tools).invoke(reads)["messages"]]
+    assert [(m.tool_call_id, m.content) for m in ToolExecutor(tools).invoke(reads, {})["messages"]] == expected
+    assert [(m.tool_call_id, m.content) for m in asyncio.run(ToolExecutor(tools).ainvoke(reads, {}))["messages"]] == expected
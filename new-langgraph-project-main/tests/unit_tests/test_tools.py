@@ -0,0 +1,182 @@
+import json
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from agent.utils import db, patient_phones
+from agent.utils.tools import (
+    book_appointment,
+    cancel_appointment,
+    check_doctor_availability,
+    find_patient,
+    list_upcoming_appointments,
+    search_for_appointment,
+    search_for_doctor,
+)
+
+
+def test_connections_are_reused_per_thread(hospital_db) -> None:
+    pool = hospital_db.pool
+    assert pool.connection() is pool.connection()
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not pool.connection()
+    assert pool.connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_migration_normalizes_slots_before_the_unique_index(tmp_path, caplog) -> None:
+    path = tmp_path / "legacy.db"
+    shutil.copy(db.DB_PATH, path)
+    with sqlite3.connect(path) as conn:
+        # appointment 1 is doctor 1 at 2025-06-06 10:00; these predate slot normalization
+        conn.executemany(
+            "INSERT INTO Appointment (Appointment_ID, Appointment_Time, Appointment_Date, Doctor_ID, Patient_ID)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(30, "10:00", "2025-6-6", 1, 2), (31, "9:00", "2025-06-06", 1, 2), (32, "09:00", "2025-06-06", 1, 3)],
+        )
+    conn.close()
+
+    pool = db.ConnectionPool(str(path))
+    try:
+        with caplog.at_level("WARNING", logger="agent.utils.db"):
+            rows = pool.connection().execute(
+                "SELECT Appointment_ID, Appointment_Date, Appointment_Time FROM Appointment WHERE Doctor_ID = 1"
+                " AND Appointment_Date = '2025-06-06' ORDER BY Appointment_ID"
+            ).fetchall()
+        assert [tuple(row) for row in rows] == [(1, "2025-06-06", "10:00"), (31, "2025-06-06", "09:00")]
+        assert "kept appointment 1 and deleted 30 (patient 2)" in caplog.text
+        assert "kept appointment 31 and deleted 32 (patient 3)" in caplog.text
+        with pytest.raises(sqlite3.IntegrityError):
+            pool.connection().execute(
+                "INSERT INTO Appointment (Appointment_Time, Appointment_Date, Doctor_ID, Patient_ID)"
+                " VALUES ('09:00', '2025-06-06', 1, 1)"
+            )
+    finally:
+        pool.close_all()
+
+
+def test_search_for_doctor(hospital_db) -> None:
+    found = json.loads(search_for_doctor.invoke({"name": "Clara"}))
+    assert [d["Doctor_Name"] for d in found["doctors"]] == ["Dr. Clara Lee"]
+    assert found["next_offset"] is None
+
+    # misspelt names still find the closest doctor first
+    misspelt = json.loads(search_for_doctor.invoke({"name": "Dr Alise Smyth"}))
+    assert misspelt["doctors"][0]["Doctor_ID"] == 1
+
+    filtered = json.loads(search_for_doctor.invoke({"specialization": "neurology", "min_rating": 4.0}))
+    assert [d["Doctor_ID"] for d in filtered["doctors"]] == [2]
+    assert not json.loads(search_for_doctor.invoke({"name": "Clara", "location": "Boston"}))["success"]
+
+
+def test_doctor_search_pages_and_tracks_writes(hospital_db) -> None:
+    with hospital_db.pool.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO Doctor (Doctor_Name, Specialization, Location, Rating) VALUES (?, ?, ?, ?)",
+            [(f"Dr. Test {i}", "Dermatology", "Boston", 3.0 + i / 100) for i in range(45)],
+        )
+
+    first = hospital_db.search_doctors(specialization="Dermatology", limit=100)
+    assert len(first["doctors"]) == 20 and first["next_offset"] == 20
+    assert first["doctors"][0]["Doctor_Name"] == "Dr. Test 44"
+    last = hospital_db.search_doctors(specialization="Dermatology", limit=20, offset=40)
+    assert len(last["doctors"]) == 5 and last["next_offset"] is None
+
+    streamed = list(hospital_db.iter_doctors(location="boston", batch_size=7))
+    assert [d["Doctor_Name"] for d in streamed] == [d["Doctor_Name"] for d in sorted(
+        streamed, key=lambda d: -d["Rating"])]
+    assert len(streamed) == 45
+
+    # the full-text index follows updates and deletes on Doctor
+    conn = hospital_db.pool.connection()
+    conn.execute("UPDATE Doctor SET Doctor_Name = 'Dr. Zora Quill' WHERE Doctor_Name = 'Dr. Test 3'")
+    conn.execute("DELETE FROM Doctor WHERE Doctor_Name = 'Dr. Test 4'")
+    assert [d["Doctor_Name"] for d in hospital_db.search_doctors("Quill")["doctors"]] == ["Dr. Zora Quill"]
+    names = {d["Doctor_Name"] for d in hospital_db.iter_doctors("test")}
+    assert len(names) == 43 and not names & {"Dr. Test 3", "Dr. Test 4"}
+
+
+def test_book_then_cancel(hospital_db) -> None:
+    slot = {"doctor_id": 2, "date": "2999-01-04", "time": "09:00"}
+    booked = json.loads(book_appointment.invoke({"user_id": 1, **slot}))
+    assert booked["success"]
+    assert not json.loads(check_doctor_availability.invoke(slot))["available"]
+    assert not json.loads(book_appointment.invoke({"user_id": 3, **slot}))["success"]
+
+    appointment_id = hospital_db.pool.connection().execute(
+        "SELECT MAX(Appointment_ID) FROM Appointment"
+    ).fetchone()[0]
+    found = json.loads(search_for_appointment.invoke({"appointment_id": appointment_id}))
+    assert found["appointment"]["doctor_id"] == 2
+
+    assert json.loads(cancel_appointment.invoke({"appointment_id": appointment_id}))["success"]
+    assert not json.loads(cancel_appointment.invoke({"appointment_id": appointment_id}))["success"]
+    assert json.loads(check_doctor_availability.invoke(slot))["available"]
+
+
+def test_patient_lookup_and_upcoming_appointments(hospital_db) -> None:
+    conn = hospital_db.pool.connection()
+    conn.execute("UPDATE Patient SET Phone = '5550100' WHERE Patient_ID = 2")
+    conn.execute("INSERT INTO Patient (Patient_Name, Age) VALUES ('John Doerr', 52)")
+
+    assert [p["patient_id"] for p in json.loads(find_patient.invoke({"phone": "555-0100"}))["patients"]] == [2]
+    # the exact name comes first, then longer names starting with it
+    found = json.loads(find_patient.invoke({"name": "john  doe"}))
+    assert [p["name"] for p in found["patients"]] == ["John Doe", "John Doerr"]
+    assert [p["age"] for p in json.loads(find_patient.invoke({"name": "John", "age": 52}))["patients"]] == [52]
+    assert not json.loads(find_patient.invoke({"name": "Nobody"}))["success"]
+
+    for day, time in (("2999-02-01", "10:00"), ("2999-01-04", "11:00"), ("2000-01-01", "09:00")):
+        conn.execute(
+            "INSERT INTO Appointment (Patient_ID, Doctor_ID, Appointment_Date, Appointment_Time) VALUES (2, 3, ?, ?)",
+            (day, time),
+        )
+    upcoming = json.loads(list_upcoming_appointments.invoke({"patient_id": 2}))["appointments"]
+    assert [(a["date"], a["time"]) for a in upcoming] == [("2999-01-04", "11:00"), ("2999-02-01", "10:00")]
+    assert upcoming[0]["doctor_name"] == "Dr. Clara Lee"
+    assert hospital_db.upcoming_appointments(2, "2999-01-04 11:30") == upcoming[1:]
+
+    def plan(sql: str, *params) -> str:
+        return " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+    assert "ix_patient_phone" in plan(db.FIND_PATIENTS_BY_PHONE, "1", None, None, 5)
+    assert "ix_patient_name" in plan(db.FIND_PATIENTS_BY_NAME, "a", "b", None, None, "a", 5)
+    assert "ix_appointment_patient" in plan(db.SELECT_UPCOMING_APPOINTMENTS, 2, "2999-01-01", "00:00", 5)
+
+
+def test_household_phone_lookup_filters_age_before_the_limit(hospital_db, tmp_path) -> None:
+    conn = hospital_db.pool.connection()
+    household = [
+        conn.execute("INSERT INTO Patient (Patient_Name, Age) VALUES (?, ?)", (f"Member {age}", age)).lastrowid
+        for age in (70, 68, 41, 39, 12, 9)
+    ]
+    phones = tmp_path / "phones.csv"
+    phones.write_text("Patient_ID,Phone\n" + "".join(f"{patient_id},(555) 010-9999\n" for patient_id in household))
+    assert patient_phones.import_phones(str(phones), hospital_db.pool.db_path) == len(household)
+
+    assert len(hospital_db.find_patients(phone="5550109999")) == 5
+    assert hospital_db.find_patients(phone="555 010 9999", age=9, limit=1) == [
+        {"patient_id": household[-1], "name": "Member 9", "age": 9, "phone": "5550109999"}
+    ]
+    assert hospital_db.set_patient_phones([(household[0], ""), (10**9, "1")]) == 1
+    assert hospital_db.find_patients(phone="5550109999", age=70) == []
+
+
+def test_async_tools_run_on_database_pool(hospital_db) -> None:
+    import asyncio
+
+    from agent.utils.db import run_in_db_executor
+
+    async def main():
+        doctors = json.loads(await search_for_doctor.ainvoke({"name": "Bob"}))
+        thread = await run_in_db_executor(lambda: threading.current_thread().name)
+        return doctors, thread
+
+    doctors, thread = asyncio.run(main())
+    assert doctors["doctors"][0]["Doctor_ID"] == 2
+    assert thread.startswith("sqlite")
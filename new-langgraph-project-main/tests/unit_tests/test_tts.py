@@ -0,0 +1,62 @@
+import asyncio
+
+from agent.utils.tts import (
+    SpeechPlayer,
+    StubTTSBackend,
+    drain_sink,
+    iter_sentences,
+    stream_speech,
+)
+
+
+async def _tokens(text: str, size: int = 3):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+async def _collect(aiter):
+    return [item async for item in aiter]
+
+
+def test_token_stream_is_cut_into_sentences() -> None:
+    text = "Your appointment is booked for Monday. Dr. Lee will see you at ten! Anything else?"
+    sentences = asyncio.run(_collect(iter_sentences(_tokens(text))))
+    assert sentences == ["Your appointment is booked for Monday.", "Dr. Lee will see you at ten!", "Anything else?"]
+
+
+def test_titles_and_times_do_not_end_sentences() -> None:
+    text = "Your appointment with Dr. Smith is booked for 10: 00 tomorrow. Mrs. Jones sees you next; arrive early."
+    sentences = asyncio.run(_collect(iter_sentences(_tokens(text))))
+    assert sentences == ["Your appointment with Dr. Smith is booked for 10: 00 tomorrow.", "Mrs. Jones sees you next; arrive early."]
+
+
+def test_frames_follow_sentence_order() -> None:
+    backend = StubTTSBackend(frame_size=8)
+    text = "The first sentence is here. The second one follows it. Short end."
+    frames = asyncio.run(_collect(stream_speech(_tokens(text), backend)))
+    assert b"".join(frames).decode() == "".join(backend.requests)
+    assert backend.requests == ["The first sentence is here.", "The second one follows it.", "Short end."]
+
+
+def test_player_does_not_block_caller() -> None:
+    player = SpeechPlayer(StubTTSBackend(seconds_per_char=0.001), drain_sink)
+    future = player.submit("Appointment booked successfully.")
+    assert not future.done()
+    assert future.result(timeout=5) == len("Appointment booked successfully.")
+
+
+def test_replies_are_spoken_while_they_are_generated() -> None:
+    backend = StubTTSBackend()
+    player = SpeechPlayer(backend, drain_sink)
+    stream = player.open_stream()
+    for token in ("Your appointment is ", "booked for Monday. ", "See you then."):
+        stream.feed(token)
+    stream.close()
+    assert stream.future.result(timeout=5) == len("Your appointment is booked for Monday.See you then.")
+    assert backend.requests == ["Your appointment is booked for Monday.", "See you then."]
+
+    # a reply that turns into a tool call is not spoken
+    stream = player.open_stream()
+    stream.feed("Let me check")
+    stream.cancel()
+    assert stream.future.cancelled()
@@ -0,0 +1,38 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from agent.utils.vectorstore import CHUNKS_FILE, MANIFEST_FILE, load_index, save_index
+
+
+def _save(index_dir: str, texts: list, version: str) -> None:
+    vectors = np.eye(len(texts), 4, dtype=np.float32)
+    save_index(index_dir, texts, [{"n": i} for i in range(len(texts))], vectors, {"version": version})
+
+
+def test_rebuilds_do_not_disturb_open_indexes(tmp_path) -> None:
+    index_dir = str(tmp_path)
+    _save(index_dir, ["a", "b"], "v1")
+    texts, _, vectors, manifest = load_index(index_dir)
+    assert texts == ["a", "b"] and manifest["count"] == 2
+
+    _save(index_dir, ["c", "d", "e"], "v2")
+    # the old generation is gone from disk, but its memory map still reads the old vectors
+    assert np.asarray(vectors).tolist() == np.eye(2, 4).tolist()
+    texts, metadatas, vectors, manifest = load_index(index_dir)
+    assert (texts, vectors.shape, manifest["version"]) == (["c", "d", "e"], (3, 4), "v2")
+    assert sorted(os.listdir(tmp_path)) == [MANIFEST_FILE, manifest["generation"]]
+
+
+def test_mismatched_files_are_rejected(tmp_path) -> None:
+    index_dir = str(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        load_index(index_dir)
+    _save(index_dir, ["a", "b"], "v1")
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    chunks = tmp_path / manifest["generation"] / CHUNKS_FILE
+    chunks.write_text(json.dumps({"texts": ["a"], "metadatas": [{}]}))
+    with pytest.raises(ValueError):
+        load_index(index_dir)
@@ -0,0 +1,25 @@
+from agent.utils.warmup import warm_up, warm_up_in_background
+
+
+def test_warm_up_times_hooks_and_skips_failures() -> None:
+    ran = []
+
+    def broken() -> None:
+        raise RuntimeError("no network")
+
+    timings = warm_up([("first", lambda: ran.append("first")), ("broken", broken), ("last", lambda: ran.append("last"))])
+    assert ran == ["first", "last"]
+    assert timings["broken"] is None and timings["first"] >= 0 and timings["last"] >= 0
+
+    thread = warm_up_in_background([("late", lambda: ran.append("late"))])
+    thread.join(timeout=5)
+    assert thread.daemon and ran[-1] == "late"
+
+
+def test_graph_registers_a_hook_per_lazy_component() -> None:
+    import agent.graph  # noqa: F401
+    from agent.utils.warmup import warm_up_hooks
+
+    assert {"database", "intent_classifier", "bound_llms", "speech", "knowledge_base"} <= {
+        name for name, _ in warm_up_hooks
+    }